@@ -0,0 +1,37 @@
+"""coproductionprocess_search
+
+Revision ID: 0b7e4d92c6a1
+Revises: f1a9c3d5b207
+Create Date: 2026-10-18 20:48:05.113920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0b7e4d92c6a1'
+down_revision = 'f1a9c3d5b207'
+branch_labels = None
+depends_on = None
+
+# same as app.general.utils.search.weighted_vector_sql for the process (en, es, it, lv)
+CONFIG = "CASE language WHEN 'en' THEN 'english'::regconfig WHEN 'es' THEN 'spanish'::regconfig WHEN 'it' THEN 'italian'::regconfig WHEN 'lv' THEN 'simple'::regconfig ELSE 'simple'::regconfig END"
+SEARCH_VECTOR = " || ".join(
+    f"setweight(to_tsvector({CONFIG}, coalesce({column}, '')), '{weight}')"
+    for column, weight in (("name", "A"), ("description", "B"), ("aim", "C"), ("idea", "D"))
+)
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # generated, so every insert and update keeps it up to date
+    op.add_column('coproductionprocess', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True))
+    op.create_index('ix_coproductionprocess_search_vector', 'coproductionprocess', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_coproductionprocess_name_trgm', 'coproductionprocess', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_coproductionprocess_name_trgm', table_name='coproductionprocess')
+    op.drop_index('ix_coproductionprocess_search_vector', table_name='coproductionprocess')
+    op.drop_column('coproductionprocess', 'search_vector')
@@ -0,0 +1,47 @@
+"""treeitem_closure
+
+Revision ID: 3c1f7a9d2e54
+Revises: efcb7da18049
+Create Date: 2026-10-18 10:12:41.302114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3c1f7a9d2e54'
+down_revision = 'efcb7da18049'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('treeitem_closure',
+    sa.Column('ancestor_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('descendant_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['descendant_id'], ['treeitem.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_treeitem_closure_descendant_id', 'treeitem_closure', ['descendant_id', 'depth'], unique=False)
+
+    # Backfill the ancestry of the existing phases, objectives and tasks
+    op.execute("""
+        INSERT INTO treeitem_closure (ancestor_id, descendant_id, depth)
+        SELECT id, id, 0 FROM phase
+        UNION ALL SELECT id, id, 0 FROM objective
+        UNION ALL SELECT id, id, 0 FROM task
+        UNION ALL SELECT coproductionprocess_id, id, 1 FROM phase WHERE coproductionprocess_id IS NOT NULL
+        UNION ALL SELECT phase_id, id, 1 FROM objective WHERE phase_id IS NOT NULL
+        UNION ALL SELECT p.coproductionprocess_id, o.id, 2 FROM objective o JOIN phase p ON p.id = o.phase_id WHERE p.coproductionprocess_id IS NOT NULL
+        UNION ALL SELECT objective_id, id, 1 FROM task WHERE objective_id IS NOT NULL
+        UNION ALL SELECT o.phase_id, t.id, 2 FROM task t JOIN objective o ON o.id = t.objective_id WHERE o.phase_id IS NOT NULL
+        UNION ALL SELECT p.coproductionprocess_id, t.id, 3 FROM task t JOIN objective o ON o.id = t.objective_id JOIN phase p ON p.id = o.phase_id WHERE p.coproductionprocess_id IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_treeitem_closure_descendant_id', table_name='treeitem_closure')
+    op.drop_table('treeitem_closure')
@@ -0,0 +1,38 @@
+"""story_search
+
+Revision ID: 3d6f0a8c2e15
+Revises: 0b7e4d92c6a1
+Create Date: 2026-10-18 21:34:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3d6f0a8c2e15'
+down_revision = '0b7e4d92c6a1'
+branch_labels = None
+depends_on = None
+
+# same as app.general.utils.search.weighted_vector_sql for the story, which has no language
+SEARCH_VECTOR = " || ".join(
+    f"setweight(to_tsvector('simple'::regconfig, coalesce({column}, '')), '{weight}')"
+    for column, weight in (("data_story ->> 'title'", "A"), ("data_story ->> 'description'", "B"), ("data_story ->> 'keywords'", "C"))
+)
+
+
+def upgrade():
+    op.add_column('story', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True), nullable=True))
+    op.create_index('ix_story_search_vector', 'story', ['search_vector'], unique=False, postgresql_using='gin')
+    op.execute("CREATE INDEX ix_story_title_trgm ON story USING gin ((data_story ->> 'title') gin_trgm_ops)")
+    op.create_index('ix_story_keywords_keyword_id', 'story_keywords', ['keyword_id'], unique=False)
+    op.create_index('ix_keyword_name_lower', 'keyword', [sa.text('lower(trim(name))')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_keyword_name_lower', table_name='keyword')
+    op.drop_index('ix_story_keywords_keyword_id', table_name='story_keywords')
+    op.drop_index('ix_story_title_trgm', table_name='story')
+    op.drop_index('ix_story_search_vector', table_name='story')
+    op.drop_column('story', 'search_vector')
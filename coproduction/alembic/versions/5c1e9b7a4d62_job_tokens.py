@@ -0,0 +1,37 @@
+"""job_tokens
+
+Revision ID: 5c1e9b7a4d62
+Revises: 8a2c5e7f9d30
+Create Date: 2026-10-18 23:40:12.604317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e9b7a4d62'
+down_revision = '8a2c5e7f9d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('exportjob', sa.Column('access_token', sa.Text(), nullable=True))
+    op.add_column('importjob', sa.Column('access_token', sa.Text(), nullable=True))
+    # keeps the newest of the active exports of a process before the index forbids more than one
+    op.execute("""
+        UPDATE exportjob SET status = 'cancelled', finished_at = now()
+        WHERE status IN ('pending', 'running') AND id NOT IN (
+            SELECT DISTINCT ON (coproductionprocess_id) id FROM exportjob
+            WHERE status IN ('pending', 'running')
+            ORDER BY coproductionprocess_id, created_at DESC
+        )
+    """)
+    op.create_index('ix_exportjob_active', 'exportjob', ['coproductionprocess_id'], unique=True, postgresql_where=sa.text("status IN ('pending', 'running')"))
+
+
+def downgrade():
+    op.drop_index('ix_exportjob_active', table_name='exportjob')
+    op.drop_column('importjob', 'access_token')
+    op.drop_column('exportjob', 'access_token')
@@ -0,0 +1,46 @@
+"""import_jobs
+
+Revision ID: 5d9a2c7e4b61
+Revises: 8b2e4d6f1a37
+Create Date: 2026-10-18 13:52:08.204471
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '5d9a2c7e4b61'
+down_revision = '8b2e4d6f1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('importjob',
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('creator_id', sa.String(), nullable=True),
+    sa.Column('task_id', sa.String(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'running', 'finished', 'failed', 'cancelled', name='jobstatus', native_enum=False, create_constraint=False), nullable=False),
+    sa.Column('filename', sa.String(), nullable=True),
+    sa.Column('upload_path', sa.String(), nullable=True),
+    sa.Column('treeitems_total', sa.Integer(), nullable=True),
+    sa.Column('assets_total', sa.Integer(), nullable=True),
+    sa.Column('assets_done', sa.Integer(), nullable=True),
+    sa.Column('assets_failed', sa.Integer(), nullable=True),
+    sa.Column('coproductionprocess_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['coproductionprocess_id'], ['coproductionprocess.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['creator_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_importjob_creator_id'), 'importjob', ['creator_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_importjob_creator_id'), table_name='importjob')
+    op.drop_table('importjob')
@@ -0,0 +1,28 @@
+"""user_search
+
+Revision ID: 8a2c5e7f9d30
+Revises: 3d6f0a8c2e15
+Create Date: 2026-10-18 22:05:41.918236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a2c5e7f9d30'
+down_revision = '3d6f0a8c2e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_email', 'user', ['email'], unique=False)
+    op.create_index('ix_user_full_name_trgm', 'user', ['full_name'], unique=False, postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'})
+    op.create_index('ix_user_email_trgm', 'user', ['email'], unique=False, postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_user_email_trgm', table_name='user')
+    op.drop_index('ix_user_full_name_trgm', table_name='user')
+    op.drop_index('ix_user_email', table_name='user')
@@ -0,0 +1,48 @@
+"""export_jobs
+
+Revision ID: 8b2e4d6f1a37
+Revises: 3c1f7a9d2e54
+Create Date: 2026-10-18 12:40:17.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a37'
+down_revision = '3c1f7a9d2e54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exportjob',
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('coproductionprocess_id', postgresql.UUID(as_uuid=True), nullable=True),
+    sa.Column('creator_id', sa.String(), nullable=True),
+    sa.Column('task_id', sa.String(), nullable=True),
+    sa.Column('status', sa.Enum('pending', 'running', 'finished', 'failed', 'cancelled', name='jobstatus', native_enum=False, create_constraint=False), nullable=False),
+    sa.Column('phases_total', sa.Integer(), nullable=True),
+    sa.Column('phases_done', sa.Integer(), nullable=True),
+    sa.Column('assets_total', sa.Integer(), nullable=True),
+    sa.Column('assets_done', sa.Integer(), nullable=True),
+    sa.Column('assets_failed', sa.Integer(), nullable=True),
+    sa.Column('assets_reused', sa.Integer(), nullable=True),
+    sa.Column('artifact_path', sa.String(), nullable=True),
+    sa.Column('artifact_size', sa.BigInteger(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['coproductionprocess_id'], ['coproductionprocess.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['creator_id'], ['user.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_exportjob_coproductionprocess_id'), 'exportjob', ['coproductionprocess_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_exportjob_coproductionprocess_id'), table_name='exportjob')
+    op.drop_table('exportjob')
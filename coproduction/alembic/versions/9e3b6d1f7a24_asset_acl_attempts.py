@@ -0,0 +1,26 @@
+"""asset_acl_attempts
+
+Revision ID: 9e3b6d1f7a24
+Revises: 5c1e9b7a4d62
+Create Date: 2026-10-19 00:32:55.180946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b6d1f7a24'
+down_revision = '5c1e9b7a4d62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('assetacl', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('assetacl', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('assetacl', 'next_attempt_at')
+    op.drop_column('assetacl', 'attempts')
@@ -0,0 +1,43 @@
+"""outbound_emails
+
+Revision ID: 9e4f1b3c7a20
+Revises: 5d9a2c7e4b61
+Create Date: 2026-10-18 15:21:44.510392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '9e4f1b3c7a20'
+down_revision = '5d9a2c7e4b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outboundemail',
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('email_to', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('subject', sa.String(), nullable=False),
+    sa.Column('body_text', sa.Text(), nullable=False),
+    sa.Column('body_html', sa.Text(), nullable=False),
+    sa.Column('status', sa.Enum('queued', 'sent', 'failed', name='emailstatus', native_enum=False, create_constraint=False), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outboundemail_email_to'), 'outboundemail', ['email_to'], unique=False)
+    op.create_index(op.f('ix_outboundemail_status'), 'outboundemail', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_outboundemail_status'), table_name='outboundemail')
+    op.drop_index(op.f('ix_outboundemail_email_to'), table_name='outboundemail')
+    op.drop_table('outboundemail')
@@ -0,0 +1,63 @@
+"""jsonb_notification_parameters
+
+Revision ID: a3c81f5d6e92
+Revises: 9e4f1b3c7a20
+Create Date: 2026-10-18 17:02:13.218841
+
+"""
+import ast
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'a3c81f5d6e92'
+down_revision = '9e4f1b3c7a20'
+branch_labels = None
+depends_on = None
+
+TABLES = ('coproductionprocessnotification', 'usernotification')
+INDEXES = {
+    'coproductionprocessnotification': ('treeitem_id', 'team_id'),
+    'usernotification': ('copro_id', 'team_id'),
+}
+
+
+def parse(text):
+    # JSON or the single quoted format the notifications were built with
+    for attempt in (json.loads, lambda t: json.loads(t.replace("'", '"')), ast.literal_eval):
+        try:
+            value = attempt(text)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, str):
+            return parse(value)
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        op.alter_column(table, 'parameters', type_=postgresql.JSONB(astext_type=sa.Text()), postgresql_using='parameters::jsonb')
+
+        # the parameters were stored as a string inside the JSON, the ones that can not be read stay like that
+        rows = bind.execute(sa.text(f"SELECT id, parameters #>> '{{}}' FROM {table} WHERE jsonb_typeof(parameters) = 'string'")).fetchall()
+        updates = [{'id': id, 'parameters': json.dumps(parsed)} for id, text in rows if (parsed := parse(text)) is not None]
+        if updates:
+            bind.execute(sa.text(f"UPDATE {table} SET parameters = CAST(:parameters AS jsonb) WHERE id = :id"), updates)
+
+        for key in INDEXES[table]:
+            op.create_index(f'ix_{table}_{key}', table, [sa.text(f"(parameters ->> '{key}')")])
+
+
+def downgrade():
+    for table in TABLES:
+        for key in INDEXES[table]:
+            op.drop_index(f'ix_{table}_{key}', table_name=table)
+        # back to a string with the JSON inside
+        op.execute(f"UPDATE {table} SET parameters = to_jsonb(parameters::text) WHERE jsonb_typeof(parameters) = 'object'")
+        op.alter_column(table, 'parameters', type_=sa.JSON(), postgresql_using='parameters::json')
@@ -0,0 +1,40 @@
+"""feed_keyset_indexes
+
+Revision ID: c5d2e7a94b18
+Revises: a3c81f5d6e92
+Create Date: 2026-10-18 18:24:51.730462
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e7a94b18'
+down_revision = 'a3c81f5d6e92'
+branch_labels = None
+depends_on = None
+
+FEEDS = {
+    'usernotification': ('user_id', 'coproductionprocess_id'),
+    'coproductionprocessnotification': ('coproductionprocess_id', 'asset_id'),
+    'claim': ('user_id', 'coproductionprocess_id', 'task_id', 'asset_id'),
+    'assignment': ('user_id', 'coproductionprocess_id', 'task_id', 'asset_id'),
+}
+
+
+def index_name(table, column):
+    return f"ix_{table}_{column.replace('_id', '')}_feed"
+
+
+def upgrade():
+    for table, columns in FEEDS.items():
+        for column in columns:
+            op.create_index(index_name(table, column), table, [column, 'created_at', 'id'])
+    op.create_index('ix_usernotification_unseen', 'usernotification', ['user_id'], postgresql_where=sa.text('state = false'))
+
+
+def downgrade():
+    op.drop_index('ix_usernotification_unseen', table_name='usernotification')
+    for table, columns in FEEDS.items():
+        for column in columns:
+            op.drop_index(index_name(table, column), table_name=table)
@@ -0,0 +1,34 @@
+"""asset_acls
+
+Revision ID: e8b4a6f21c73
+Revises: c5d2e7a94b18
+Create Date: 2026-10-18 19:10:37.902154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'e8b4a6f21c73'
+down_revision = 'c5d2e7a94b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('assetacl',
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('asset_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('users', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('pushed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['asset.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('asset_id')
+    )
+    op.create_index('ix_assetacl_users', 'assetacl', ['users'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_assetacl_users', table_name='assetacl')
+    op.drop_table('assetacl')
@@ -0,0 +1,43 @@
+"""outbox_messages
+
+Revision ID: f1a9c3d5b207
+Revises: e8b4a6f21c73
+Create Date: 2026-10-18 20:02:18.640317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f1a9c3d5b207'
+down_revision = 'e8b4a6f21c73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outboxmessage',
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.Column('seq', sa.BigInteger(), sa.Identity(), nullable=False),
+    sa.Column('aggregate', sa.String(), nullable=True),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'delivered', 'failed', name='outboxstatus', native_enum=False, create_constraint=False), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('seq')
+    )
+    op.create_index('ix_outboxmessage_pending', 'outboxmessage', ['seq'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+    op.create_index('ix_outboxmessage_pending_aggregate', 'outboxmessage', ['aggregate', 'seq'], unique=False, postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_outboxmessage_pending_aggregate', table_name='outboxmessage')
+    op.drop_index('ix_outboxmessage_pending', table_name='outboxmessage')
+    op.drop_table('outboxmessage')
@@ -0,0 +1,288 @@
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import redis
+import requests
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.models import (
+    Asset,
+    AssetAcl,
+    CoproductionProcess,
+    InternalAsset,
+    Permission,
+    User,
+    coproductionprocess_administrators_association_table,
+    user_team_association_table,
+)
+from app.permissions.resolver import PermissionResolver
+from app.treeitems.models import closure
+
+logger = logging.getLogger(__name__)
+
+PENDING = ("treeitem_ids", "user_ids", "coproductionprocess_ids")
+
+
+class AclSync:
+    """
+    Keeps the users of the internal assets up to date in the backends of their interlinkers.
+
+    `request` only records the ids of what changed (treeitems, users or whole processes): they are
+    added to Redis sets and the first request of a window schedules the job that syncs all of them,
+    so a copy or a schema change that touches hundreds of permissions costs one job. The job works
+    out the users with access to every asset of the affected tasks, compares them with the ones last
+    pushed (AssetAcl) and only sends the assets that changed. Services whose software interlinker has
+    the `bulk` capability get one POST /assets/sync_users with the changes of all their assets; the
+    rest get the full list of every changed asset in POST {asset}/sync_users, as before. The assets
+    that fail are retried with backoff (kept in their AssetAcl) until `max_attempts`.
+    """
+
+    def __init__(
+        self, redis_url: str = None, key_prefix: str = "aclsync", window: float = 5, timeout: float = 10,
+        max_attempts: int = 8, backoff: float = 30, max_backoff: float = 3600
+    ):
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.window = window
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._redis: Optional[redis.Redis] = None
+
+    def key(self, name: str) -> str:
+        return f"{self.key_prefix}:{name}"
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(self.redis_url)
+        return self._redis
+
+    def request(self, treeitem_ids: Iterable = (), user_ids: Iterable = (), coproductionprocess_ids: Iterable = ()):
+        from app.worker import sync_acls
+
+        pending = {
+            "treeitem_ids": {str(id) for id in treeitem_ids if id},
+            "user_ids": {str(id) for id in user_ids if id},
+            "coproductionprocess_ids": {str(id) for id in coproductionprocess_ids if id},
+        }
+        if not any(pending.values()):
+            return
+        if self.redis_url:
+            try:
+                pipe = self.redis.pipeline()
+                for name, ids in pending.items():
+                    if ids:
+                        pipe.sadd(self.key(name), *ids)
+                # only the first request of the window schedules the job, the expiration covers a lost job
+                pipe.set(self.key("scheduled"), 1, nx=True, ex=int(self.window) + 60)
+                scheduled = pipe.execute()[-1]
+                if scheduled:
+                    sync_acls.apply_async(countdown=self.window)
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Could not queue the sync of the users of the assets in Redis: {repr(e)}")
+        sync_acls.apply_async(kwargs={name: list(ids) for name, ids in pending.items()}, countdown=self.window)
+
+    def pop_pending(self) -> Dict[str, Set[str]]:
+        """
+        Takes the ids requested since the job was scheduled, the next request schedules another job.
+        """
+        pending = {name: set() for name in PENDING}
+        if not self.redis_url:
+            return pending
+        try:
+            pipe = self.redis.pipeline()
+            pipe.delete(self.key("scheduled"))
+            for name in PENDING:
+                pipe.smembers(self.key(name))
+                pipe.delete(self.key(name))
+            results = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Could not read the pending syncs of the users of the assets: {repr(e)}")
+            return pending
+        for index, name in enumerate(PENDING):
+            pending[name] = {id.decode() for id in results[1 + 2 * index]}
+        return pending
+
+    def assets_of(self, db: Session, treeitem_ids: Iterable[str], user_ids: Iterable[str], coproductionprocess_ids: Iterable[str]) -> List[InternalAsset]:
+        """
+        The internal assets under the treeitems and processes, and the ones the users may have access to.
+        """
+        ids = set(treeitem_ids) | set(coproductionprocess_ids)
+        user_ids = list(user_ids)
+        if user_ids:
+            # the processes where the teams of the users have permissions or the users are administrators...
+            team_ids = select(user_team_association_table.c.team_id).where(user_team_association_table.c.user_id.in_(user_ids))
+            ids |= {id for id, in db.query(Permission.coproductionprocess_id).filter(Permission.team_id.in_(team_ids)).distinct()}
+            ids |= {id for id, in db.query(coproductionprocess_administrators_association_table.c.coproductionprocess_id).filter(
+                coproductionprocess_administrators_association_table.c.user_id.in_(user_ids)
+            )}
+            # ...and the assets they were synced to, they may have lost the access
+            ids |= {id for id, in db.query(Asset.task_id).join(AssetAcl, AssetAcl.asset_id == Asset.id).filter(
+                or_(*[AssetAcl.users.has_key(user_id) for user_id in user_ids])
+            ).distinct()}
+        if not ids:
+            return []
+        return db.query(InternalAsset).filter(
+            InternalAsset.task_id.in_(select(closure.c.descendant_id).where(closure.c.ancestor_id.in_(ids)))
+        ).all()
+
+    @staticmethod
+    def entry(user: User, administrator: bool) -> dict:
+        return {
+            "emails": [user.email] + (user.additionalEmails or []),
+            "user_id": user.id,
+            "administrator": administrator,
+        }
+
+    def compute(self, db: Session, assets: List[InternalAsset]) -> Dict[InternalAsset, Dict[str, dict]]:
+        """
+        The users with access to every asset, the permissions of each process are loaded once.
+        """
+        acls = {}
+        by_process = defaultdict(list)
+        for asset in assets:
+            by_process[asset.coproductionprocess_id or asset.task.coproductionprocess_id].append(asset)
+        for coproductionprocess_id, process_assets in by_process.items():
+            coproductionprocess = db.query(CoproductionProcess).get(coproductionprocess_id)
+            if not coproductionprocess:
+                continue
+            resolver = PermissionResolver.load(db, coproductionprocess)
+            # the members of the teams with permissions in the process and the administrators
+            team_ids = {team_id for team_id, _ in resolver.index}
+            users = db.query(User).options(selectinload(User.teams)).filter(or_(
+                User.id.in_(select(user_team_association_table.c.user_id).where(user_team_association_table.c.team_id.in_(team_ids))),
+                User.id.in_(resolver.administrator_ids),
+            )).order_by(User.id).all()
+
+            by_task = {}
+            for asset in process_assets:
+                if asset.task_id not in by_task:
+                    by_task[asset.task_id] = {
+                        user.id: self.entry(user, user.id in resolver.administrator_ids)
+                        for user in users if resolver.user_can(user, asset.task_id, "access_assets_permission")
+                    }
+                acls[asset] = by_task[asset.task_id]
+        return acls
+
+    @staticmethod
+    def diff(pushed: Dict[str, dict], users: Dict[str, dict]) -> Optional[dict]:
+        add = [entry for user_id, entry in users.items() if pushed.get(user_id) != entry]
+        remove = [user_id for user_id in pushed if user_id not in users]
+        if not add and not remove:
+            return None
+        return {"add": add, "remove": remove}
+
+    @staticmethod
+    def supports_bulk(assets: List) -> bool:
+        return all((asset.software_response or {}).get("bulk") for asset in assets)
+
+    def push(self, changes: Dict[InternalAsset, dict]) -> Set:
+        """
+        Sends the changes grouped by service, returns the ids of the assets that were synced.
+        """
+        synced = set()
+        by_service = defaultdict(list)
+        for asset in changes:
+            by_service[(asset.software_response or {}).get("service_name")].append(asset)
+        for service, assets in by_service.items():
+            with requests.Session() as session:
+                if service and self.supports_bulk(assets):
+                    try:
+                        session.post(f"http://{service}/assets/sync_users", timeout=self.timeout, json={"assets": [{
+                            "id": asset.external_asset_id,
+                            "add": changes[asset]["add"],
+                            "remove": changes[asset]["remove"],
+                        } for asset in assets]}).raise_for_status()
+                        synced |= {asset.id for asset in assets}
+                        continue
+                    except requests.RequestException as e:
+                        logger.warning(f"Bulk sync of the users to {service} failed, syncing every asset: {repr(e)}")
+                for asset in assets:
+                    try:
+                        session.post(asset.internal_link + "/sync_users", timeout=self.timeout, json=list(changes[asset]["users"].values())).raise_for_status()
+                        synced.add(asset.id)
+                    except requests.RequestException as e:
+                        logger.warning(f"Could not sync the users of the asset {asset.id} to {service}: {repr(e)}")
+        return synced
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+    def record(self, pushed: Dict, changes: Dict[InternalAsset, dict], synced: Set, now: datetime) -> List[AssetAcl]:
+        """
+        Keeps the users of the synced assets and counts the failed attempt of the rest in their ACLs
+        (added to `pushed`), returns the new ones.
+        """
+        created = []
+        for asset in changes:
+            acl = pushed.get(asset.id)
+            if acl is None:
+                acl = pushed[asset.id] = AssetAcl(asset_id=asset.id, users={}, attempts=0)
+                created.append(acl)
+            if asset.id in synced:
+                acl.users = changes[asset]["users"]
+                acl.pushed_at = now
+                acl.attempts = 0
+                acl.next_attempt_at = None
+                continue
+            acl.attempts = (acl.attempts or 0) + 1
+            if acl.attempts < self.max_attempts:
+                acl.next_attempt_at = now + timedelta(seconds=self.retry_delay(acl.attempts))
+            else:
+                # tried again with the next change of its users
+                acl.next_attempt_at = None
+                logger.error(f"Gave up syncing the users of the asset {asset.id} after {acl.attempts} attempts")
+        return created
+
+    def retry(self, treeitem_ids: Set, at: datetime):
+        from app.worker import sync_acls
+        sync_acls.apply_async(
+            kwargs={"treeitem_ids": [str(id) for id in treeitem_ids]},
+            countdown=max(self.window, (at - datetime.now()).total_seconds()),
+        )
+
+    def sync(self, db: Session, treeitem_ids: Iterable[str] = (), user_ids: Iterable[str] = (), coproductionprocess_ids: Iterable[str] = ()):
+        acls = self.compute(db, self.assets_of(db, treeitem_ids, user_ids, coproductionprocess_ids))
+        if not acls:
+            return
+        pushed = {acl.asset_id: acl for acl in db.query(AssetAcl).filter(AssetAcl.asset_id.in_([asset.id for asset in acls]))}
+        now = datetime.now()
+        changes = {}
+        # the ones whose last push failed wait for their retry
+        waiting = []
+        for asset, users in acls.items():
+            acl = pushed.get(asset.id)
+            if change := self.diff(acl.users if acl else {}, users):
+                if acl and acl.next_attempt_at and acl.next_attempt_at > now:
+                    waiting.append(asset)
+                    continue
+                changes[asset] = {**change, "users": users}
+        if changes:
+            synced = self.push(changes)
+            db.add_all(self.record(pushed, changes, synced, now))
+            logger.info(f"Users of {len(synced)} of {len(changes)} changed assets synced")
+
+        # one retry, when the first of them is due: it reschedules the rest
+        retry = [asset for asset in waiting + list(changes) if pushed[asset.id].next_attempt_at]
+        if retry:
+            self.retry({asset.task_id for asset in retry}, min(pushed[asset.id].next_attempt_at for asset in retry))
+        db.commit()
+
+
+acl_sync = AclSync(
+    redis_url=settings.ACL_SYNC_REDIS_URL,
+    key_prefix=settings.ACL_SYNC_KEY_PREFIX,
+    window=settings.ACL_SYNC_WINDOW,
+    timeout=settings.ACL_SYNC_TIMEOUT,
+    max_attempts=settings.ACL_SYNC_MAX_ATTEMPTS,
+    backoff=settings.ACL_SYNC_RETRY_BACKOFF,
+    max_backoff=settings.ACL_SYNC_RETRY_MAX_BACKOFF,
+)
@@ -4,7 +4,7 @@ from typing import Any, List, Optional
 import requests
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
 from app import crud, models, schemas
 from app.config import settings
@@ -17,8 +17,10 @@ from app.models import CoproductionProcessNotification
 from sqlalchemy import or_, and_
 from app.models import UserNotification
 
-from app.general.emails import send_email, send_team_email
+from app.fanout import notification_fanout
+from app.general.emails import prepare, queue, send_email, send_team_email
 
+from app.notifications.parameters import notification_parameters
 import html
 
 router = APIRouter()
@@ -248,47 +250,40 @@ async def create_copro_notification(
 
     if (coproductionprocess := await crud.coproductionprocess.get(db=db, id=data.processId)):
         if crud.coproductionprocess.can_update(user=current_user, object=coproductionprocess):
-            for team_id in data.listTeams:
-                if (team := await crud.team.get(db=db, id=team_id)):
-
-                    for user_id in team.user_ids:
-                        if (user := await crud.user.get(db=db, id=user_id)):
-                             #Lets create a notification in-app of the solicitude.
-                            notification = await crud.notification.get_notification_by_event(db=db, event="assign_resource", language=coproductionprocess.language)
-                            if (notification):
-
-                                #Create the notification:
-
-                                newUserNotification = UserNotification()
-                                newUserNotification.user_id = user.id
-
-                                newUserNotification.notification_id = notification.id
-                                newUserNotification.channel = "in_app"
-                                newUserNotification.state = False
-                                newUserNotification.coproductionprocess_id = str(
-                                    coproductionprocess.id)
-                                newUserNotification.parameters = "{'resourceName':'"+data.asset_name+"','taskName':'"+data.taskName+"','resourceId':'"+str(data.resourceId)+"','processName':'"+html.escape(
-                                    coproductionprocess.name)+"','coproId':'"+str(coproductionprocess.id)+"'}"
-
-                                
-                                db.add(newUserNotification)
-                                db.commit()
-                                db.refresh(newUserNotification)
-
-                                #Send email to user
-
-
-                                try:
-                                    send_email(user.email, "ask_team_contribution",
-                                                {"link": data.assigmentDict[user_id],
-                                                    "icon_link": data.icon,
-                                                    "instructions": data.instructions,
-                                                    "asset_name": data.asset_name,
-                                                    "subject": data.subject
-                                                    })
-                                    
-                                except:
-                                    print("Email could not be send to user"+user.email+" contributions")
+            #Lets create a notification in-app of the solicitude.
+            notification = await notification_fanout.template(db, "assign_resource", coproductionprocess.language)
+            if (notification):
+                # the members of all the teams, loaded together and notified once each
+                teams = db.query(models.Team).options(selectinload(models.Team.users)).filter(models.Team.id.in_(data.listTeams)).all()
+                users = list({user.id: user for team in teams for user in team.users}.values())
+
+                notification_fanout.add_to_users(
+                    db, notification, [user.id for user in users],
+                    notification_parameters(
+                        resourceName=data.asset_name,
+                        taskName=data.taskName,
+                        resourceId=data.resourceId,
+                        processName=html.escape(coproductionprocess.name),
+                        coproId=coproductionprocess.id,
+                    ),
+                    coproductionprocess_id=coproductionprocess.id,
+                )
+                #Send email to users, queued together in the same transaction
+                messages = []
+                for user in users:
+                    try:
+                        messages.append(prepare(user.email, "ask_team_contribution",
+                                                {"link": data.assigmentDict[user.id],
+                                                 "icon_link": data.icon,
+                                                 "instructions": data.instructions,
+                                                 "asset_name": data.asset_name,
+                                                 "subject": data.subject
+                                                 }))
+                    except:
+                        print("Email could not be send to user"+user.email+" contributions")
+                if messages and settings.EMAILS_ENABLED:
+                    queue(messages, db=db)
+                db.commit()
 
     return "Done"
 
@@ -320,17 +315,18 @@ async def create_user_copro_notification(
                     newUserNotification.state = False
                     newUserNotification.coproductionprocess_id = str(
                         coproductionprocess.id)
-                    newUserNotification.parameters = "{'resourceName':'"+data.asset_name+"','taskName':'"+data.taskName+"','resourceId':'"+str(data.resourceId)+"','processName':'"+html.escape(
-                        coproductionprocess.name)+"','coproId':'"+str(coproductionprocess.id)+"'}"
+                    newUserNotification.parameters = notification_parameters(
+                        resourceName=data.asset_name,
+                        taskName=data.taskName,
+                        resourceId=data.resourceId,
+                        processName=html.escape(coproductionprocess.name),
+                        coproId=coproductionprocess.id,
+                    )
 
                     
                     db.add(newUserNotification)
-                    db.commit()
-                    db.refresh(newUserNotification)
-
 
-
-                    #Send email to user
+                    #Send email to user, in the same transaction
                     try:
                         send_email(user.email, "ask_team_contribution",
                                         {"link": data.link,
@@ -338,11 +334,15 @@ async def create_user_copro_notification(
                                             "instructions": data.instructions,
                                             "asset_name": data.asset_name,
                                             "subject": data.subject
-                                            })
+                                            },
+                                        db=db)
                     except:
                         
                             print("Email could not be send to team user:"+user.email)
 
+                    db.commit()
+                    db.refresh(newUserNotification)
+
 
                     #Send email to user
                     # print("")
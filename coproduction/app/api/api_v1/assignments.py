@@ -3,63 +3,77 @@ import uuid
 from typing import Any, List, Optional
 
 import aiofiles
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import user
 
 from app import crud, models, schemas
 from app.general import deps
+from app.catalogue import interlinker_cache
+from app.general.utils.keyset import KeysetPage
 
 router = APIRouter()
 
 
 @router.get("", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_assignments(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_multi(db=db, user=current_user)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_multi(db=db, user=current_user, page=page)))
 
 @router.get("/{user_id}/listAssignments", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_assignments_by_user(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     user_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_assignments_by_user(db=db,user_id=user_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_assignments_by_user(db=db,user_id=user_id, page=page)))
 
 @router.get("/{copro_id}/listFullAssignmentsbyCoproId", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_full_assignments_by_copro(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_full_list_assignments_by_coproId(db=db,copro_id=copro_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_full_list_assignments_by_coproId(db=db,copro_id=copro_id, page=page)))
 
 @router.get("/{copro_id}/listFullAssignmentsbyCoproIdUserId", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_full_assignments_by_copro_by_user(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_full_list_assignments_by_coproId_by_userId(db=db,copro_id=copro_id,user_id=current_user.id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_full_list_assignments_by_coproId_by_userId(db=db,copro_id=copro_id,user_id=current_user.id, page=page)))
 
 @router.get("/{task_id}/listFullAssignmentsbyTaskId", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_full_assignments_by_task(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     task_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_full_list_assignments_by_taskId(db=db,task_id=task_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_full_list_assignments_by_taskId(db=db,task_id=task_id, page=page)))
 
 @router.get("/{asset_id}/listFullAssignmentsbyAssetId", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_full_assignments_by_asset(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     asset_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_full_list_assignments_by_assetId(db=db,asset_id=asset_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_full_list_assignments_by_assetId(db=db,asset_id=asset_id, page=page)))
 
 
 
@@ -85,25 +99,29 @@ async def list_assignments_bycopro_byassign(
             status_code=400,
             detail="The user is not assigned to the assignment",
         )
-    return assignment
+    return await interlinker_cache.load_for_assets_of(assignment)
 
 
 @router.get("/{copro_id}/listPendingAssignmentsbyCoproId", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_assignments_bycopro(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_pending_list_assignments_by_copro(db=db,copro_id=copro_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_pending_list_assignments_by_copro(db=db,copro_id=copro_id, page=page)))
 
 #Specific for a user:
 @router.get("/{copro_id}/listPendingAssignmentsbyCoproIdUserId", response_model=Optional[List[schemas.AssignmentOutFull]])
 async def list_assignments_bycopro_byuser(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.assignment.get_pending_list_assignments_by_copro_by_user(db=db,copro_id=copro_id,user_id=current_user.id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.assignment.get_pending_list_assignments_by_copro_by_user(db=db,copro_id=copro_id,user_id=current_user.id, page=page)))
 
 
 @router.post("", response_model=Optional[schemas.AssignmentOutFull])
@@ -116,7 +134,7 @@ async def create_assignment(
     """
     Create new assignment.
     """
-    return await crud.assignment.create(db=db, obj_in=assignment_in)
+    return await interlinker_cache.load_for_assets_of(await crud.assignment.create(db=db, obj_in=assignment_in))
     
 @router.post("/create_user_list", response_model=List[schemas.AssignmentOutFull])
 async def create_user_list(
@@ -129,7 +147,7 @@ async def create_user_list(
     Create new assignments from a list.
     """
     assignments = await crud.assignment.create_user_list(db=db, obj_in=assignment_in)
-    return assignments
+    return await interlinker_cache.load_for_assets_of(assignments)
 
 
 @router.post("/create_team_list", response_model=List[schemas.AssignmentOutFull])
@@ -144,7 +162,7 @@ async def create_team_list(
     """
 
     assignments = await crud.assignment.create_team_list(db=db, obj_in=assignment_in)
-    return assignments
+    return await interlinker_cache.load_for_assets_of(assignments)
 
 
 
@@ -164,7 +182,7 @@ async def archive_assignment(
 
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    return await crud.assignment.update(db=db, db_obj=assignment, obj_in=assignment_in)
+    return await interlinker_cache.load_for_assets_of(await crud.assignment.update(db=db, db_obj=assignment, obj_in=assignment_in))
 
 
 @router.get("/{id}", response_model=Optional[schemas.AssignmentOutFull])
@@ -180,7 +198,7 @@ async def read_assignment(
     assignment = await crud.assignment.get(db=db, id=id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    return assignment
+    return await interlinker_cache.load_for_assets_of(assignment)
 
 
 
@@ -3,65 +3,79 @@ import uuid
 from typing import Any, List, Optional
 
 import aiofiles
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import user
 
 from app import crud, models, schemas
 from app.general import deps
+from app.catalogue import interlinker_cache
+from app.general.utils.keyset import KeysetPage
 
 router = APIRouter()
 
 
 @router.get("", response_model=Optional[List[schemas.ClaimOutFull]])
 async def list_claims(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.claim.get_multi(db=db, user=current_user)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.claim.get_multi(db=db, user=current_user, page=page)))
 
 @router.get("/{user_id}/listClaims", response_model=Optional[List[schemas.ClaimOutFull]])
 async def list_claims_by_user(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     user_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.claim.get_claims_by_user(db=db,user_id=user_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.claim.get_claims_by_user(db=db,user_id=user_id, page=page)))
 
 @router.get("/{copro_id}/listFullClaimsbyCoproId", response_model=Optional[List[schemas.ClaimOutFull]])
 async def list_full_claims_by_copro(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.claim.get_full_list_claims_by_coproId(db=db,copro_id=copro_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.claim.get_full_list_claims_by_coproId(db=db,copro_id=copro_id, page=page)))
 
 @router.get("/{task_id}/listFullClaimsbyTaskId", response_model=Optional[List[schemas.ClaimOutFull]])
 async def list_full_claims_by_task(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     task_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.claim.get_full_list_claims_by_taskId(db=db,task_id=task_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.claim.get_full_list_claims_by_taskId(db=db,task_id=task_id, page=page)))
 
 @router.get("/{asset_id}/listFullClaimsbyAssetId", response_model=Optional[List[schemas.ClaimOutFull]])
 async def list_full_claims_by_asset(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     asset_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.claim.get_full_list_claims_by_assetId(db=db,asset_id=asset_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.claim.get_full_list_claims_by_assetId(db=db,asset_id=asset_id, page=page)))
 
 
 
 @router.get("/{copro_id}/listPendingClaimsbyCoproId", response_model=Optional[List[schemas.ClaimOutFull]])
 async def list_claims_bycopro(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.claim.get_pending_list_claims_by_copro(db=db,copro_id=copro_id)
+    return page.respond(response, await interlinker_cache.load_for_assets_of(await crud.claim.get_pending_list_claims_by_copro(db=db,copro_id=copro_id, page=page)))
 
 
 @router.post("", response_model=Optional[schemas.ClaimOutFull])
@@ -74,7 +88,7 @@ async def create_claim(
     """
     Create new claim.
     """
-    return await crud.claim.create(db=db, obj_in=claim_in)
+    return await interlinker_cache.load_for_assets_of(await crud.claim.create(db=db, obj_in=claim_in))
     
 @router.post("/create_user_list", response_model=List[schemas.ClaimOutFull])
 async def create_user_list(
@@ -87,7 +101,7 @@ async def create_user_list(
     Create new claims from a list.
     """
     claims = await crud.claim.create_user_list(db=db, obj_in=claim_in)
-    return claims
+    return await interlinker_cache.load_for_assets_of(claims)
 
 
 @router.post("/create_team_list", response_model=List[schemas.ClaimOutFull])
@@ -102,7 +116,7 @@ async def create_team_list(
     """
 
     claims = await crud.claim.create_team_list(db=db, obj_in=claim_in)
-    return claims
+    return await interlinker_cache.load_for_assets_of(claims)
 
 
 
@@ -122,7 +136,7 @@ async def archive_claim(
 
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
-    return await crud.claim.update(db=db, db_obj=claim, obj_in=claim_in)
+    return await interlinker_cache.load_for_assets_of(await crud.claim.update(db=db, db_obj=claim, obj_in=claim_in))
 
 
 @router.get("/{id}", response_model=Optional[schemas.ClaimOutFull])
@@ -138,7 +152,7 @@ async def read_claim(
     claim = await crud.claim.get(db=db, id=id)
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
-    return claim
+    return await interlinker_cache.load_for_assets_of(claim)
 
 
 
@@ -4,47 +4,56 @@ from typing import Any, List, Optional
 
 import aiofiles
 import json
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.sql.functions import user
 
 from app import crud, models, schemas
 from app.general import deps
+from app.general.utils.keyset import KeysetPage
 from app.models import CoproductionProcessNotification
+from app.notifications.parameters import parse_parameters
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[schemas.CoproductionProcessNotificationOutFull])
 async def list_coproductionprocessnotificationsbyUset(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(
         deps.get_current_active_user),
-
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.coproductionprocessnotification.get_multi(db=db, user=current_user)
+    return page.respond(response, await crud.coproductionprocessnotification.get_multi(db=db, user=current_user, page=page))
 
 
 @router.get("/{coproductionprocess_id}/listCoproductionProcessNotifications", response_model=List[schemas.CoproductionProcessNotificationOutFull])
 async def list_coproductionprocessnotificationsbyCopro(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(
         deps.get_current_active_user),
     coproductionprocess_id: str = '',
+    treeitem_id: Optional[str] = None,
+    team_id: Optional[str] = None,
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.coproductionprocessnotification.get_coproductionprocess_notifications(db=db, coproductionprocess_id=coproductionprocess_id, user=current_user)
+    return page.respond(response, await crud.coproductionprocessnotification.get_coproductionprocess_notifications(db=db, coproductionprocess_id=coproductionprocess_id, user=current_user, treeitem_id=treeitem_id, team_id=team_id, page=page))
 
 
 @router.get("/{coproductionprocess_id}/{asset_id}/listCoproductionProcessNotifications", response_model=List[schemas.CoproductionProcessNotificationOutFull])
 async def list_coproductionprocessnotificationsbyAsset(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(
         deps.get_current_active_user),
     coproductionprocess_id: str = '',
     asset_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.coproductionprocessnotification.get_coproductionprocess_notifications_byAseetId(db=db, coproductionprocess_id=coproductionprocess_id, asset_id=asset_id)
+    return page.respond(response, await crud.coproductionprocessnotification.get_coproductionprocess_notifications_byAseetId(db=db, coproductionprocess_id=coproductionprocess_id, asset_id=asset_id, page=page))
 
 
 # @router.get("/users/{username}", tags=["users"])
@@ -86,9 +95,9 @@ async def create_copro_notification(
 
     if coproductionprocessnotification_in.isTeam:
         listaDeTeams = coproductionprocessnotification_in.user_id.split(',')
+        teams = {str(team.id): team for team in db.query(models.Team).options(selectinload(models.Team.users)).filter(models.Team.id.in_(listaDeTeams))}
         for team_id in listaDeTeams:
-            team = await crud.team.get(db=db, id=team_id)
-            listaDeUsuarioTemp = team.user_ids
+            listaDeUsuarioTemp = teams[team_id].user_ids
             for userItem in listaDeUsuarioTemp:
                 if (userItem not in listaDeUsuario):
                     listaDeUsuario.append(userItem)
@@ -119,15 +128,17 @@ async def create_copro_notification(
         new += l[-1].title()
         return new
 
+    # the users with their teams, the asset and the permissions of the process are loaded once for all of them
+    usuarios = {user.id: user for user in db.query(models.User).options(selectinload(models.User.teams)).filter(models.User.id.in_(listaDeUsuario))}
+    datosAsset = await crud.asset.get(db=db, id=coproductionprocessnotification_in.asset_id)
+    resolver = crud.permission.get_resolver(db=db, coproductionprocess=datosAsset.task.coproductionprocess)
+
     for usuario in listaDeUsuario:
         # Add the user to the notification
-        import json
-        datosUser = await crud.user.get(db=db, id=usuario)
-        datosAsset = await crud.asset.get(db=db, id=coproductionprocessnotification_in.asset_id)
+        datosUser = usuarios[usuario]
 
         # Valido que el usuario sea parte de almenos un equipo asignado a un recurso:
-        permisos_user = crud.permission.get_dict_for_user_and_treeitem(
-            db=db, user=datosUser, treeitem=datosAsset.task)
+        permisos_user = resolver.get_dict(datosUser, datosAsset.task)
 
         # In case the user dont have rights is excluded from the notification creation
         if (permisos_user['access_assets_permission'] is False):
@@ -137,22 +148,23 @@ async def create_copro_notification(
         # print('Los permisos sobre el asset son:')
         # print(permisos_user)
 
-        newCoproNotification = CoproductionProcessNotification()
-        newCoproNotification.user_id = datosUser.id
-        newCoproNotification.notification_id = notification.id
-        newCoproNotification.claim_type = coproductionprocessnotification_in.claim_type
-        newCoproNotification.coproductionprocess_id = coproductionprocessnotification_in.coproductionprocess_id
-        newCoproNotification.asset_id = coproductionprocessnotification_in.asset_id
+        newCoproNotification = {
+            "user_id": datosUser.id,
+            "notification_id": notification.id,
+            "claim_type": coproductionprocessnotification_in.claim_type,
+            "coproductionprocess_id": coproductionprocessnotification_in.coproductionprocess_id,
+            "asset_id": coproductionprocessnotification_in.asset_id,
+        }
 
-        json_parameters = json.loads(
-            coproductionprocessnotification_in.parameters)
+        json_parameters = dict(parse_parameters(
+            coproductionprocessnotification_in.parameters))
         json_parameters['userName'] = shortName(datosUser.full_name)
-        newCoproNotification.parameters = json.dumps(json_parameters)
+        newCoproNotification["parameters"] = json_parameters
 
 
         #If there is a claim_id in the parameters I will use it as id of the notification
         if 'claim_id' in json_parameters:
-            newCoproNotification.id = json_parameters['claim_id'] 
+            newCoproNotification["id"] = json_parameters['claim_id']
 
         listaRegistros.append(newCoproNotification)
 
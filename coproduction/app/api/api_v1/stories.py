@@ -1,12 +1,12 @@
 import os
 import uuid
 import copy
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Union
 
 import aiofiles
 import json
 from fastapi_pagination import Page
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import user
@@ -16,22 +16,25 @@ from app.general import deps
 from app.models import Story
 from typing import Dict,Any
 from app.locales import get_language
+from app.general.utils.keyset import KeysetPage
 
 
 router = APIRouter()
 
 
-@router.get("", response_model=Page[Any])
+@router.get("", response_model=Union[Page[Any], List[Any]])
 async def list_stories(
+    response: Response,
     rating: Optional[int] = Query(None),
     search: Optional[str] = Query(None),
     keyword: Optional[str] = Query(None),
     db: Session = Depends(deps.get_db),
     current_user: Optional[dict] = Depends(deps.get_current_user),
-    language: str = Depends(get_language)
+    language: str = Depends(get_language),
+    page: KeysetPage = Depends(),
 ) -> Any:
     """
-    Retrieve stories.
+    Retrieve stories, the best matches first when searching. With limit or cursor, a list in keyset pages.
     """
     # print("La busqueda es:")
     # print(search)
@@ -40,7 +43,7 @@ async def list_stories(
     # print("El keyword es:")
     # print(keyword)
     
-    return await crud.story.get_multiDict(db, search=search,  rating=rating,  language=language, keyword=keyword)
+    return page.respond(response, await crud.story.get_multiDict(db, search=search,  rating=rating,  language=language, keyword=keyword, page=page))
 
 # @router.get("", response_model=List[schemas.StoryOutFull])
 # async def list_storiesbyUser(
@@ -3,65 +3,87 @@ import uuid
 from typing import Any, List, Optional
 
 import aiofiles
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import user
 
 from app import crud, models, schemas
 from app.general import deps
+from app.general.utils.keyset import KeysetPage
 
 router = APIRouter()
 
 
 @router.get("", response_model=Optional[List[schemas.UserNotificationOutFull]])
 async def list_usernotifications(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
-  
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.usernotification.get_multi(db=db, user=current_user)
+    return page.respond(response, await crud.usernotification.get_multi(db=db, user=current_user, page=page))
 
 @router.get("/{user_id}/listUserNotifications", response_model=Optional[List[schemas.UserNotificationOutFull]])
 async def list_user_notifications(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     user_id: str = '',
+    copro_id: Optional[str] = None,
+    team_id: Optional[str] = None,
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.usernotification.get_user_notifications(db=db,user_id=user_id)
+    return page.respond(response, await crud.usernotification.get_user_notifications(db=db,user_id=user_id,copro_id=copro_id,team_id=team_id, page=page))
 
 @router.get("/{copro_id}/listUserAplicationsbyCoproId", response_model=Optional[List[schemas.UserNotificationOutFull]])
 async def list_useraplications(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.usernotification.get_list_user_aplications_by_copro(db=db,copro_id=copro_id)
+    return page.respond(response, await crud.usernotification.get_list_user_aplications_by_copro(db=db,copro_id=copro_id, page=page))
 
 @router.get("/{copro_id}/listUserAplicationsHistorybyCoproId", response_model=Optional[List[schemas.UserNotificationOutFull]])
 async def list_useraplicationshistory(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.usernotification.get_list_user_aplicationshistory_by_copro(db=db,copro_id=copro_id)
+    return page.respond(response, await crud.usernotification.get_list_user_aplicationshistory_by_copro(db=db,copro_id=copro_id, page=page))
 
 @router.get("/{user_id}/listUnseenUserNotifications", response_model=Optional[List[schemas.UserNotificationOutFull]])
 async def list_unseenusernotifications(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     user_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.usernotification.get_unseen_user_notifications(db=db,user_id=user_id)
+    return page.respond(response, await crud.usernotification.get_unseen_user_notifications(db=db,user_id=user_id, page=page))
 
 
+@router.get("/{user_id}/countUnseenUserNotifications")
+async def count_unseenusernotifications(
+    db: Session = Depends(deps.get_db),
+    current_user: Optional[models.User] = Depends(deps.get_current_active_user),
+    user_id: str = '',
+) -> Any:
+    return {"count": await crud.usernotification.count_unseen_user_notifications(db=db, user_id=user_id)}
+
 @router.get("/{copro_id}/listNotificationsbyCopro", response_model=Optional[List[schemas.UserNotificationOutFull]])
 async def list_usernotifications_bycopro(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: Optional[models.User] = Depends(deps.get_current_active_user),
     copro_id: str = '',
+    page: KeysetPage = Depends(),
 ) -> Any:
-    return await crud.usernotification.get_user_notifications_by_coproid(db=db,copro_id=copro_id)
+    return page.respond(response, await crud.usernotification.get_user_notifications_by_coproid(db=db,copro_id=copro_id, page=page))
 
 
 @router.post("", response_model=Optional[schemas.UserNotificationOutFull])
@@ -1,13 +1,22 @@
-from typing import Any
+import uuid
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from pydantic.networks import EmailStr
+from sqlalchemy.orm import Session
 
-from app import models
+from app import crud, models, schemas
+from app.catalogue import interlinker_cache
+from app.enrichment import asset_enricher
 from app.celery_app import celery_app
+from app.general.db.session import get_pool_status
+from app.general import deps
 from app.general.deps import get_current_active_superuser
 from app.general.emails import send_test_email
+from app.messages import log_shipper
+from app.sockets import socket_manager
+from app.utils import EmailStatus
 
 
 class Msg(BaseModel):
@@ -38,4 +47,106 @@ def test_email(
     Test emails.
     """
     send_test_email(email_to=email_to)
-    return {"msg": "Test email sent"}
+    return {"msg": "Test email queued"}
+
+
+@router.get("/emails", response_model=List[schemas.OutboundEmailOut])
+async def list_emails(
+    status: Optional[EmailStatus] = None,
+    email_to: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Queued, sent and failed emails, the most recent first.
+    """
+    return await crud.outboundemail.get_multi_filtered(db, status=status, email_to=email_to, skip=skip, limit=limit)
+
+
+@router.get("/emails/{id}", response_model=schemas.OutboundEmailOut)
+async def read_email(
+    id: uuid.UUID,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Delivery status of an email.
+    """
+    if not (email := await crud.outboundemail.get(db=db, id=id)):
+        raise HTTPException(status_code=404, detail="Email not found")
+    return email
+
+
+@router.post("/emails/send", response_model=Msg)
+def send_queued_emails(
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Ask the worker to deliver the queued emails that are due.
+    """
+    celery_app.send_task("app.worker.send_emails")
+    return {"msg": "Delivery scheduled"}
+
+
+@router.get("/db-pool")
+def db_pool_status(
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Connection pool usage of this worker process.
+    """
+    return get_pool_status()
+
+
+@router.get("/log-queue")
+def log_queue_status(
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Queued, sent and dropped entries of the log shipper of this worker process.
+    """
+    return log_shipper.stats()
+
+
+@router.get("/sockets")
+def sockets_status(
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Websocket connections of this worker process and the events delivered to them.
+    """
+    return socket_manager.stats()
+
+
+@router.get("/interlinkers-cache")
+def interlinkers_cache_status(
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Size and hit ratio of the catalogue interlinkers cache of this worker process.
+    """
+    return interlinker_cache.stats()
+
+
+@router.delete("/interlinkers-cache")
+def invalidate_interlinkers_cache(
+    id: Optional[List[uuid.UUID]] = Query(None),
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Forget the cached metadata of the given interlinkers (or of all of them if no id is given).
+    """
+    interlinker_cache.invalidate(id)
+    return interlinker_cache.stats()
+
+
+@router.get("/assets-enrichment")
+def assets_enrichment_status(
+    current_user: models.User = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    State of the circuit breakers of the services asked for the public data of the assets.
+    """
+    return asset_enricher.stats()
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from app.general.db.base_class import Base as BaseModel
+
+
+class AssetAcl(BaseModel):
+    """Users of an internal asset as they were last synced to the backend of its interlinker."""
+    asset_id = Column(UUID(as_uuid=True), ForeignKey("asset.id", ondelete='CASCADE'), primary_key=True)
+    # user id -> {"emails", "user_id", "administrator"}
+    users = Column(JSONB, nullable=False, default=dict)
+    pushed_at = Column(DateTime, nullable=True)
+    # failed pushes since the last one that worked, the next one waits until next_attempt_at
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=True)
+
+    # the assets a user was synced to
+    __table_args__ = (
+        Index('ix_assetacl_users', 'users', postgresql_using='gin'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AssetAcl {self.asset_id} {len(self.users or {})}>"
@@ -3,12 +3,14 @@ import requests
 import os.path
 from app.config import settings
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.models import Asset, InternalAsset, ExternalAsset, CoproductionProcessNotification
 from app.tasks.crud import exportCrud as tasksCrud
 from app.schemas import AssetCreate, AssetPatch, ExternalAssetCreate, InternalAssetCreate
 from app.general.utils.CRUDBase import CRUDBase
 from app import models
+from app.catalogue import interlinker_cache
+from app.enrichment import asset_enricher
 import uuid
 from app.messages import log
 from fastapi.encoders import jsonable_encoder
@@ -21,6 +23,7 @@ from app.notifications.crud import exportCrud as notification_crud
 from app.coproductionprocesses.crud import exportCrud as coproductionprocesses_crud
 from fastapi import Depends
 from app.general import deps
+from app.notifications.parameters import notification_parameters
 import html
 from app.config import settings
 
@@ -32,7 +35,14 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
         queries = []
         if task:
             queries.append(Asset.task_id == task.id)
-        return db.query(Asset).filter(*queries).offset(skip).limit(limit).all()
+        assets = db.query(Asset).filter(*queries).offset(skip).limit(limit).all()
+        await interlinker_cache.load_for_assets(assets)
+        return assets
+
+    async def get(self, db: Session, id: uuid.UUID) -> Optional[Asset]:
+        if asset := await super().get(db=db, id=id):
+            await interlinker_cache.load_for_assets([asset])
+        return asset
 
     async def get_multi_withIntData(
         self, db: Session, task: models.Task, skip: int = 0, limit: int = 100, token: str = ''
@@ -44,83 +54,7 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
         listAssets = db.query(Asset).filter(
             *queries).offset(skip).limit(limit).all()
 
-        # print('Entra en multi_withIntData')
-
-        for asset in listAssets:
-            if asset.type == "internalasset":
-
-                serverName = settings.SERVER_NAME
-                # print("ServerName")
-                # print(serverName)
-
-                if ('loomio' in asset.link):
-
-                    print("Es un loomio")
-                    asset_name = "Loomio File"
-                    import traceback
-
-                    try:
-
-                        print('Asset id is:'+str(asset.external_asset_id))
-                        print('The request is:')
-
-                        cookies = {'auth_token': token}
-                        requestUrl = f"https://loomio/api/v1/assets/{str(asset.external_asset_id)}"
-                        print(requestUrl)
-
-                        response = requests.get(requestUrl, headers={
-                            "Authorization": "Bearer " + token
-                        }, cookies=cookies)
-
-                        responseDataJson = response.json()
-
-                        print('Response:')
-                        print(responseDataJson)
-                        print('--------')
-
-                        asset_name = responseDataJson.name
-                        print(asset_name)
-                    except Exception:
-                        traceback.print_exc()
-                        pass
-
-                    print("loomio")
-                    asset.internalData = {
-                        'icon': 'https://'+serverName+'/catalogue/static/loomio/logotype.png', 'name': asset_name, 'link': asset.link}
-                else:
-
-                    if ('servicepedia' in asset.link):
-                        # print("Servicepedia")
-                        # print('Es servicepedia')
-
-                        requestlink = f"http://augmenterservice/assets/{asset.external_asset_id}"
-                        response = requests.get(requestlink)
-                        datosAsset = response.json()
-                        # print(datosAsset)
-
-                        asset_uri = asset.link+'/view'
-                        asset.internalData = {
-                            'icon': 'https://'+serverName+'/catalogue/static/augmenter/logotype.png', 'name': datosAsset['name'], 'link': asset_uri}
-
-                    else:
-                        # print("Internal Asset")
-                        serviceName = os.path.split(
-                            asset.link)[0].split('/')[3]
-                        requestlink = f"http://{serviceName}/assets/{asset.external_asset_id}"
-
-                        # print(requestlink)
-                        response = requests.get(requestlink)
-
-                        # print(response)
-                        datosAsset = response.json()
-                        asset.internalData = datosAsset
-
-            if asset.type == "externalasset":
-                # print("External Asset")
-                asset.internalData = {'icon': asset.icon,
-                                      'name': asset.name, 'link': asset.uri}
-
-        return listAssets
+        return await asset_enricher.enrich(listAssets, token=token)
 
     def shortName(self, s):
         # split the string into a list
@@ -140,6 +74,7 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
 
     async def remove(self, db: Session, *, id: uuid.UUID) -> Asset:
         db_obj_Aseet = db.query(self.model).get(id)
+        await interlinker_cache.load_for_assets([db_obj_Aseet])
         await self.log_on_remove(db_obj_Aseet)
 
         # Save the event as a notification of coproduction
@@ -165,8 +100,19 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
 
                 assetLink = asset.uri
 
-                newCoproNotification.parameters = "{'showLink':'hidden','showIcon':'','treeitem_id':'"+str(task.id)+"','treeItemName':'"+str(html.escape(task.name))+"','assetId':'"+str(db_obj.id)+"','assetName':'"+html.escape(asset.name)+"','assetLink':'"+str(
-                    assetLink)+"','interlinkerName':'"+html.escape(nameInterlinker)+"','processName':'"+html.escape(coproduction.name)+"','userName':'"+html.escape(self.shortName(db_obj.creator.full_name))+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    showLink="hidden",
+                    showIcon="",
+                    treeitem_id=task.id,
+                    treeItemName=html.escape(task.name),
+                    assetId=db_obj.id,
+                    assetName=html.escape(asset.name),
+                    assetLink=assetLink,
+                    interlinkerName=html.escape(nameInterlinker),
+                    processName=html.escape(coproduction.name),
+                    userName=html.escape(self.shortName(db_obj.creator.full_name)),
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
         if db_obj_Aseet.type == 'internalasset':
             db_obj = db_obj_Aseet
@@ -197,8 +143,19 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
 
                 # Obtengo la info del Asset:
 
-                newCoproNotification.parameters = "{'showLink':'hidden','showIcon':'','treeitem_id':'"+str(task.id)+"','treeItemName':'"+str(html.escape(task.name))+"','assetId':'"+str(db_obj.id)+"','assetName':'{assetid:"+str(db_obj.id)+"}','assetLink':'"+str(
-                    assetLink)+"','interlinkerName':'"+html.escape(nameInterlinker)+"','processName':'"+html.escape(coproduction.name)+"','userName':'"+html.escape(self.shortName(db_obj.creator.full_name))+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    showLink="hidden",
+                    showIcon="",
+                    treeitem_id=task.id,
+                    treeItemName=html.escape(task.name),
+                    assetId=db_obj.id,
+                    assetName="{assetid:"+str(db_obj.id)+"}",
+                    assetLink=assetLink,
+                    interlinkerName=html.escape(nameInterlinker),
+                    processName=html.escape(coproduction.name),
+                    userName=html.escape(self.shortName(db_obj.creator.full_name)),
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
 
         db.delete(db_obj_Aseet)
@@ -206,6 +163,21 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
 
         return None
 
+    def download_icon(self, uri: str) -> Optional[str]:
+        # try to get favicon
+        try:
+            icons = favicon.get(uri)
+            if len(icons) > 0 and (icon := icons[0]) and icon.format:
+                response = requests.get(icon.url, stream=True)
+
+                icon_path = f'/app/static/assets/{uuid.uuid4()}.{icon.format}'
+                with open(icon_path, 'wb') as image:
+                    for chunk in response.iter_content(1024):
+                        image.write(chunk)
+                return icon_path.replace("/app", "")
+        except:
+            pass
+
     async def create(self, db: Session, asset: AssetCreate, creator: models.User, task: models.Task) -> Asset:
         data = jsonable_encoder(asset)
         icon_path = None
@@ -213,21 +185,8 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
 
             data["type"] = "externalasset"
 
-            # try to get favicon
-            try:
-                icons = favicon.get(asset.uri)
-                if len(icons) > 0 and (icon := icons[0]) and icon.format:
-                    response = requests.get(icon.url, stream=True)
-
-                    icon_path = f'/app/static/assets/{uuid.uuid4()}.{icon.format}'
-                    with open(icon_path, 'wb') as image:
-                        for chunk in response.iter_content(1024):
-                            image.write(chunk)
-                    icon_path = icon_path.replace("/app", "")
-
-                    data["icon_path"] = icon_path
-            except:
-                pass
+            if icon_path := self.download_icon(asset.uri):
+                data["icon_path"] = icon_path
             db_obj = ExternalAsset(**data, creator=creator, objective_id=task.objective_id,
                                    phase_id=task.objective.phase_id, coproductionprocess_id=task.objective.phase.coproductionprocess_id)
 
@@ -236,6 +195,8 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
             data["type"] = "internalasset"
             db_obj = InternalAsset(**data, creator=creator, objective_id=task.objective_id,
                                    phase_id=task.objective.phase_id, coproductionprocess_id=task.objective.phase.coproductionprocess_id)
+            # its link is read by the notification of the creation
+            await interlinker_cache.load_for_assets([db_obj])
 
         db.add(db_obj)
         db.commit()
@@ -274,8 +235,20 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
                 else:
                     icon_path = '/static/graphics/external_link.svg'
 
-                newCoproNotification.parameters = "{'showLink':'hidden','showIcon':'','treeitem_id':'"+str(task.id)+"','treeItemName':'"+html.escape(str(task.name))+"','assetId':'"+str(db_obj.id)+"','assetIcon':'"+icon_path+"','assetName':'"+html.escape(asset.name)+"','assetLink':'"+str(
-                    assetLink)+"','interlinkerName':'"+html.escape(nameInterlinker)+"','processName':'"+html.escape(coproduction.name)+"','userName':'"+html.escape(self.shortName(db_obj.creator.full_name))+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    showLink="hidden",
+                    showIcon="",
+                    treeitem_id=task.id,
+                    treeItemName=html.escape(str(task.name)),
+                    assetId=db_obj.id,
+                    assetIcon=icon_path,
+                    assetName=html.escape(asset.name),
+                    assetLink=assetLink,
+                    interlinkerName=html.escape(nameInterlinker),
+                    processName=html.escape(coproduction.name),
+                    userName=html.escape(self.shortName(db_obj.creator.full_name)),
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
         if type(asset) == InternalAssetCreate:
 
@@ -295,7 +268,7 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
                 nameInterlinker = ''
                 assetLink = ''
                 serverName = settings.SERVER_NAME
-                optionalAssetIconText = ''
+                assetIcon = None
 
                 assetLink = db_obj.link+'/view'
                 if (db_obj.softwareinterlinker):
@@ -303,14 +276,26 @@ class CRUDAsset(CRUDBase[Asset, AssetCreate, AssetPatch]):
 
                     if (nameInterlinker == 'loomio'):
                         assetIcon = 'https://'+serverName+'/catalogue/static/loomio/logotype.png'
-                        optionalAssetIconText = ",'assetIcon':'"+assetIcon+"'"
 
                 else:
                     if (db_obj.knowledgeinterlinker):
                         nameInterlinker = db_obj.knowledgeinterlinker['name']
 
-                newCoproNotification.parameters = "{'showLink':'hidden','showIcon':'','treeitem_id':'"+str(task.id)+"','treeItemName':'"+html.escape(str(task.name))+"','assetId':'"+str(db_obj.id)+"'"+optionalAssetIconText+",'assetName':'{assetid:"+str(db_obj.id)+"}','assetLink':'"+str(
-                    assetLink)+"','interlinkerName':'"+html.escape(nameInterlinker)+"','processName':'"+html.escape(coproduction.name)+"','userName':'"+html.escape(self.shortName(db_obj.creator.full_name))+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    showLink="hidden",
+                    showIcon="",
+                    treeitem_id=task.id,
+                    treeItemName=html.escape(str(task.name)),
+                    assetId=db_obj.id,
+                    # only for the assets with an icon
+                    assetIcon=assetIcon,
+                    assetName="{assetid:"+str(db_obj.id)+"}",
+                    assetLink=assetLink,
+                    interlinkerName=html.escape(nameInterlinker),
+                    processName=html.escape(coproduction.name),
+                    userName=html.escape(self.shortName(db_obj.creator.full_name)),
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
 
         db.commit()
@@ -1,7 +1,6 @@
 import json
 import uuid
 from typing import TypedDict
-import requests
 from sqlalchemy import (
     Boolean,
     Column,
@@ -16,9 +15,9 @@ from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy import orm
 from sqlalchemy.ext.associationproxy import association_proxy
 
+from app.catalogue import interlinker_cache
 from app.config import settings
 from app.general.db.base_class import Base as BaseModel
-from cached_property import cached_property
 
 
 class Asset(BaseModel):
@@ -70,16 +69,14 @@ class InternalAsset(Asset):
     def __repr__(self):
         return "<Asset %r>" % self.id
     
-    @cached_property
+    @property
     def software_response(self):
-        return requests.get(
-            f"http://{settings.CATALOGUE_SERVICE}/api/v1/interlinkers/{self.softwareinterlinker_id}").json()
+        return interlinker_cache.get(self.softwareinterlinker_id) or {}
     
-    @cached_property
+    @property
     def knowledge_response(self):
         if self.knowledgeinterlinker_id:
-            return requests.get(
-                f"http://{settings.CATALOGUE_SERVICE}/api/v1/interlinkers/{self.knowledgeinterlinker_id}").json()
+            return interlinker_cache.get(self.knowledgeinterlinker_id)
         return
     @property
     def knowledgeinterlinker(self):
@@ -118,6 +115,7 @@ class InternalAsset(Asset):
             "edit": self.software_response.get("edit"),
             "delete": self.software_response.get("delete"),
             "download": self.software_response.get("download"),
+            "bulk": self.software_response.get("bulk"),
         }
 
 
@@ -141,10 +139,10 @@ class ExternalAsset(Asset):
         "polymorphic_identity": "externalasset",
     }
 
-    @cached_property
+    @property
     def external_response(self):
         if self.externalinterlinker_id:
-            return requests.get(f"http://{settings.CATALOGUE_SERVICE}/api/v1/interlinkers/{self.externalinterlinker_id}").json()
+            return interlinker_cache.get(self.externalinterlinker_id)
         return
     
     @property
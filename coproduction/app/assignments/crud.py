@@ -3,6 +3,7 @@ from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 from app.general.utils.CRUDBase import CRUDBase
+from app.general.utils.keyset import KeysetPage, paginate
 from app.models import Notification, Assignment, User, Organization
 from app.schemas import NotificationCreate, NotificationPatch, AssignmentCreate, AssignmentPatch, AssignmentCreateTeamList, AssignmentCreateUserList
 import uuid
@@ -19,70 +20,71 @@ from app.teams.crud import exportCrud as teams_crud
 
 
 class CRUDAssignment(CRUDBase[Assignment, AssignmentCreate, AssignmentPatch]):
-    async def get_multi(self, db: Session, user: User) -> Optional[List[Assignment]]:
-        return db.query(Assignment).all()
+    async def get_multi(self, db: Session, user: User, page: KeysetPage = None) -> Optional[List[Assignment]]:
+        # only the ones of the user
+        return paginate(db.query(Assignment).filter(Assignment.user_id == user.id), Assignment, page)
 
     #Get all notifications by user:
-    async def get_assignments_by_user(self, db: Session, user_id: str) -> Optional[List[Assignment]]:
-        listofAssignments = db.query(Assignment).filter(models.Assignment.user_id==user_id).all()
+    async def get_assignments_by_user(self, db: Session, user_id: str, page: KeysetPage = None) -> Optional[List[Assignment]]:
+        listofAssignments = paginate(db.query(Assignment).filter(models.Assignment.user_id==user_id), Assignment, page)
         #print(listofAssignments)
         return listofAssignments
     
     #Get all notifications by coproduction process:
-    async def get_pending_list_assignments_by_copro(self, db: Session, copro_id: str) -> Optional[List[Assignment]]:
+    async def get_pending_list_assignments_by_copro(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[Assignment]]:
 
-        listofAssignments = db.query(Assignment).filter(
+        listofAssignments = paginate(db.query(Assignment).filter(
             Assignment.coproductionprocess_id==copro_id,
             Assignment.state.isnot(True)
-        ).order_by(Assignment.created_at.desc()).all()
+        ), Assignment, page)
 
         return listofAssignments
     
-    async def get_pending_list_assignments_by_copro_by_user(self, db: Session, copro_id: str, user_id: str) -> Optional[List[Assignment]]:
+    async def get_pending_list_assignments_by_copro_by_user(self, db: Session, copro_id: str, user_id: str, page: KeysetPage = None) -> Optional[List[Assignment]]:
 
-        listofAssignments = db.query(Assignment).filter(
+        listofAssignments = paginate(db.query(Assignment).filter(
             Assignment.coproductionprocess_id==copro_id,
             Assignment.user_id==user_id,
             Assignment.state.isnot(True)
-        ).order_by(Assignment.created_at.desc()).all()
+        ), Assignment, page)
 
         return listofAssignments
     
     #Get history (including pending) assignments by coproduction process:
-    async def get_full_list_assignments_by_coproId(self, db: Session, copro_id: str) -> Optional[List[Assignment]]:
+    async def get_full_list_assignments_by_coproId(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[Assignment]]:
 
-        listofAssignments = db.query(Assignment).filter(
+        listofAssignments = paginate(db.query(Assignment).filter(
             Assignment.coproductionprocess_id==copro_id,
-        ).order_by(Assignment.created_at.desc()).all()
+        ), Assignment, page)
 
         return listofAssignments
     
     #Get history (including pending) assignments by coproduction process:
     #For a user
-    async def get_full_list_assignments_by_coproId_by_userId(self, db: Session, copro_id: str,user_id) -> Optional[List[Assignment]]:
+    async def get_full_list_assignments_by_coproId_by_userId(self, db: Session, copro_id: str,user_id, page: KeysetPage = None) -> Optional[List[Assignment]]:
 
-        listofAssignments = db.query(Assignment).filter(
+        listofAssignments = paginate(db.query(Assignment).filter(
             Assignment.coproductionprocess_id==copro_id,
             Assignment.user_id==user_id,
-        ).order_by(Assignment.created_at.desc()).all()
+        ), Assignment, page)
 
         return listofAssignments
     
     #Get history (including pending) assignments by coproduction process:
-    async def get_full_list_assignments_by_taskId(self, db: Session, task_id: str) -> Optional[List[Assignment]]:
+    async def get_full_list_assignments_by_taskId(self, db: Session, task_id: str, page: KeysetPage = None) -> Optional[List[Assignment]]:
 
-        listofAssignments = db.query(Assignment).filter(
+        listofAssignments = paginate(db.query(Assignment).filter(
             Assignment.task_id==task_id,
-        ).order_by(Assignment.created_at.desc()).all()
+        ), Assignment, page)
 
         return listofAssignments
 
     #Get history (including pending) assignments by coproduction process:
-    async def get_full_list_assignments_by_assetId(self, db: Session, asset_id: str) -> Optional[List[Assignment]]:
+    async def get_full_list_assignments_by_assetId(self, db: Session, asset_id: str, page: KeysetPage = None) -> Optional[List[Assignment]]:
 
-        listofAssignments = db.query(Assignment).filter(
+        listofAssignments = paginate(db.query(Assignment).filter(
             Assignment.asset_id==asset_id,
-        ).order_by(Assignment.created_at.desc()).all()
+        ), Assignment, page)
 
         return listofAssignments
 
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, String, Table, Integer, func, Boolean, Enum, Text, JSON
+from sqlalchemy import Column, ForeignKey, Index, String, Table, Integer, func, Boolean, Enum, Text, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import backref, relationship, declarative_base
 from sqlalchemy.orm import Mapped
@@ -34,6 +34,14 @@ class Assignment(BaseModel):
     description = Column(String, nullable=True)
     state = Column(Boolean, nullable=True, default=False)
 
+    # the feeds are read newest first
+    __table_args__ = (
+        Index('ix_assignment_user_feed', 'user_id', 'created_at', 'id'),
+        Index('ix_assignment_coproductionprocess_feed', 'coproductionprocess_id', 'created_at', 'id'),
+        Index('ix_assignment_task_feed', 'task_id', 'created_at', 'id'),
+        Index('ix_assignment_asset_feed', 'asset_id', 'created_at', 'id'),
+    )
+
      # add the relationship to claims
     claims = relationship('Claim', backref='assignment',order_by='desc(Claim.created_at)')
 
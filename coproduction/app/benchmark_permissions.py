@@ -0,0 +1,71 @@
+import sys
+import time
+import logging
+
+from sqlalchemy import event
+
+from app import models
+from app.crud import permission as permissions_crud
+from app.general.db.session import SessionLocal, engine
+from app.messages import set_logging_disabled
+from app.permissions.resolver import PermissionResolver
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Compares the per-call permission check with the resolver for every (user, treeitem) pair of a process:
+#   python /app/app/benchmark_permissions.py <coproductionprocess_id>
+
+queries = 0
+
+
+def count_query(*args, **kwargs):
+    global queries
+    queries += 1
+
+
+def run(fn):
+    global queries
+    queries = 0
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start, queries
+
+
+def benchmark(coproductionprocess_id: str):
+    db = SessionLocal()
+    set_logging_disabled(True)
+    try:
+        coproductionprocess = db.query(models.CoproductionProcess).get(coproductionprocess_id)
+        treeitems = []
+        for phase in coproductionprocess.children:
+            treeitems.append(phase)
+            for objective in phase.children:
+                treeitems.append(objective)
+                treeitems += objective.children
+        users = {user.id: user for permission in coproductionprocess.permissions if permission.team for user in permission.team.users}
+        users.update({user.id: user for user in coproductionprocess.administrators})
+        pairs = [(user, treeitem) for user in users.values() for treeitem in treeitems]
+        # load the lazy relationships used by both paths so only the permission queries are measured
+        for user, treeitem in pairs:
+            user.teams_ids, treeitem.path_ids
+
+        event.listen(engine, "before_cursor_execute", count_query)
+        per_call, per_call_time, per_call_queries = run(lambda: {
+            (user.id, treeitem.id): permissions_crud.get_dict_for_user_and_treeitem(db=db, treeitem=treeitem, user=user) for user, treeitem in pairs
+        })
+        resolved, resolver_time, resolver_queries = run(lambda: PermissionResolver.load(db, coproductionprocess).get_many(pairs))
+        event.remove(engine, "before_cursor_execute", count_query)
+
+        logger.info(f"{len(users)} users x {len(treeitems)} treeitems = {len(pairs)} checks")
+        logger.info(f"per call: {per_call_time * 1000:.1f} ms, {per_call_queries} queries")
+        logger.info(f"resolver: {resolver_time * 1000:.1f} ms, {resolver_queries} queries")
+        different = [key for key in per_call if per_call[key] != resolved[key]]
+        if different:
+            logger.error(f"{len(different)} pairs resolve differently: {different[:10]}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1])
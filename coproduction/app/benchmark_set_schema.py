@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import sys
+import time
+import uuid
+
+from sqlalchemy import event
+
+from app import crud, models
+from app.general.db.session import SessionLocal, engine
+from app.messages import set_logging_disabled
+from app.treeitems.models import closure
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Compares set_schema with the previous per-node instantiation on a generated schema, using two
+# temporary processes that are deleted afterwards:
+#   python /app/app/benchmark_set_schema.py [phases] [objectives per phase] [tasks per objective]
+
+queries = 0
+
+
+def count_query(*args, **kwargs):
+    global queries
+    queries += 1
+
+
+def generate_schema(phases: int, objectives: int, tasks: int) -> dict:
+    def items(count, children=None):
+        result = []
+        for i in range(count):
+            item = {"id": str(uuid.uuid4()), "name": f"Item {i}", "description": "", "prerequisites_ids": [result[-1]["id"]] if result else []}
+            if children:
+                item["children"] = children()
+            result.append(item)
+        return result
+
+    return {"id": str(uuid.uuid4()), "children": items(phases, lambda: items(objectives, lambda: items(tasks)))}
+
+
+async def per_node_set_schema(db, coproductionprocess, coproductionschema: dict):
+    # set_schema before the bulk instantiation
+    total = {}
+    schema_id = coproductionschema.get("id")
+    for phasemetadata in coproductionschema.get("children", []):
+        db_phase = await crud.phase.create_from_metadata(db=db, phasemetadata=phasemetadata, coproductionprocess=coproductionprocess, schema_id=schema_id)
+        total[phasemetadata["id"]] = {"type": "phase", "prerequisites_ids": phasemetadata["prerequisites_ids"] or [], "newObj": db_phase}
+        for objectivemetadata in phasemetadata.get("children", []):
+            db_obj = await crud.objective.create_from_metadata(db=db, objectivemetadata=objectivemetadata, phase=db_phase, schema_id=schema_id)
+            total[objectivemetadata["id"]] = {"type": "objective", "prerequisites_ids": objectivemetadata["prerequisites_ids"] or [], "newObj": db_obj}
+            for taskmetadata in objectivemetadata.get("children", []):
+                for key in ("management", "development", "exploitation"):
+                    taskmetadata.setdefault(key, 0)
+                db_task = await crud.task.create_from_metadata(db=db, taskmetadata=taskmetadata, objective=db_obj, schema_id=schema_id)
+                total[taskmetadata["id"]] = {"type": "task", "prerequisites_ids": taskmetadata["prerequisites_ids"] or [], "newObj": db_task}
+    db.commit()
+
+    for element in total.values():
+        for pre_id in element["prerequisites_ids"]:
+            if element["type"] == "phase":
+                await crud.phase.add_prerequisite(db=db, phase=element["newObj"], prerequisite=total[pre_id]["newObj"], commit=False)
+            if element["type"] == "objective":
+                await crud.objective.add_prerequisite(db=db, objective=element["newObj"], prerequisite=total[pre_id]["newObj"], commit=False)
+            if element["type"] == "task":
+                await crud.task.add_prerequisite(db=db, task=element["newObj"], prerequisite=total[pre_id]["newObj"], commit=False)
+    coproductionprocess.schema_used = schema_id
+    db.commit()
+
+
+async def measure(db, name: str, fn, schema: dict):
+    global queries
+    coproductionprocess = models.CoproductionProcess(name=f"benchmark {name}", language="en")
+    db.add(coproductionprocess)
+    db.commit()
+    try:
+        queries = 0
+        start = time.perf_counter()
+        await fn(db, coproductionprocess, schema)
+        elapsed = time.perf_counter() - start
+        count = queries
+        treeitems = db.query(closure).filter(closure.c.ancestor_id == coproductionprocess.id).count()
+        logger.info(f"{name}: {elapsed * 1000:.1f} ms, {count} queries, {treeitems} treeitems created")
+    finally:
+        db.delete(coproductionprocess)
+        db.commit()
+
+
+async def benchmark(phases: int, objectives: int, tasks: int):
+    db = SessionLocal()
+    set_logging_disabled(True)
+    try:
+        schema = generate_schema(phases, objectives, tasks)
+        logger.info(f"{phases} phases x {objectives} objectives x {tasks} tasks = {phases * (1 + objectives * (1 + tasks))} treeitems")
+        event.listen(engine, "before_cursor_execute", count_query)
+        await measure(db, "per node", per_node_set_schema, schema)
+        await measure(db, "bulk", lambda db, coproductionprocess, schema: crud.coproductionprocess.set_schema(
+            db=db, coproductionprocess=coproductionprocess, coproductionschema=schema
+        ), schema)
+        event.remove(engine, "before_cursor_execute", count_query)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:4]]
+    asyncio.run(benchmark(*(sizes + [5, 6, 10][len(sizes):])))
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, List, Optional, Union
+
+import requests
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class InterlinkerNotLoaded(RuntimeError):
+    pass
+
+
+class InterlinkerCache:
+    """
+    Process-level cache of the interlinker metadata served by the catalogue, keyed by interlinker id.
+
+    Assets read `software_response`, `knowledge_response` and `external_response` from here, so
+    serializing many assets that use the same interlinkers only hits the catalogue once per interlinker.
+    Interlinkers the catalogue does not know are cached as empty dicts (for a shorter time) so they
+    are not requested again on every access.
+
+    Async code loads the interlinkers of its assets with `load_for_assets` (in the threadpool) before
+    reading them. A miss in the event loop would block it, so it raises InterlinkerNotLoaded instead of
+    fetching, rather than serializing the asset without its interlinker.
+    """
+
+    def __init__(self, ttl: int, negative_ttl: int, maxsize: int, max_workers: int = 8, timeout: float = 5):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def url(self, id) -> str:
+        return f"http://{settings.CATALOGUE_SERVICE}/api/v1/interlinkers/{id}"
+
+    def fetch(self, id) -> dict:
+        try:
+            response = requests.get(self.url(id), timeout=self.timeout)
+            if response.status_code == 200:
+                return response.json()
+            return {}
+        except Exception as e:
+            logger.error(f"Could not get interlinker {id} from the catalogue: {str(e)}")
+            return None
+
+    def lookup(self, key: str):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            data, expires_at = self.entries[key]
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def store(self, key: str, data: Optional[dict]):
+        # errors reaching the catalogue are cached as not found, but only for the negative ttl
+        data = data or {}
+        ttl = self.ttl if data else self.negative_ttl
+        with self.lock:
+            self.entries[key] = (data, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get(self, id) -> Optional[dict]:
+        if not id:
+            return None
+        key = str(id)
+        data = self.lookup(key)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        if in_event_loop():
+            raise InterlinkerNotLoaded(f"Interlinker {key} read in the event loop without load_for_assets")
+        data = self.fetch(key)
+        self.store(key, data)
+        return data or {}
+
+    def prefetch(self, ids: Iterable):
+        """
+        Loads every id that is not cached yet in one concurrent round of catalogue requests.
+        """
+        missing = {str(id) for id in ids if id}
+        missing = [key for key in missing if self.lookup(key) is None]
+        if not missing:
+            return
+        self.misses += len(missing)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+            for key, data in zip(missing, executor.map(self.fetch, missing)):
+                self.store(key, data)
+
+    def prefetch_for_assets(self, assets: Iterable):
+        ids = set()
+        for asset in assets:
+            for attr in ("softwareinterlinker_id", "knowledgeinterlinker_id", "externalinterlinker_id"):
+                ids.add(getattr(asset, attr, None))
+        self.prefetch(ids)
+
+    async def load_for_assets(self, assets: Iterable):
+        await run_in_threadpool(self.prefetch_for_assets, list(assets))
+
+    async def load_for_assets_of(self, items: Union[Any, List[Any]]):
+        """
+        Loads the interlinkers of the assets of claims or assignments (and of their claims), returns the items.
+        """
+        assets = []
+        for item in items if isinstance(items, list) else [items]:
+            for owner in [item] + list(getattr(item, "claims", None) or []):
+                if (asset := getattr(owner, "asset", None)) is not None:
+                    assets.append(asset)
+        await self.load_for_assets(assets)
+        return items
+
+    def invalidate(self, ids: Iterable = None):
+        with self.lock:
+            if ids is None:
+                self.entries.clear()
+                return
+            for id in ids:
+                self.entries.pop(str(id), None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+interlinker_cache = InterlinkerCache(
+    ttl=settings.INTERLINKERS_CACHE_TTL,
+    negative_ttl=settings.INTERLINKERS_CACHE_NEGATIVE_TTL,
+    maxsize=settings.INTERLINKERS_CACHE_SIZE,
+)
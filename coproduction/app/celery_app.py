@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init
 import os
 from app.waits import wait_for_coproduction
 
@@ -6,4 +7,18 @@ wait_for_coproduction()
 
 celery_app = Celery("worker")
 celery_app.conf.broker_url = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379")
-celery_app.conf.result_backend = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379")
\ No newline at end of file
+celery_app.conf.result_backend = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379")
+# exports and imports take minutes, they have their own worker so the syncs, emails and outbox
+# of the default queue are not stuck behind them
+JOBS_QUEUE = os.environ.get("CELERY_JOBS_QUEUE", "jobs")
+celery_app.conf.task_routes = {
+    "app.worker.export_coproductionprocess": {"queue": JOBS_QUEUE},
+    "app.worker.import_coproductionprocess": {"queue": JOBS_QUEUE},
+}
+
+
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    # pooled connections must not be shared with the forked worker processes
+    from app.general.db.session import engine
+    engine.dispose(close=False)
@@ -3,6 +3,7 @@ from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 from app.general.utils.CRUDBase import CRUDBase
+from app.general.utils.keyset import KeysetPage, paginate
 from app.models import Notification, Claim, User, Organization
 from app.schemas import NotificationCreate, NotificationPatch, ClaimCreate, ClaimPatch, ClaimCreateTeamList, ClaimCreateUserList
 import uuid
@@ -19,49 +20,50 @@ from app.teams.crud import exportCrud as teams_crud
 
 
 class CRUDClaim(CRUDBase[Claim, ClaimCreate, ClaimPatch]):
-    async def get_multi(self, db: Session, user: User) -> Optional[List[Claim]]:
-        return db.query(Claim).all()
+    async def get_multi(self, db: Session, user: User, page: KeysetPage = None) -> Optional[List[Claim]]:
+        # only the ones of the user
+        return paginate(db.query(Claim).filter(Claim.user_id == user.id), Claim, page)
 
     #Get all notifications by user:
-    async def get_claims_by_user(self, db: Session, user_id: str) -> Optional[List[Claim]]:
-        listofClaims = db.query(Claim).filter(models.Claim.user_id==user_id).all()
+    async def get_claims_by_user(self, db: Session, user_id: str, page: KeysetPage = None) -> Optional[List[Claim]]:
+        listofClaims = paginate(db.query(Claim).filter(models.Claim.user_id==user_id), Claim, page)
         #print(listofClaims)
         return listofClaims
     
     #Get all notifications by coproduction process:
-    async def get_pending_list_claims_by_copro(self, db: Session, copro_id: str) -> Optional[List[Claim]]:
+    async def get_pending_list_claims_by_copro(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[Claim]]:
 
-        listofClaims = db.query(Claim).filter(
+        listofClaims = paginate(db.query(Claim).filter(
             Claim.coproductionprocess_id==copro_id,
             Claim.state.isnot(True)
-        ).order_by(Claim.created_at.desc()).all()
+        ), Claim, page)
 
         return listofClaims
     
     #Get history (including pending) claims by coproduction process:
-    async def get_full_list_claims_by_coproId(self, db: Session, copro_id: str) -> Optional[List[Claim]]:
+    async def get_full_list_claims_by_coproId(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[Claim]]:
 
-        listofClaims = db.query(Claim).filter(
+        listofClaims = paginate(db.query(Claim).filter(
             Claim.coproductionprocess_id==copro_id,
-        ).order_by(Claim.created_at.desc()).all()
+        ), Claim, page)
 
         return listofClaims
     
     #Get history (including pending) claims by coproduction process:
-    async def get_full_list_claims_by_taskId(self, db: Session, task_id: str) -> Optional[List[Claim]]:
+    async def get_full_list_claims_by_taskId(self, db: Session, task_id: str, page: KeysetPage = None) -> Optional[List[Claim]]:
 
-        listofClaims = db.query(Claim).filter(
+        listofClaims = paginate(db.query(Claim).filter(
             Claim.task_id==task_id,
-        ).order_by(Claim.created_at.desc()).all()
+        ), Claim, page)
 
         return listofClaims
 
     #Get history (including pending) claims by coproduction process:
-    async def get_full_list_claims_by_assetId(self, db: Session, asset_id: str) -> Optional[List[Claim]]:
+    async def get_full_list_claims_by_assetId(self, db: Session, asset_id: str, page: KeysetPage = None) -> Optional[List[Claim]]:
 
-        listofClaims = db.query(Claim).filter(
+        listofClaims = paginate(db.query(Claim).filter(
             Claim.asset_id==asset_id,
-        ).order_by(Claim.created_at.desc()).all()
+        ), Claim, page)
 
         return listofClaims
 
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, String, Table, Integer, func, Boolean, Enum, Text, JSON
+from sqlalchemy import Column, ForeignKey, Index, String, Table, Integer, func, Boolean, Enum, Text, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import backref, relationship, declarative_base
 
@@ -38,5 +38,13 @@ class Claim(BaseModel):
     state = Column(Boolean, nullable=True, default=False)
     claim_type = Column(String, nullable=True)
 
+    # the feeds are read newest first
+    __table_args__ = (
+        Index('ix_claim_user_feed', 'user_id', 'created_at', 'id'),
+        Index('ix_claim_coproductionprocess_feed', 'coproductionprocess_id', 'created_at', 'id'),
+        Index('ix_claim_task_feed', 'task_id', 'created_at', 'id'),
+        Index('ix_claim_asset_feed', 'asset_id', 'created_at', 'id'),
+    )
+
     def __repr__(self) -> str:
         return f"<Claim {self.id} {self.user_id} {self.title} {self.state}>"
\ No newline at end of file
@@ -42,7 +42,25 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # DATABASE POOL
+    # "api" for the gunicorn / uvicorn workers, "worker" for the celery worker (set in worker-start.sh)
+    DB_POOL_PROFILE: str = "api"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    WORKER_DB_POOL_SIZE: int = 2
+    WORKER_DB_MAX_OVERFLOW: int = 2
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 30 * 60
+    DB_POOL_PRE_PING: bool = True
+    # milliseconds, 0 disables it
+    DB_STATEMENT_TIMEOUT: int = 0
+
     
+    # AUTHENTICATION
+    JWKS_CACHE_TTL: int = 60 * 60
+    JWKS_MIN_REFRESH_INTERVAL: int = 30
+    VERIFIED_TOKENS_CACHE_SIZE: int = 1024
+
     DEFAULT_LANGUAGE: str
     ALLOWED_LANGUAGES_LIST: list = os.getenv("ALLOWED_LANGUAGES", "").split(",")
     
@@ -50,6 +68,91 @@ class Settings(BaseSettings):
     CATALOGUE_SERVICE_NAME: str
     CATALOGUE_PORT: int
     CATALOGUE_SERVICE: str = os.getenv("CATALOGUE_SERVICE_NAME") + ":" + os.getenv("CATALOGUE_PORT")
+    # seconds
+    INTERLINKERS_CACHE_TTL: int = 10 * 60
+    INTERLINKERS_CACHE_NEGATIVE_TTL: int = 60
+    INTERLINKERS_CACHE_SIZE: int = 1000
+
+    # PUBLIC DATA OF THE ASSETS (asked to the interlinkers' backends)
+    ASSETS_ENRICHMENT_CONCURRENCY: int = 10
+    # seconds, can be overriden per service name, e.g. {"loomio": 10}
+    ASSETS_ENRICHMENT_TIMEOUT: float = 5
+    ASSETS_ENRICHMENT_SERVICE_TIMEOUTS: Dict[str, float] = {}
+    ASSETS_ENRICHMENT_BREAKER_THRESHOLD: int = 5
+    ASSETS_ENRICHMENT_BREAKER_RESET_TIMEOUT: float = 30
+
+    # LOGGING SERVICE
+    LOGGING_URL: str = "http://logging/api/v1/log"
+    # if the logging service accepts a list of entries in one request
+    LOGGING_BATCH_URL: Optional[str] = None
+    LOGGING_QUEUE_SIZE: int = 10000
+    LOGGING_BATCH_SIZE: int = 50
+    # seconds
+    LOGGING_FLUSH_INTERVAL: float = 1.0
+
+    # PROCESS EXPORT
+    EXPORT_DIRECTORY: str = "zipfiles"
+    EXPORT_DOWNLOAD_CONCURRENCY: int = 4
+    # seconds
+    EXPORT_DOWNLOAD_TIMEOUT: float = 30
+    EXPORT_DOWNLOAD_RETRIES: int = 5
+    # seconds, doubled after every failed attempt up to the max
+    EXPORT_DOWNLOAD_BACKOFF: float = 1
+    EXPORT_DOWNLOAD_MAX_BACKOFF: float = 30
+    # downloaded asset files kept to be reused by the next exports, None to always download them
+    EXPORT_BLOB_DIRECTORY: Optional[str] = "zipfiles/blobs"
+    # seconds a stored asset file is kept without being used
+    EXPORT_BLOB_MAX_AGE: int = 60 * 60 * 24 * 30
+
+    # PROCESS IMPORT
+    # the uploaded zips wait here until they are imported
+    IMPORT_DIRECTORY: str = "uploads"
+    IMPORT_UPLOAD_CONCURRENCY: int = 4
+    # seconds
+    IMPORT_UPLOAD_TIMEOUT: float = 60
+
+    # PROCESS COPY
+    # internal assets cloned by their services at the same time
+    COPY_CLONE_CONCURRENCY: int = 4
+    # seconds
+    COPY_CLONE_TIMEOUT: float = 60
+
+    # USERS OF THE ASSETS (synced to the interlinkers' backends)
+    # the ids of the changes are collected in Redis and synced together by one job per window
+    ACL_SYNC_REDIS_URL: Optional[str] = os.getenv("CELERY_BROKER_URL")
+    ACL_SYNC_KEY_PREFIX: str = "coproduction:aclsync"
+    # seconds
+    ACL_SYNC_WINDOW: float = 5
+    ACL_SYNC_TIMEOUT: float = 10
+    # the assets that could not be synced are retried up to the max
+    ACL_SYNC_MAX_ATTEMPTS: int = 8
+    # seconds, doubled after every failed attempt up to the max
+    ACL_SYNC_RETRY_BACKOFF: float = 30
+    ACL_SYNC_RETRY_MAX_BACKOFF: float = 3600
+
+    # OUTBOX (side effects delivered by the worker once the transaction is committed)
+    OUTBOX_BATCH_SIZE: int = 100
+    # seconds
+    OUTBOX_HTTP_TIMEOUT: float = 10
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    # seconds, doubled after every failed attempt up to the max
+    OUTBOX_RETRY_BACKOFF: float = 10
+    OUTBOX_RETRY_MAX_BACKOFF: float = 3600
+
+    # FEEDS (notifications, claims and assignments)
+    # most items of a page when the client asks for a limit
+    FEED_MAX_PAGE_SIZE: int = 200
+
+    # USER DIRECTORY
+    # most users returned by a search
+    USER_SEARCH_LIMIT: int = 20
+
+    # WEBSOCKETS
+    # events are shared between workers and replicas through Redis when set, e.g. redis://redis:6379
+    SOCKETS_REDIS_URL: Optional[str] = None
+    SOCKETS_CHANNEL_PREFIX: str = "coproduction:sockets"
+    # seconds
+    SOCKETS_SEND_TIMEOUT: float = 5
 
     # MAIL
     SMTP_TLS: bool = True
@@ -62,6 +165,14 @@ class Settings(BaseSettings):
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
     EMAIL_TEMPLATES_DIR: str = "/app/email-templates/build"
     EMAILS_ENABLED: bool = True
+    # seconds
+    SMTP_TIMEOUT: float = 30
+    # queued emails sent by the worker over one connection
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_MAX_ATTEMPTS: int = 5
+    # seconds, doubled after every failed attempt up to the max
+    EMAIL_RETRY_BACKOFF: float = 60
+    EMAIL_RETRY_MAX_BACKOFF: float = 3600
 
     @validator("EMAILS_ENABLED", pre=True)
     def get_emails_enabled(cls, v: bool, values: Dict[str, Any]) -> bool:
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict, List, Tuple
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import models, schemas
+from app.catalogue import interlinker_cache
+from app.config import settings
+from app.outbox import outbox
+from app.treeitems.bulk import TreeBuilder
+from app.treeitems.models import prerequisites
+from app.utils import Status
+
+logger = logging.getLogger(__name__)
+
+# what the copy keeps of every treeitem, status and progress start again
+TREEITEM_FIELDS = ("name", "description", "disabler_id", "disabled_on", "from_item", "from_schema")
+PHASE_FIELDS = TREEITEM_FIELDS + ("is_part_of_codelivery",)
+TASK_FIELDS = TREEITEM_FIELDS + ("problemprofiles", "management", "development", "exploitation")
+
+
+class ProcessSnapshot:
+    """
+    The tree of a process with its prerequisites and permissions, read with one query each.
+    """
+
+    def __init__(self, db: Session, coproductionprocess: models.CoproductionProcess):
+        self.phases = db.query(models.Phase).filter(models.Phase.coproductionprocess_id == coproductionprocess.id).all()
+        self.objectives = db.query(models.Objective).filter(
+            models.Objective.phase_id.in_([phase.id for phase in self.phases])
+        ).all() if self.phases else []
+        self.tasks = db.query(models.Task).filter(
+            models.Task.objective_id.in_([objective.id for objective in self.objectives])
+        ).all() if self.objectives else []
+
+        ids = [item.id for item in self.phases + self.objectives + self.tasks]
+        # prerequisites of every treeitem id
+        self.prerequisites: Dict[uuid.UUID, List[uuid.UUID]] = {}
+        if ids:
+            for treeitem_a_id, treeitem_b_id in db.execute(
+                select([prerequisites.c.treeitem_a_id, prerequisites.c.treeitem_b_id]).where(prerequisites.c.treeitem_a_id.in_(ids))
+            ):
+                self.prerequisites.setdefault(treeitem_a_id, []).append(treeitem_b_id)
+
+        self.permissions = db.query(models.Permission).filter(models.Permission.coproductionprocess_id == coproductionprocess.id).all()
+
+
+class ProcessCopier:
+    """
+    Copies a coproduction process with its tree, prerequisites, permissions and assets.
+
+    The source is read in a few queries and the new tree is built in memory with the ids remapped, so
+    the process, its phases, objectives, tasks, prerequisites, permissions and external assets are
+    inserted with bulk inserts in one transaction. The internal assets are cloned by their services
+    after that commit, at most `concurrency` at a time, and the ones that fail are reported by asset
+    id without undoing the rest of the copy.
+    """
+
+    def __init__(self, concurrency: int, timeout: float):
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def build(self, snapshot: ProcessSnapshot, coproductionprocess_id: uuid.UUID) -> Tuple[TreeBuilder, Dict[uuid.UUID, dict]]:
+        """
+        The new tree and its row by the id of the source treeitem.
+        """
+        tree = TreeBuilder(coproductionprocess_id)
+        rows = {}
+        for phase in snapshot.phases:
+            rows[phase.id] = tree.phase({field: getattr(phase, field) for field in PHASE_FIELDS})
+        for objective in snapshot.objectives:
+            rows[objective.id] = tree.objective(rows[objective.phase_id], {field: getattr(objective, field) for field in TREEITEM_FIELDS})
+        for task in snapshot.tasks:
+            rows[task.id] = tree.task(rows[task.objective_id], {**{field: getattr(task, field) for field in TASK_FIELDS}, "status": Status.awaiting})
+
+        for id, prerequisite_ids in snapshot.prerequisites.items():
+            new_ids = [rows[pre_id]["id"] for pre_id in prerequisite_ids if pre_id in rows]
+            if id in rows and new_ids:
+                tree.set_prerequisites(rows[id], new_ids)
+        return tree, rows
+
+    def permissions(self, snapshot: ProcessSnapshot, coproductionprocess_id: uuid.UUID, rows: Dict[uuid.UUID, dict], user: models.User) -> List[dict]:
+        result = []
+        for permission in snapshot.permissions:
+            if permission.treeitem_id and permission.treeitem_id not in rows:
+                continue
+            result.append({
+                "id": uuid.uuid4(),
+                # the creator of the copy is the creator of its permissions
+                "creator_id": user.id,
+                "team_id": permission.team_id,
+                "coproductionprocess_id": coproductionprocess_id,
+                "treeitem_id": rows[permission.treeitem_id]["id"] if permission.treeitem_id else None,
+                "access_assets_permission": permission.access_assets_permission,
+                "create_assets_permission": permission.create_assets_permission,
+                "delete_assets_permission": permission.delete_assets_permission,
+            })
+        return result
+
+    def asset(self, type: str, task: dict, coproductionprocess_id: uuid.UUID, user: models.User, objectives: Dict[uuid.UUID, dict]) -> dict:
+        return {
+            "id": uuid.uuid4(),
+            "type": type,
+            "task_id": task["id"],
+            "objective_id": task["objective_id"],
+            "phase_id": objectives[task["objective_id"]]["phase_id"],
+            "coproductionprocess_id": coproductionprocess_id,
+            "creator_id": user.id,
+        }
+
+    async def clone(self, client: httpx.AsyncClient, asset: models.InternalAsset, token: str, just_read: bool) -> str:
+        """
+        Asks the service of the internal asset for a copy and returns the id of the new one.
+        """
+        error = None
+        # the link of the backend is tried when the service does not answer
+        for url in (asset.internal_link, asset.link):
+            try:
+                response = await client.post(url + "/clone", params={'justRead': str(just_read)}, headers={
+                    "Authorization": "Bearer " + token
+                })
+                response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                error = e
+                continue
+            if "id" in data:
+                return str(data["id"])
+            if "_id" in data:
+                return str(data["_id"])
+            raise Exception("The service did not return the id of the copy")
+        raise error
+
+    async def clone_all(self, assets: List[models.InternalAsset], token: str, just_read: bool) -> Tuple[Dict[uuid.UUID, str], Dict[uuid.UUID, str]]:
+        """
+        Clones the internal assets, returns the id of every copy and the error of every failure by asset id.
+        """
+        if not assets:
+            return {}, {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        client = httpx.AsyncClient(
+            timeout=self.timeout,
+            pool_limits=httpx.PoolLimits(soft_limit=self.concurrency, hard_limit=self.concurrency * 2),
+        )
+
+        async def clone(asset):
+            async with semaphore:
+                try:
+                    return asset.id, await self.clone(client, asset, token, just_read), None
+                except Exception as e:
+                    logger.error(f"Error while trying to clone the asset {asset.id}: {repr(e)}")
+                    return asset.id, None, repr(e)
+
+        try:
+            results = await asyncio.gather(*[clone(asset) for asset in assets])
+        finally:
+            await client.close()
+        return {id: external_asset_id for id, external_asset_id, _ in results if external_asset_id}, {id: error for id, _, error in results if error}
+
+    async def copy(
+        self, db: Session, coproductionprocess: models.CoproductionProcess, process_in: schemas.CoproductionProcessCreate, assets: List[models.Asset],
+        user: models.User, token: str, administrators: bool = True, permissions: bool = True, just_read: bool = False
+    ) -> Tuple[models.CoproductionProcess, Dict[uuid.UUID, str]]:
+        """
+        Copies the process with the given assets of it and returns the copy with the error of every asset
+        that could not be copied.
+        """
+        snapshot = ProcessSnapshot(db, coproductionprocess)
+
+        try:
+            process = models.CoproductionProcess(**jsonable_encoder(process_in), id=uuid.uuid4(), creator_id=user.id)
+            process.administrators.append(user)
+            if administrators:
+                for admin in coproductionprocess.administrators:
+                    if admin not in process.administrators:
+                        process.administrators.append(admin)
+            db.add(process)
+            db.flush()
+
+            tree, rows = self.build(snapshot, process.id)
+            objectives = {row["id"]: row for row in tree.objectives}
+            external_assets = []
+            internal_assets = []
+            for asset in assets:
+                task = rows.get(asset.task_id)
+                if not task:
+                    continue
+                if asset.type == "externalasset":
+                    # the icon was already downloaded for the source asset
+                    external_assets.append({
+                        **self.asset(asset.type, task, process.id, user, objectives),
+                        "name": asset.name, "uri": asset.uri, "externalinterlinker_id": asset.externalinterlinker_id, "icon_path": asset.icon_path,
+                    })
+                    # a task with assets is in progress
+                    task["status"] = Status.in_progress
+                elif asset.type == "internalasset":
+                    internal_assets.append(asset)
+            tree.summarize()
+
+            tree.insert(db)
+            db.bulk_insert_mappings(models.ExternalAsset, external_assets)
+            if permissions:
+                db.bulk_insert_mappings(models.Permission, self.permissions(snapshot, process.id, rows, user))
+            # the bulk inserts skip the signals that request it
+            outbox.add_ids(db, "acl_sync", coproductionprocess_ids=[process.id])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        # the services only copy their assets once the copy of the process exists
+        await run_in_threadpool(interlinker_cache.prefetch_for_assets, internal_assets)
+        cloned, failed = await self.clone_all(internal_assets, token, just_read)
+        if cloned:
+            before = {row["id"]: (row["status"], row.get("progress")) for row in tree.tasks + tree.objectives + tree.phases}
+            new_assets = []
+            for asset in internal_assets:
+                if asset.id not in cloned:
+                    continue
+                task = rows[asset.task_id]
+                new_assets.append({
+                    **self.asset(asset.type, task, process.id, user, objectives),
+                    "softwareinterlinker_id": asset.softwareinterlinker_id,
+                    "knowledgeinterlinker_id": asset.knowledgeinterlinker_id,
+                    "external_asset_id": cloned[asset.id],
+                })
+                task["status"] = Status.in_progress
+            tree.summarize()
+
+            def changed(tree_rows: List[dict]) -> List[dict]:
+                return [
+                    {key: row[key] for key in ("id", "status", "progress") if key in row}
+                    for row in tree_rows if (row["status"], row.get("progress")) != before[row["id"]]
+                ]
+            try:
+                db.bulk_insert_mappings(models.InternalAsset, new_assets)
+                db.bulk_update_mappings(models.Task, changed(tree.tasks))
+                db.bulk_update_mappings(models.Objective, changed(tree.objectives))
+                db.bulk_update_mappings(models.Phase, changed(tree.phases))
+                outbox.add_ids(db, "acl_sync", coproductionprocess_ids=[process.id])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        db.refresh(process)
+        return process, failed
+
+
+process_copier = ProcessCopier(
+    concurrency=settings.COPY_CLONE_CONCURRENCY,
+    timeout=settings.COPY_CLONE_TIMEOUT,
+)
@@ -7,19 +7,24 @@ from typing import List, Optional
 from slugify import slugify
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, or_
-from app import crud, models
+from app import crud, models, schemas
 from app.general.utils.CRUDBase import CRUDBase
+from app.general.utils.search import text_search
 from app.models import CoproductionProcess, Permission, User, Permission, TreeItem, Asset
-from app.schemas import CoproductionProcessCreate, CoproductionProcessPatch, PermissionCreate
+from app.schemas import CoproductionProcessCreate, CoproductionProcessPatch
 from fastapi.encoders import jsonable_encoder
 from app.messages import log
+from app.copies import process_copier
+from app.catalogue import interlinker_cache
+from app.enrichment import asset_enricher
+from app.permissions.resolver import PermissionResolver
+from app.treeitems.bulk import TreeBuilder
 from app.treeitems.crud import exportCrud as treeitemsCrud
 from app.sockets import socket_manager
-from app.utils import check_prerequistes
 from app.config import settings
 from fastapi import HTTPException
 from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Query, subqueryload
+from sqlalchemy.orm import Query, subqueryload, selectinload
 from sqlalchemy import func
 
 
@@ -70,17 +75,10 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
         if rating:
                 queries.append(CoproductionProcess.rating >= rating)
 
-        if search!="":
-            if search:
-                search = search.lower()
-                queries.append(or_(
-                        # func.lower(Story.keywords_translations[language]).contains(
-                        #     search),
-                        func.lower(CoproductionProcess.name).contains(func.lower(
-                            search)),
-                        func.lower(
-                            CoproductionProcess.description).contains(func.lower(search))
-                    ))
+        # full text search over name, description, aim and idea, ranked
+        condition, rank = text_search(CoproductionProcess.search_vector, search, trigram_column=CoproductionProcess.name)
+        if condition is not None:
+            queries.append(condition)
             
         
         if tag and any(tag):
@@ -103,89 +101,22 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
         query = query.options(subqueryload(CoproductionProcess.tags))
 
         query = query.filter(*queries, CoproductionProcess.id.not_in(exclude))
+        if rank is not None:
+            query = query.order_by(rank.desc(), CoproductionProcess.id)
 
         return paginate(query)
 
        
 
 
-    async def get_assets(self, db: Session, coproductionprocess: CoproductionProcess, user: models.User,token:str):
+    async def get_assets(self, db: Session, coproductionprocess: CoproductionProcess, user: models.User,token:str, enrich: bool = True):
 
         # Query and add public info to the asset
-        def obtainpublicData(listOfAssets):
-
-            for asset in listOfAssets:
-                if asset.type == "internalasset":
-
-                    serverName=settings.SERVER_NAME
-                    #print("ServerName")
-                    #print(serverName)
-
-                    if('loomio' in asset.link):
-                        print("Es un loomio")
-                        asset_name="Loomio File"
-                        import traceback
-
-                        try:
-                            
-                            print('Asset id is:'+str(asset.external_asset_id))
-                            print('The request is:')
-
-                            cookies = {'auth_token': token}
-                            requestUrl=f"https://loomio/api/v1/assets/{str(asset.external_asset_id)}"
-                            print(requestUrl)
-                            
-                            response = requests.get(requestUrl, headers={
-                            "Authorization": "Bearer " + token
-                            }, cookies=cookies)
-
-                            responseDataJson=response.json()
-
-                            print('Response:')                            
-                            print(responseDataJson)
-                            print('--------')
-
-                            asset_name=responseDataJson.name
-                            print(asset_name)
-                        except  Exception:
-                            traceback.print_exc()
-                            pass
-
-
-
-                        asset.internalData={'icon':'https://'+serverName+'/catalogue/static/loomio/logotype.png','name':asset_name,'link':asset.link}
-                    else:
-
-                        if ('servicepedia' in asset.link):
-                            #print(" Es un Servicepedia")
-                            # #print('Es servicepedia')
-
-                            requestlink = f"http://augmenterservice/assets/{asset.external_asset_id}"
-                            response = requests.get(requestlink)
-                            datosAsset = response.json()
-                            #print(datosAsset)
-
-                            asset_uri = asset.link+'/view'
-                            asset.internalData = {
-                                'icon': 'https://'+serverName+'/catalogue/static/augmenter/logotype.png', 'name': datosAsset['name'], 'link': asset_uri}
-
-                        else:
-                            #print("Es un Internal Asset")
-                            serviceName = os.path.split(asset.link)[0].split('/')[3]
-                            requestlink = f"http://{serviceName}/assets/{asset.external_asset_id}"
-                            response = requests.get(requestlink)
-                            datosAsset = response.json()
-                            asset.internalData = datosAsset
-
-                if asset.type == "externalasset":
-                    #print("Es un External Asset")
-                    queries = []
-                    queries.append(Asset.id == asset.id)
-                    datosAsset = db.query(Asset).filter(*queries).first()
-                    asset.internalData = {'icon': datosAsset.icon,
-                                          'name': datosAsset.name, 'link': datosAsset.uri}
-
-            return listOfAssets
+        async def obtainpublicData(listOfAssets):
+            if not enrich:
+                await interlinker_cache.load_for_assets(listOfAssets)
+                return listOfAssets
+            return await asset_enricher.enrich(listOfAssets, token=token)
 
         # En el caso que seas un administrador del proceso (muestro todo):
 
@@ -199,7 +130,7 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
             ).order_by(models.Asset.created_at.desc()).all()
 
             # Agrego informacion del asset interno
-            listOfAssets = obtainpublicData(listOfAssets)
+            listOfAssets = await obtainpublicData(listOfAssets)
 
             return listOfAssets
 
@@ -217,7 +148,7 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
             ).order_by(models.Asset.created_at.desc()).all()
 
             # Agrego informacion del asset interno
-            listOfAssets = obtainpublicData(listOfAssets)
+            listOfAssets = await obtainpublicData(listOfAssets)
 
             return listOfAssets
 
@@ -236,18 +167,64 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
         ).order_by(models.Asset.created_at.desc()).all()
 
         # Check if the user has the permissions to see the asset.
-        for asset in listOfAssets:
-            #print(asset)
-            tienePermisosListado = crud.asset.can_list(
-                db=db, user=user, task=asset.task)
-            if not tienePermisosListado:
-                listOfAssets.remove(asset)
+        resolver = crud.permission.get_resolver(db=db, coproductionprocess=coproductionprocess)
+        listOfAssets = [asset for asset in listOfAssets if resolver.user_can(user, asset.task_id, "access_assets_permission")]
 
         # Agrego informacion del asset interno
-        listOfAssets = obtainpublicData(listOfAssets)
+        listOfAssets = await obtainpublicData(listOfAssets)
 
         return listOfAssets
 
+    async def get_tree(self, db: Session, coproductionprocess: CoproductionProcess, user: models.User = None) -> List[models.Phase]:
+        """
+        Phases, objectives and tasks of the process ready to be serialized as PhaseOutFull without lazy loads.
+
+        The tree, its prerequisites and the permissions (with their teams) are loaded in a fixed number of
+        queries, and the permissions, teams and roles of every node are computed from them.
+        """
+        phases = db.query(models.Phase).filter(
+            models.Phase.coproductionprocess_id == coproductionprocess.id
+        ).options(
+            selectinload(models.Phase.prerequisites),
+            selectinload(models.Phase.children).selectinload(models.Objective.prerequisites),
+            selectinload(models.Phase.children).selectinload(models.Objective.children).selectinload(models.Task.prerequisites),
+        ).all()
+
+        permissions = db.query(Permission).filter(
+            Permission.coproductionprocess_id == coproductionprocess.id
+        ).options(
+            selectinload(Permission.team).selectinload(models.Team.users).selectinload(models.User.teams),
+            selectinload(Permission.team).selectinload(models.Team.administrators),
+            selectinload(Permission.team).selectinload(models.Team.applies),
+        ).order_by(Permission.created_at.asc()).all()
+
+        parents = {}
+        nodes = []
+        for phase in phases:
+            parents[phase.id] = coproductionprocess.id
+            nodes.append(phase)
+            for objective in phase.children:
+                parents[objective.id] = phase.id
+                nodes.append(objective)
+                for task in objective.children:
+                    parents[task.id] = objective.id
+                    nodes.append(task)
+
+        resolver = PermissionResolver(coproductionprocess.id, [admin.id for admin in coproductionprocess.administrators], permissions, parents)
+        process_permissions = [permission for permission in permissions if permission.treeitem_id is None]
+        for node in nodes:
+            path = resolver.path_ids(node.id)
+            node_permissions = process_permissions + [permission for permission in permissions if permission.treeitem_id in path]
+            teams = []
+            for permission in node_permissions:
+                if permission.team and permission.team not in teams:
+                    teams.append(permission.team)
+            # values read by the cached hybrid properties of TreeItem
+            node.__dict__["permissions"] = node_permissions
+            node.__dict__["teams"] = teams
+            node.__dict__["user_roles"] = resolver.get_user_roles(user, node.id) if user else None
+        return phases
+
     async def clear_schema(self, db: Session, coproductionprocess: models.CoproductionProcess):
         schema = coproductionprocess.schema_used
         for phase in coproductionprocess.children:
@@ -274,68 +251,42 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
         return coproductionprocess
 
     async def set_schema(self, db: Session, coproductionprocess: models.CoproductionProcess, coproductionschema: dict):
-        total = {}
         schema_id = coproductionschema.get("id")
+        tree = TreeBuilder(coproductionprocess.id)
+        # new row and prerequisites of every item of the schema, by the id of the item in the schema
+        total = {}
+
+        def data(schema, metadata: dict) -> dict:
+            metadata = {key: value for key, value in metadata.items() if key not in ("children", "from_schema", "from_item")}
+            item = schema(**metadata, from_schema=schema_id, from_item=metadata.get("id"))
+            return item.dict(exclude={"prerequisites_ids", "postrequisites_ids"}, exclude_none=True)
+
         for phasemetadata in coproductionschema.get("children", []):
             phasemetadata: dict
-            db_phase = await crud.phase.create_from_metadata(
-                db=db,
-                phasemetadata=phasemetadata,
-                coproductionprocess=coproductionprocess,
-                schema_id=schema_id
-            )
-
-            #  Add new phase object and the prerequisites for later loop
-            total[phasemetadata["id"]] = {
-                "type": "phase",
-                "prerequisites_ids": phasemetadata["prerequisites_ids"] or [],
-                "newObj": db_phase,
-            }
+            phase = tree.phase(data(schemas.PhaseCreate, phasemetadata))
+            total[phasemetadata["id"]] = (phase, phasemetadata["prerequisites_ids"] or [])
 
             for objectivemetadata in phasemetadata.get("children", []):
                 objectivemetadata: dict
-                db_obj = await crud.objective.create_from_metadata(
-                    db=db,
-                    objectivemetadata=objectivemetadata,
-                    phase=db_phase,
-                    schema_id=schema_id
-                )
-                #  Add new objective object and the prerequisites for later loop
-                total[objectivemetadata["id"]] = {
-                    "type": "objective",
-                    "prerequisites_ids": objectivemetadata["prerequisites_ids"] or [],
-                    "newObj": db_obj,
-                }
-                for taskmetadata in objectivemetadata.get("children", []):
-                    if 'management' not in taskmetadata:
-                        taskmetadata['management'] = 0
-                    if 'development' not in taskmetadata:
-                        taskmetadata['development'] = 0
-                    if 'exploitation' not in taskmetadata:
-                        taskmetadata['exploitation'] = 0
-
-                    db_task = await crud.task.create_from_metadata(
-                        db=db,
-                        taskmetadata=taskmetadata,
-                        objective=db_obj,
-                        schema_id=schema_id
-                    )
-                    total[taskmetadata["id"]] = {
-                        "type": "task",
-                        "prerequisites_ids": taskmetadata["prerequisites_ids"] or [],
-                        "newObj": db_task,
-                    }
-        db.commit()
-
-        for key, element in total.items():
-            for pre_id in element["prerequisites_ids"]:
+                objective = tree.objective(phase, data(schemas.ObjectiveCreate, objectivemetadata))
+                total[objectivemetadata["id"]] = (objective, objectivemetadata["prerequisites_ids"] or [])
 
-                if element["type"] == "phase":
-                    await crud.phase.add_prerequisite(db=db, phase=element["newObj"], prerequisite=total[pre_id]["newObj"], commit=False)
-                if element["type"] == "objective":
-                    await crud.objective.add_prerequisite(db=db, objective=element["newObj"], prerequisite=total[pre_id]["newObj"], commit=False)
-                if element["type"] == "task":
-                    await crud.task.add_prerequisite(db=db, task=element["newObj"], prerequisite=total[pre_id]["newObj"], commit=False)
+                for taskmetadata in objectivemetadata.get("children", []):
+                    taskmetadata = {"management": 0, "development": 0, "exploitation": 0, **taskmetadata}
+                    taskmetadata["problemprofiles"] = [pp["id"] for pp in taskmetadata.get("problemprofiles", [])]
+                    task = tree.task(objective, data(schemas.TaskCreate, taskmetadata))
+                    total[taskmetadata["id"]] = (task, taskmetadata["prerequisites_ids"] or [])
+
+        # add_prerequisite keeps only the last prerequisite of every item
+        for row, prerequisites_ids in total.values():
+            if prerequisites_ids:
+                tree.set_prerequisites(row, [total[prerequisites_ids[-1]][0]["id"]])
+        tree.insert(db)
+
+        start_dates = [date for date in [coproductionprocess.start_date] + [phase["start_date"] for phase in tree.phases] if date]
+        end_dates = [date for date in [coproductionprocess.end_date] + [phase["end_date"] for phase in tree.phases] if date]
+        coproductionprocess.start_date = min(start_dates) if start_dates else None
+        coproductionprocess.end_date = max(end_dates) if end_dates else None
 
         schema_id = coproductionschema.get("id")
         coproductionprocess.schema_used = schema_id
@@ -363,102 +314,30 @@ class CRUDCoproductionProcess(CRUDBase[CoproductionProcess, CoproductionProcessC
             logotype=coproductionprocess.logotype,
             aim=coproductionprocess.aim,
             idea=coproductionprocess.idea,
-            organization_desc=coproductionprocess.organization,
+            organization_desc=coproductionprocess.organization_desc,
             challenges=coproductionprocess.challenges,
             status=coproductionprocess.status,
             cloned_from_id=coproductionprocess.id,
         )
 
-        db_obj = await self.create(db=db, obj_in=new_coproductionprocess, creator=user, set_creator_admin=True)
-
-        if (from_view == 'story'):
-            # In case the clone is made from story the only administrator is the user.
-            # The current user is set as admin of the process in the previous line.
-            pass
-
-        else:
-            # In case is made from settings the administrators are the same as the process
-            administrators = coproductionprocess.administrators
-            for admin in administrators:
-                await self.add_administrator(db=db, db_obj=db_obj, user=admin, notifyAfterAdded=False)
-
-        #print("STARTING TREEITEMS")
-        phases_temp = coproductionprocess.children.copy()
-        phases = []
-        indexes = []
-
-        for id, phase in enumerate(phases_temp):
-            if not len(phase.prerequisites_ids):
-               # if not phase.is_disabled:
-                phases.append(phase)
-                indexes.append(str(phase.id))
-                phases_temp.pop(id)
-
-        while phases_temp:
-            for id, phase in enumerate(phases_temp):
-                if check_prerequistes(phase.prerequisites_ids, indexes):
-                    # if not phase.is_disabled:
-                    phases.append(phase)
-                    indexes.append(str(phase.id))
-                    phases_temp.pop(id)
-
-        #  Create a dict with the old ids and the new ids
-        ids_dict = {}
-        for phase in phases:
-            tmp_phase, phase_id_updates = await crud.phase.copy(db=db, obj_in=phase, coproductionprocess=db_obj, extra=ids_dict)
-            ids_dict['Phase_'+str(phase.id)] = tmp_phase.id
-            ids_dict.update(phase_id_updates)
-        #print("TREEITEMS COPIED")
-
-        #print("STARTING ASSET")
-        #print(from_view)
-        # Copy the assets of the project
-        assets = await self.get_assets(db, coproductionprocess, user,token=token)
-        contador_assets = 0
-        for asset in assets:
-            #print('El numero de assets es:')
-            contador_assets = contador_assets+1
-            #print(str(contador_assets)+'/'+str(len(assets)))
-
-            task = await crud.task.get(db, ids_dict['Task_' + str(asset.task_id)])
-
-            if (from_view == 'for_publication'):
-                # In the case of publcation in the catalogue copy of assets as readonly:
-                await crud.asset.copy(db, asset, user, task, token, True)
-            else:
-                await crud.asset.copy(db, asset, user, task, token)
-            #print('termino el copiado de '+str(asset.id))
-            #print('')
-
-        #print("ASSETS COPIED")
+        # In case the clone is made from story the only administrator is the user and the permissions are not copied,
+        # in case is made from settings the administrators are the same as the process.
+        # In the case of publication in the catalogue the assets are copied as readonly.
+        db_obj, failed_assets = await process_copier.copy(
+            db=db,
+            coproductionprocess=coproductionprocess,
+            process_in=new_coproductionprocess,
+            assets=await self.get_assets(db, coproductionprocess, user, token=token, enrich=False),
+            user=user,
+            token=token,
+            administrators=from_view != 'story',
+            permissions=from_view != 'story',
+            just_read=from_view == 'for_publication',
+        )
+        await self.log_on_create(db_obj)
+        await socket_manager.send_to_id(db_obj.id, {"event": "coproductionprocess_created"})
 
-        #print("STARTING PERMISSIONS")
-        # Copy the permissions of the project (THE NEW CREATOR IS THE CREATOR OF THE COPY)
-        if (from_view == 'story'):
-            # If the copy is made from the story then the dont need to create permissions
-            pass
-        else:
-            for permission in coproductionprocess.permissions:
-                treeitem = None
-                if permission.treeitem:
-                    treeitem = await treeitemsCrud.get(db, ids_dict[permission.treeitem.__class__.__name__ + '_' + str(permission.treeitem.id)])
-                #print("New permission")
-                new_permission = PermissionCreate(
-                    creator_id=user.id,
-                    creator=user,
-                    team_id=permission.team_id,
-                    team=permission.team,
-                    coproductionprocess_id=db_obj.id if permission.coproductionprocess else None,
-                    coproductionprocess=db_obj if permission.coproductionprocess else None,
-                    treeitem_id=treeitem.id if treeitem else None,
-                    treeitem=treeitem,
-                    access_assets_permission=permission.access_assets_permission,
-                    create_assets_permission=permission.create_assets_permission,
-                    delete_assets_permission=permission.delete_assets_permission)
-
-                await crud.permission.create(db=db, obj_in=new_permission, creator=user, notifyAfterAdded=False)
-
-        await log({"action": "CLONE","model":"COPRODUCTIONPROCESS","object_id":db_obj.id,"cloned_from_id":db_obj.cloned_from_id,"from_view":from_view})
+        await log({"action": "CLONE","model":"COPRODUCTIONPROCESS","object_id":db_obj.id,"cloned_from_id":db_obj.cloned_from_id,"from_view":from_view,"failed_assets":list(failed_assets.keys())})
 
         return db_obj
     
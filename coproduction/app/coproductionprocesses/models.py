@@ -2,6 +2,7 @@ from email.policy import default
 import uuid
 from sqlalchemy import (
     Column,
+    Computed,
     Enum,
     ForeignKey,
     Integer,
@@ -10,14 +11,18 @@ from sqlalchemy import (
     Date,
     Text,
     Boolean,
-    func
+    Index,
+    func,
+    select
 )
 from sqlalchemy_utils import aggregated
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship, backref
 from app.general.db.base_class import Base as BaseModel
+from app.general.utils.search import weighted_vector_sql
 from app.config import settings
 from app.phases.models import Phase
+from app.treeitems.models import TreeItem, closure, descendant_ids
 from sqlalchemy.ext.associationproxy import association_proxy
 from app.tables import coproductionprocess_administrators_association_table, coproductionprocess_tags_association_table
 from sqlalchemy.orm import Session
@@ -37,6 +42,17 @@ class CoproductionProcess(BaseModel):
     challenges = Column(Text, nullable=True)
     requirements = Column(Text, nullable=True)
 
+    # catalogue search, kept up to date by Postgres in the language of the process
+    search_vector = deferred(Column(TSVECTOR, Computed(weighted_vector_sql(
+        "language", [("name", "A"), ("description", "B"), ("aim", "C"), ("idea", "D")]
+    ), persisted=True)))
+
+    __table_args__ = (
+        Index('ix_coproductionprocess_search_vector', 'search_vector', postgresql_using='gin'),
+        # partial names, needs pg_trgm
+        Index('ix_coproductionprocess_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
     #Active Optional Modules
     incentive_and_rewards_state =Column(Boolean,nullable=True)
     leaderboard = Column(Boolean,nullable=True)
@@ -143,15 +159,18 @@ class CoproductionProcess(BaseModel):
         return participations
 
     def task_ids(self):
-        res = []
-        for phase in self.children:
-            if not phase.disabled_on:
-                for objective in phase.children:
-                    if not objective.disabled_on:
-                        for task in objective.children:
-                            if not task.disabled_on:
-                                res.append(task.id)
-        return res
+        # enabled tasks whose objective and phase are enabled too
+        db = Session.object_session(self)
+        disabled = select(closure.c.descendant_id).join(
+            TreeItem, TreeItem.id == closure.c.ancestor_id
+        ).where(
+            closure.c.descendant_id.in_(descendant_ids(self.id, type="task")),
+            TreeItem.disabled_on != None
+        )
+        return [id for id, in db.query(TreeItem.id).filter(
+            TreeItem.id.in_(descendant_ids(self.id, type="task")),
+            TreeItem.id.notin_(disabled)
+        )]
     
 
 
@@ -3,6 +3,7 @@ from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 from app.general.utils.CRUDBase import CRUDBase
+from app.general.utils.keyset import KeysetPage, paginate
 from app.models import Notification, CoproductionProcessNotification, User, Organization, Asset
 from app.schemas import NotificationCreate, NotificationPatch, CoproductionProcessNotificationCreate, CoproductionProcessNotificationPatch
 import uuid
@@ -11,8 +12,11 @@ from app.users.crud import exportCrud as users_crud
 from app.assets.crud import exportCrud as assets_crud
 from app.treeitems.crud import exportCrud as treeitems_crud
 
-from sqlalchemy import or_, and_
+from sqlalchemy import and_, cast, func, or_
+from sqlalchemy.dialects.postgresql import UUID
 from fastapi.encoders import jsonable_encoder
+from app.fanout import notification_fanout
+from app.notifications.parameters import parse_parameters
 from app.sockets import socket_manager
 from uuid_by_string import generate_uuid
 from app import crud, models, schemas
@@ -22,53 +26,49 @@ from app.messages import log
 
 
 class CRUDCoproductionProcessNotification(CRUDBase[CoproductionProcessNotification, CoproductionProcessNotificationCreate, CoproductionProcessNotificationPatch]):
-    async def get_multi(self, db: Session, user: User) -> Optional[List[CoproductionProcessNotification]]:
-        return db.query(CoproductionProcessNotification).all()
+    async def get_multi(self, db: Session, user: User, page: KeysetPage = None) -> Optional[List[CoproductionProcessNotification]]:
+        return paginate(db.query(CoproductionProcessNotification), CoproductionProcessNotification, page)
 
     # Get all notifications by user:
-    async def get_coproductionprocess_notifications(self, db: Session, coproductionprocess_id: str, user) -> Optional[List[CoproductionProcessNotification]]:
-
-        listofCoproductionProcessNotifications = db.query(CoproductionProcessNotification).filter(
-            models.CoproductionProcessNotification.coproductionprocess_id == coproductionprocess_id).order_by(models.CoproductionProcessNotification.created_at.desc()).all()
-
-        # Filtrar las notificaciones a las que tengo permisos:
-        for notification in listofCoproductionProcessNotifications:
-            if notification.asset_id:
-                queries = []
-                queries.append(Asset.id == notification.asset_id)
-                asset = db.query(Asset).filter(*queries).first()
-
-                if (asset):
-                    tienePermisosListado = assets_crud.can_list(
-                        db=db, user=user, task=asset.task)
-
-                    # Remove the notification a user dont have permissions
-                    if not tienePermisosListado:
-                        listofCoproductionProcessNotifications.remove(
-                            notification)
-                else:
-                    listofCoproductionProcessNotifications.remove(notification)
-
-        return listofCoproductionProcessNotifications
-
-    async def get_coproductionprocess_notifications_byAseetId(self, db: Session, coproductionprocess_id: str, asset_id: str) -> Optional[List[CoproductionProcessNotification]]:
-        listofCoproductionProcessNotifications = db.query(CoproductionProcessNotification).filter(and_(
+    async def get_coproductionprocess_notifications(self, db: Session, coproductionprocess_id: str, user, treeitem_id: str = None, team_id: str = None, page: KeysetPage = None) -> Optional[List[CoproductionProcessNotification]]:
+
+        query = db.query(CoproductionProcessNotification).filter(
+            models.CoproductionProcessNotification.coproductionprocess_id == coproductionprocess_id)
+        # timelines of a treeitem or a team, using the indexes on the parameters
+        if treeitem_id:
+            query = query.filter(CoproductionProcessNotification.parameters["treeitem_id"].astext == str(treeitem_id))
+        if team_id:
+            query = query.filter(CoproductionProcessNotification.parameters["team_id"].astext == str(team_id))
+        # only the notifications without asset or of the existing assets the user has access to
+        asset_id = func.nullif(CoproductionProcessNotification.asset_id, '')
+        query = query.outerjoin(Asset, Asset.id == cast(asset_id, UUID(as_uuid=True))).filter(or_(
+            asset_id == None,
+            and_(Asset.id != None, or_(
+                crud.permission.is_administrator(user, coproductionprocess_id),
+                Asset.task_id.in_(crud.permission.treeitem_ids_with(user, coproductionprocess_id, "access_assets_permission")),
+            )),
+        ))
+        return paginate(query, CoproductionProcessNotification, page)
+
+    async def get_coproductionprocess_notifications_byAseetId(self, db: Session, coproductionprocess_id: str, asset_id: str, page: KeysetPage = None) -> Optional[List[CoproductionProcessNotification]]:
+        listofCoproductionProcessNotifications = paginate(db.query(CoproductionProcessNotification).filter(and_(
             models.CoproductionProcessNotification.coproductionprocess_id == coproductionprocess_id,
             models.CoproductionProcessNotification.asset_id == asset_id
         )
-        ).order_by(models.CoproductionProcessNotification.created_at.desc()).all()
+        ), CoproductionProcessNotification, page)
         # print(listofCoproductionProcessNotifications)
         return listofCoproductionProcessNotifications
 
-    async def get_coproductionprocess_notifications_justbyAseetId(self, db: Session, asset_id: str) -> Optional[List[CoproductionProcessNotification]]:
-        listofCoproductionProcessNotifications = db.query(CoproductionProcessNotification).filter(models.CoproductionProcessNotification.asset_id == asset_id
-                                                                                                  ).order_by(models.CoproductionProcessNotification.created_at.desc()).all()
+    async def get_coproductionprocess_notifications_justbyAseetId(self, db: Session, asset_id: str, page: KeysetPage = None) -> Optional[List[CoproductionProcessNotification]]:
+        listofCoproductionProcessNotifications = paginate(db.query(CoproductionProcessNotification).filter(models.CoproductionProcessNotification.asset_id == asset_id
+                                                                                                  ), CoproductionProcessNotification, page)
         # print(listofCoproductionProcessNotifications)
         return listofCoproductionProcessNotifications
 
     async def create(self, db: Session, obj_in: CoproductionProcessNotificationCreate) -> CoproductionProcessNotification:
 
         obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data["parameters"] = parse_parameters(obj_in_data.get("parameters"))
 
         db_obj = CoproductionProcessNotification(**obj_in_data)
 
@@ -76,10 +76,7 @@ class CRUDCoproductionProcessNotification(CRUDBase[CoproductionProcessNotificati
         db.commit()
         db.refresh(db_obj)
 
-        parametros = json.loads(db_obj.parameters)
-
-        selectTreeItemId = json.loads(db_obj.parameters)[
-            'treeitem_id']
+        selectTreeItemId = db_obj.parameters['treeitem_id']
         await socket_manager.broadcast({"event": "contribution_created", "extra": {"task_id": selectTreeItemId}})
 
         # await socket_manager.send_to_id(db_obj.coproductionprocess_id, {"event": "contribution_created", "extra": {"task_id": jsonable_encoder(parametros['treeitem_id'])}})
@@ -93,45 +90,22 @@ class CRUDCoproductionProcessNotification(CRUDBase[CoproductionProcessNotificati
 
         return db_obj
 
-    async def createList(self, db: Session, registros: List[CoproductionProcessNotificationCreate]) -> Any:
+    async def createList(self, db: Session, registros: List[dict]) -> Any:
+        """
+        Creates the notifications of many users in one insert and one commit.
+        """
         try:
-            # Iniciar una transacción
-            # with db.begin() as transaction:
-
             if (len(registros) > 0):
+                rows = notification_fanout.add_to_process(db, registros)
+                db.commit()
 
-                coproductionProcessId = ''
-                selectTreeItemId = ''
-
-                for notification in registros:
-                    # Crear una instancia de la entidad CoproductionProcessNotification
-                    obj_in_data = jsonable_encoder(notification)
-                    notification_model = CoproductionProcessNotification(
-                        **obj_in_data)
-                    notification_model.user_id = notification.user_id
-
-                    # Agregar la instancia a la sesión de SQLAlchemy
-                    db.add(notification_model)
-
-                    # print('The selected coproductionProcess is:')
-                    # print(notification_model.coproductionprocess_id)
-                    # print('The selected treeItem is:')
-                    # print(json.loads(notification_model.parameters)
-                    #       ['treeitem_id'])
-                    coproductionProcessId = notification_model.coproductionprocess_id
-                    selectTreeItemId = json.loads(notification_model.parameters)[
-                        'treeitem_id']
-                    
-                    db.commit()
-                    db.refresh(notification_model)
-
-                    if( notification_model.claim_type is None ):
-                        await self.log_on_create(notification_model)
+                for row in rows:
+                    selectTreeItemId = row["parameters"]['treeitem_id']
+                    if( row.get("claim_type") is None ):
+                        await log({"action": "CREATE", "model": self.modelName, "object_id": row["id"]})
                     else:
                         #When the notification is a claim, we need to create a log
-                        await log({"action": "CREATE","model":"CLAIM","object_id":notification_model.id,"asset_id":notification_model.asset_id,"task_id":selectTreeItemId,"coproductionprocess_id":notification_model.coproductionprocess_id})
-
-                
+                        await log({"action": "CREATE","model":"CLAIM","object_id":row["id"],"asset_id":row["asset_id"],"task_id":selectTreeItemId,"coproductionprocess_id":row["coproductionprocess_id"]})
 
                 # Envio la notificacion al socket
 
@@ -157,6 +131,8 @@ class CRUDCoproductionProcessNotification(CRUDBase[CoproductionProcessNotificati
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
+        if "parameters" in update_data:
+            update_data["parameters"] = parse_parameters(update_data["parameters"])
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
@@ -175,28 +151,24 @@ class CRUDCoproductionProcessNotification(CRUDBase[CoproductionProcessNotificati
         coproductionprocess_id: str
     ) -> Optional[List[CoproductionProcessNotification]]:
 
+        # only the notifications with the name of an asset
         resultNot = db.query(models.CoproductionProcessNotification).filter(
-            models.CoproductionProcessNotification.coproductionprocess_id == coproductionprocess_id).all()
+            models.CoproductionProcessNotification.coproductionprocess_id == coproductionprocess_id,
+            models.CoproductionProcessNotification.parameters.has_key('assetName')).all()
 
-        # Loop all notifications of the coproduction process
         for copronot in resultNot:
 
             # Set the dinamic parameters
-            parametersJson = json.loads(copronot.parameters.replace("'", '"'))
-
-            if ('assetName' in json.dumps(parametersJson)):
-
-                parametersJson['assetName'] = parametersJson['assetName'].replace(
-                    '{assetid:'+asset_id+'}', html.escape(name))
-                parametersJson['assetLink'] = ''
-                parametersJson['showIcon'] = 'hidden'
-                parametersJson['showLink'] = ''
-
-                copronot.parameters = json.dumps(parametersJson)
-
-                # copronot.parameters=copronot.parameters.replace('{assetid:'+asset_id+'}', name)
-                # print('resp '+copronot.parameters)
-                db.add(copronot)
+            parametersJson = dict(copronot.parameters)
+            parametersJson['assetName'] = parametersJson['assetName'].replace(
+                '{assetid:'+asset_id+'}', html.escape(name))
+            parametersJson['assetLink'] = ''
+            parametersJson['showIcon'] = 'hidden'
+            parametersJson['showLink'] = ''
+
+            # a new object, so that the change is saved
+            copronot.parameters = parametersJson
+            db.add(copronot)
 
         db.commit()
         # print('Se ha reemplazado exitosamente los nombres: '+str(asset_id)+' por '+name)
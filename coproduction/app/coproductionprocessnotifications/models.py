@@ -1,7 +1,7 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, String, Table, Integer, func, Boolean, Enum, Text, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, ForeignKey, Index, String, Table, Integer, func, Boolean, Enum, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import backref, relationship, declarative_base
 
 from app.general.db.base_class import Base as BaseModel
@@ -21,8 +21,16 @@ class CoproductionProcessNotification(BaseModel):
     user_id = Column(String, nullable=True)
     notification_id = Column(UUID(as_uuid=True), ForeignKey("notification.id", use_alter=True, ondelete='SET NULL'), nullable=False)
 
+    # the timelines filter by these keys of the parameters, the feeds are read newest first
+    __table_args__ = (
+        Index('ix_coproductionprocessnotification_treeitem_id', text("(parameters ->> 'treeitem_id')")),
+        Index('ix_coproductionprocessnotification_team_id', text("(parameters ->> 'team_id')")),
+        Index('ix_coproductionprocessnotification_coproductionprocess_feed', 'coproductionprocess_id', 'created_at', 'id'),
+        Index('ix_coproductionprocessnotification_asset_feed', 'asset_id', 'created_at', 'id'),
+    )
+
     #Json object with information relevant to a notification:
-    parameters = Column(JSON, nullable=True)
+    parameters = Column(JSONB, nullable=True)
 
     claim_type = Column(Enum(ClaimTypes, create_constraint=False, native_enum=False), nullable=True)
     
@@ -1,9 +1,10 @@
 import uuid
 from typing import Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from app.general.utils.AllOptional import AllOptional
 from datetime import datetime
+from app.notifications.parameters import dump_parameters
 from app.utils import ChannelTypes
 from app.utils import ClaimTypes
 
@@ -14,7 +15,11 @@ class CoproductionProcessNotificationBase(BaseModel):
     claim_type: Optional[ClaimTypes]
     asset_id: Optional[str]
     user_id: Optional[str]
- 
+
+    @validator('parameters', pre=True)
+    def parameters_as_string(cls, v):
+        # stored as JSONB, returned as the JSON string the clients parse
+        return dump_parameters(v)
 
 
 class CoproductionProcessNotification(CoproductionProcessNotificationBase):
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os.path
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app.catalogue import interlinker_cache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend service after `threshold` consecutive failures.
+
+    While open, every call is rejected straight away; after `reset_timeout` seconds a single
+    trial call is let through and its result closes or reopens the breaker.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def release(self):
+        # the trial ended without a result (it was cancelled), the next call tries again
+        self.trial_running = False
+
+    def failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+class AssetEnricher:
+    """
+    Adds the public data of the assets (name, icon, link) as `internalData`, asking every
+    backend service concurrently.
+
+    Assets are grouped by the service that stores them, requests run under a global semaphore,
+    each service has its own timeout and circuit breaker, and an asset whose service fails gets
+    an `error` key in its `internalData` instead of failing the whole list.
+    Services whose software interlinker has the `bulk` capability get a single
+    POST /assets/bulk with all the ids; the rest (or a failed bulk call) get one GET per asset.
+    """
+
+    def __init__(self, concurrency: int, timeout: float, service_timeouts: Dict[str, float], breaker_threshold: int, breaker_reset_timeout: float):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.service_timeouts = service_timeouts
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, service: str) -> CircuitBreaker:
+        if service not in self.breakers:
+            self.breakers[service] = CircuitBreaker(self.breaker_threshold, self.breaker_reset_timeout)
+        return self.breakers[service]
+
+    @staticmethod
+    def service_of(asset) -> str:
+        if "loomio" in asset.link:
+            return "loomio"
+        if "servicepedia" in asset.link:
+            return "augmenterservice"
+        return os.path.split(asset.link)[0].split("/")[3]
+
+    async def fetch(self, client: httpx.AsyncClient, service: str, url: str, token: str = None, method: str = "GET", json: dict = None):
+        breaker = self.breaker(service)
+        if not breaker.allow():
+            raise ServiceUnavailable(f"{service} is unavailable")
+        headers = {"Authorization": "Bearer " + token} if token else {}
+        cookies = {"auth_token": token} if token else {}
+        try:
+            response = await asyncio.wait_for(
+                client.request(method, url, headers=headers, cookies=cookies, json=json),
+                timeout=self.service_timeouts.get(service, self.timeout),
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            breaker.failure()
+            raise
+        except BaseException:
+            # cancelled: not a failure of the service, but the trial must not stay running
+            breaker.release()
+            raise
+        breaker.success()
+        return data
+
+    async def internal_data(self, client: httpx.AsyncClient, service: str, asset, token: str) -> dict:
+        serverName = settings.SERVER_NAME
+        if service == "loomio":
+            asset_name = "Loomio File"
+            try:
+                data = await self.fetch(client, service, f"https://loomio/api/v1/assets/{asset.external_asset_id}", token)
+                asset_name = data.get("name", asset_name)
+            except Exception as e:
+                logger.warning(f"Could not get the loomio asset {asset.external_asset_id}: {str(e)}")
+            return {"icon": "https://" + serverName + "/catalogue/static/loomio/logotype.png", "name": asset_name, "link": asset.link}
+
+        if service == "augmenterservice":
+            data = await self.fetch(client, service, f"http://augmenterservice/assets/{asset.external_asset_id}")
+            return {"icon": "https://" + serverName + "/catalogue/static/augmenter/logotype.png", "name": data["name"], "link": asset.link + "/view"}
+
+        return await self.fetch(client, service, f"http://{service}/assets/{asset.external_asset_id}")
+
+    async def enrich_asset(self, semaphore: asyncio.Semaphore, client: httpx.AsyncClient, service: str, asset, token: str):
+        async with semaphore:
+            try:
+                asset.internalData = await self.internal_data(client, service, asset, token)
+            except Exception as e:
+                logger.warning(f"Could not get the public data of asset {asset.id} from {service}: {repr(e)}")
+                asset.internalData = {
+                    "name": None,
+                    "link": asset.link,
+                    "error": "timeout" if isinstance(e, asyncio.TimeoutError) else "unavailable",
+                }
+
+    @staticmethod
+    def supports_bulk(assets: List) -> bool:
+        # the software interlinker advertises POST /assets/bulk in its catalogue entry
+        return len(assets) > 1 and all((getattr(asset, "software_response", None) or {}).get("bulk") for asset in assets)
+
+    async def enrich_in_bulk(self, semaphore: asyncio.Semaphore, client: httpx.AsyncClient, service: str, assets: List, token: str):
+        try:
+            async with semaphore:
+                data = await self.fetch(client, service, f"http://{service}/assets/bulk", method="POST", json={
+                    "ids": [asset.external_asset_id for asset in assets]
+                })
+            if isinstance(data, list):
+                data = {str(item.get("id", item.get("_id"))): item for item in data}
+        except ServiceUnavailable:
+            data = None
+        except Exception as e:
+            logger.warning(f"Bulk request to {service} failed, asking for every asset: {repr(e)}")
+            await asyncio.gather(*[self.enrich_asset(semaphore, client, service, asset, token) for asset in assets])
+            return
+
+        for asset in assets:
+            if data and str(asset.external_asset_id) in data:
+                asset.internalData = data[str(asset.external_asset_id)]
+            else:
+                asset.internalData = {"name": None, "link": asset.link, "error": "unavailable" if data is None else "not found"}
+
+    async def enrich(self, assets: List, token: str = "") -> List:
+        await run_in_threadpool(interlinker_cache.prefetch_for_assets, assets)
+
+        by_service = defaultdict(list)
+        for asset in assets:
+            if asset.type == "externalasset":
+                asset.internalData = {"icon": asset.icon, "name": asset.name, "link": asset.uri}
+            elif asset.type == "internalasset":
+                try:
+                    by_service[self.service_of(asset)].append(asset)
+                except Exception:
+                    asset.internalData = {"name": None, "link": None, "error": "unknown service"}
+
+        if by_service:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            client = httpx.AsyncClient(
+                pool_limits=httpx.PoolLimits(soft_limit=self.concurrency, hard_limit=self.concurrency * 2),
+            )
+            jobs = []
+            for service, service_assets in by_service.items():
+                if service not in ("loomio", "augmenterservice") and self.supports_bulk(service_assets):
+                    jobs.append(self.enrich_in_bulk(semaphore, client, service, service_assets, token))
+                else:
+                    jobs += [self.enrich_asset(semaphore, client, service, asset, token) for asset in service_assets]
+            try:
+                await asyncio.gather(*jobs)
+            finally:
+                await client.close()
+        return assets
+
+    def stats(self) -> dict:
+        return {service: {"state": breaker.state, "failures": breaker.failures} for service, breaker in self.breakers.items()}
+
+
+asset_enricher = AssetEnricher(
+    concurrency=settings.ASSETS_ENRICHMENT_CONCURRENCY,
+    timeout=settings.ASSETS_ENRICHMENT_TIMEOUT,
+    service_timeouts=settings.ASSETS_ENRICHMENT_SERVICE_TIMEOUTS,
+    breaker_threshold=settings.ASSETS_ENRICHMENT_BREAKER_THRESHOLD,
+    breaker_reset_timeout=settings.ASSETS_ENRICHMENT_BREAKER_RESET_TIMEOUT,
+)
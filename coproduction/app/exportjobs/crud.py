@@ -0,0 +1,50 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.general.utils.CRUDBase import CRUDBase
+from app.models import ExportJob
+from app.schemas import ExportJobCreate, ExportJobPatch
+from app.utils import JobStatus
+
+ACTIVE = [JobStatus.pending, JobStatus.running]
+
+
+class CRUDExportJob(CRUDBase[ExportJob, ExportJobCreate, ExportJobPatch]):
+    async def get_multi_by_coproductionprocess(self, db: Session, coproductionprocess_id, skip: int = 0, limit: int = 20) -> List[ExportJob]:
+        return db.query(ExportJob).filter(
+            ExportJob.coproductionprocess_id == coproductionprocess_id
+        ).order_by(ExportJob.created_at.desc()).offset(skip).limit(limit).all()
+
+    async def get_active(self, db: Session, coproductionprocess_id) -> Optional[ExportJob]:
+        return db.query(ExportJob).filter(
+            ExportJob.coproductionprocess_id == coproductionprocess_id,
+            ExportJob.status.in_(ACTIVE)
+        ).order_by(ExportJob.created_at.desc()).first()
+
+    async def get_last_finished(self, db: Session, coproductionprocess_id) -> Optional[ExportJob]:
+        return db.query(ExportJob).filter(
+            ExportJob.coproductionprocess_id == coproductionprocess_id,
+            ExportJob.status == JobStatus.finished,
+            ExportJob.artifact_path.isnot(None)
+        ).order_by(ExportJob.finished_at.desc()).first()
+
+    async def cancel(self, db: Session, job: ExportJob) -> ExportJob:
+        from app.celery_app import celery_app
+        # locked, so it does not overwrite a job the worker is finishing
+        db.refresh(job, with_for_update=True)
+        if job.status not in ACTIVE:
+            # releases the lock
+            db.commit()
+            return job
+        # a running job notices it the next time it reports progress
+        job.status = JobStatus.cancelled
+        job.access_token = None
+        db.commit()
+        db.refresh(job)
+        if job.task_id:
+            celery_app.control.revoke(job.task_id)
+        return job
+
+
+exportCrud = CRUDExportJob(ExportJob)
@@ -0,0 +1,49 @@
+import uuid
+
+from sqlalchemy import BigInteger, Column, DateTime, Enum, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import backref, relationship
+
+from app.general.db.base_class import Base as BaseModel
+from app.utils import JobStatus
+
+
+class ExportJob(BaseModel):
+    """Export of a coproduction process run by the worker, with its progress and the zip it produced."""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    coproductionprocess_id = Column(
+        UUID(as_uuid=True), ForeignKey("coproductionprocess.id", ondelete='CASCADE'), index=True
+    )
+    coproductionprocess = relationship("CoproductionProcess", foreign_keys=[coproductionprocess_id], backref=backref('export_jobs', passive_deletes=True))
+
+    creator_id = Column(String, ForeignKey("user.id", ondelete='SET NULL'), nullable=True)
+    # id of the celery task, used to revoke it
+    task_id = Column(String, nullable=True)
+    # token of the creator for the worker, kept out of the celery message and cleared when the job ends
+    access_token = Column(Text, nullable=True)
+
+    status = Column(Enum(JobStatus, create_constraint=False, native_enum=False), default=JobStatus.pending, nullable=False)
+
+    phases_total = Column(Integer, default=0)
+    phases_done = Column(Integer, default=0)
+    assets_total = Column(Integer, default=0)
+    assets_done = Column(Integer, default=0)
+    assets_failed = Column(Integer, default=0)
+    # files not downloaded again because the stored copy was still up to date
+    assets_reused = Column(Integer, default=0)
+
+    artifact_path = Column(String, nullable=True)
+    artifact_size = Column(BigInteger, nullable=True)
+    error = Column(Text, nullable=True)
+
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # one export of a process at a time
+    __table_args__ = (
+        Index('ix_exportjob_active', 'coproductionprocess_id', unique=True, postgresql_where=text("status IN ('pending', 'running')")),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ExportJob {self.id} {self.coproductionprocess_id} {self.status}>"
@@ -0,0 +1,47 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.utils import JobStatus
+
+
+class ExportJobBase(BaseModel):
+    coproductionprocess_id: uuid.UUID
+    creator_id: Optional[str]
+
+
+class ExportJobCreate(ExportJobBase):
+    pass
+
+
+class ExportJobPatch(BaseModel):
+    task_id: Optional[str]
+    status: Optional[JobStatus]
+    error: Optional[str]
+
+
+class ExportJob(ExportJobBase):
+    id: uuid.UUID
+    created_at: datetime
+    updated_at: Optional[datetime]
+    task_id: Optional[str]
+    status: JobStatus
+    phases_total: int
+    phases_done: int
+    assets_total: int
+    assets_done: int
+    assets_failed: int
+    assets_reused: int
+    artifact_size: Optional[int]
+    error: Optional[str]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class ExportJobOut(ExportJob):
+    pass
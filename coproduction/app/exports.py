@@ -0,0 +1,327 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from typing import List, Optional
+
+import aiofiles
+import httpx
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models
+from app.config import settings
+from app.jobs import Progress
+
+logger = logging.getLogger(__name__)
+
+
+def topological_sort(tasks):
+    # Order the phases by the order of the tasks
+    visited = set()
+    stack = []
+    mapping = {task.name: task for task in tasks}
+
+    def visit(task):
+        if task.name not in visited:
+            visited.add(task.name)
+            for prereq_name in task.prerequisites:
+                if prereq_name.name in mapping:
+                    visit(mapping[prereq_name.name])
+            stack.append(task)
+
+    # Visit tasks without prerequisites first
+    for task in tasks:
+        if not task.prerequisites:
+            visit(task)
+
+    # Then visit the rest
+    for task in tasks:
+        if task.name not in visited:
+            visit(task)
+
+    return stack
+
+
+def sanitize_filename(filename):
+    # Replace spaces with underscores
+    sanitized = filename.replace(" ", "_")
+    # Remove any other disallowed characters
+    disallowed_characters = ['<', '>', ':', '"', '/', '\\', '|', '?', '*']
+    for char in disallowed_characters:
+        sanitized = sanitized.replace(char, '')
+    return sanitized
+
+
+def datetime_serializer(o):
+    if isinstance(o, datetime):
+        return o.isoformat()
+    raise TypeError("Type not serializable")
+
+
+class ProcessExporter:
+    """
+    Exports a coproduction process (schema, process data, logotype and the files of its internal assets)
+    as a zip that can be imported again.
+
+    Asset files are downloaded concurrently (at most `concurrency` at a time) with exponential backoff
+    between retries and streamed to disk in chunks; writing the json files and the zip runs in the
+    threadpool, so the event loop is never blocked. Every export works in its own temporary directory.
+
+    When `blob_directory` is set, the downloaded files are also kept there by asset id together with
+    the ETag / Last-Modified of the response. The next export of the asset sends them back as a
+    conditional request and reuses the stored file if the drive answers 304 Not Modified.
+    """
+
+    def __init__(self, directory: str, concurrency: int, timeout: float, max_retries: int, backoff: float, max_backoff: float, blob_directory: Optional[str] = None):
+        self.directory = directory
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.blob_directory = blob_directory
+
+    def download_url(self, asset) -> str:
+        return f"http://googledrive:80/assets/{asset.internalData['id']}/download"
+
+    def blob_path(self, asset) -> str:
+        return os.path.join(self.blob_directory, str(asset.id))
+
+    def read_blob_info(self, asset) -> Optional[dict]:
+        blob = self.blob_path(asset)
+        try:
+            with open(blob + ".json") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return info if os.path.exists(blob) else None
+
+    def link(self, source: str, file_path: str):
+        # hard link when possible, the blob and the export usually live in the same volume
+        try:
+            os.link(source, file_path)
+        except OSError:
+            shutil.copyfile(source, file_path)
+
+    def delay(self, attempt: int) -> float:
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1)
+
+    async def download(self, client: httpx.AsyncClient, asset, assets_dir: str, token: str):
+        """
+        Downloads the file of the asset into assets_dir, returns its path and whether the stored copy was reused.
+        """
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+            'Authorization': token
+        }
+        info = self.read_blob_info(asset) if self.blob_directory else None
+        if info:
+            if info.get("etag"):
+                headers['If-None-Match'] = info["etag"]
+            if info.get("last_modified"):
+                headers['If-Modified-Since'] = info["last_modified"]
+
+        for attempt in range(self.max_retries):
+            try:
+                response = await client.get(self.download_url(asset), headers=headers, stream=True)
+                try:
+                    if info and response.status_code == 304:
+                        file_path = os.path.join(assets_dir, str(asset.id) + "." + sanitize_filename(info["filename"]))
+                        blob = self.blob_path(asset)
+                        self.link(blob, file_path)
+                        # keeps it from being pruned
+                        os.utime(blob)
+                        return file_path, True
+                    response.raise_for_status()
+                    filename = asset.internalData['name']
+                    match = re.search(r'filename\*?="([^"]+)', response.headers.get('Content-Disposition', ''))
+                    if match:
+                        filename = match.group(1)
+                    file_path = os.path.join(assets_dir, str(asset.id) + "." + sanitize_filename(filename))
+                    target = self.blob_path(asset) if self.blob_directory else file_path
+                    # write to a temporary name so a failed attempt does not leave half a file behind,
+                    # unique because two exports can download the same blob at the same time
+                    part = f"{target}.{uuid.uuid4().hex}.part"
+                    async with aiofiles.open(part, 'wb') as file:
+                        async for chunk in response.stream():
+                            await file.write(chunk)
+                    os.replace(part, target)
+                    if self.blob_directory:
+                        with open(target + ".json", "w") as f:
+                            json.dump({
+                                "etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified"),
+                                "filename": filename,
+                            }, f)
+                        self.link(target, file_path)
+                    return file_path, False
+                finally:
+                    await response.close()
+            except Exception as e:
+                if attempt + 1 == self.max_retries:
+                    raise
+                delay = self.delay(attempt)
+                logger.warning(f"Could not download asset {asset.id} ({attempt + 1}/{self.max_retries}), retrying in {delay:.1f}s: {repr(e)}")
+                await asyncio.sleep(delay)
+
+    async def download_all(self, assets: List, assets_dir: str, token: str, progress: Progress = Progress()) -> dict:
+        """
+        Downloads the files of the internal assets, returns the path of every downloaded asset by id.
+        """
+        internal_assets = [asset for asset in assets if asset.type == "internalasset"]
+        progress.assets(len(internal_assets))
+        if not internal_assets:
+            return {}
+        os.makedirs(assets_dir, exist_ok=True)
+        if self.blob_directory:
+            os.makedirs(self.blob_directory, exist_ok=True)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        client = httpx.AsyncClient(
+            timeout=self.timeout,
+            pool_limits=httpx.PoolLimits(soft_limit=self.concurrency, hard_limit=self.concurrency * 2),
+        )
+
+        async def download(asset):
+            async with semaphore:
+                progress.check()
+                try:
+                    path, reused = await self.download(client, asset, assets_dir, token)
+                except Exception as e:
+                    logger.error(f"Error while trying to download the asset {asset.id}: {repr(e)}")
+                    progress.asset_done("failed")
+                    return asset.id, None
+                progress.asset_done("reused" if reused else "done")
+                return asset.id, path
+
+        try:
+            results = await asyncio.gather(*[download(asset) for asset in internal_assets])
+        finally:
+            await client.close()
+        return {id: path for id, path in results if path}
+
+    async def schema(self, db: Session, coproductionprocess: models.CoproductionProcess, token: str, progress: Progress = Progress()):
+        """
+        The ordered tree of the process with the assets of every task, and the list of all those assets.
+        """
+        all_assets = []
+        phase_dict_list = []
+        phases = topological_sort(coproductionprocess.children)
+        progress.phases(len(phases))
+        for phase in phases:
+            progress.check()
+            phase_dict = phase.to_dict()
+            phase_dict["objectives"] = []
+            for objective in topological_sort(phase.children):
+                objective_dict = objective.to_dict()
+                objective_dict["tasks"] = []
+                for task in topological_sort(objective.children):
+                    task_dict = task.to_dict()
+                    assets = await crud.asset.get_multi_withIntData(db, task=task, token=token)
+                    task_dict["assets"] = []
+                    for asset in assets:
+                        try:
+                            task_dict["assets"].append(asset.dict())
+                            all_assets.append(asset)
+                        except Exception:
+                            logger.error(f"Error while trying to export the asset {asset.id}")
+                    objective_dict["tasks"].append(task_dict)
+                phase_dict["objectives"].append(objective_dict)
+            phase_dict_list.append(phase_dict)
+            progress.phase_done()
+        return phase_dict_list, all_assets
+
+    def write_files(self, root: str, coproductionprocess: models.CoproductionProcess, phase_dict_list: list):
+        with open(os.path.join(root, 'schema.json'), 'w') as f:
+            f.write(json.dumps(phase_dict_list, indent=2, default=datetime_serializer))
+
+        coproduction_dict = coproductionprocess.to_dict()
+        coproduction_dict['name'] = "import_" + coproduction_dict['name']
+        with open(os.path.join(root, "coproduction.json"), "w") as f:
+            f.write(json.dumps(coproduction_dict))
+
+        if coproductionprocess.logotype:
+            shutil.copy('/app' + coproductionprocess.logotype, root)
+
+    def write_zip(self, workdir: str, zip_path: str):
+        # entries keep the processes_exported/<process name>/... layout expected by the import
+        with zipfile.ZipFile(zip_path + ".part", 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for folder, _, files in os.walk(workdir):
+                for file in files:
+                    path = os.path.join(folder, file)
+                    zipf.write(path, os.path.relpath(path, workdir))
+        os.replace(zip_path + ".part", zip_path)
+
+    async def export(self, db: Session, coproductionprocess: models.CoproductionProcess, token: str, progress: Progress = Progress()) -> str:
+        """
+        Exports the process and returns the path of the zip.
+        """
+        workdir = await run_in_threadpool(tempfile.mkdtemp, prefix="export_")
+        try:
+            root = os.path.join(workdir, 'processes_exported', coproductionprocess.name.replace(' ', '_'))
+            os.makedirs(root, exist_ok=True)
+
+            phase_dict_list, assets = await self.schema(db, coproductionprocess, token, progress)
+            await self.download_all(assets, os.path.join(root, 'assets'), token, progress)
+            progress.check()
+            await run_in_threadpool(self.write_files, root, coproductionprocess, phase_dict_list)
+
+            os.makedirs(self.directory, exist_ok=True)
+            zip_path = os.path.join(self.directory, f"{coproductionprocess.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+            await run_in_threadpool(self.write_zip, workdir, zip_path)
+            return zip_path
+        finally:
+            await run_in_threadpool(shutil.rmtree, workdir, True)
+
+    def prune(self, coproductionprocess_id):
+        """
+        Removes all the zips of the process except the most recent one.
+        """
+        try:
+            files = sorted(
+                [f for f in os.listdir(self.directory) if f.startswith(str(coproductionprocess_id)) and f.endswith('.zip')],
+                reverse=True
+            )
+            for file in files[1:]:
+                os.remove(os.path.join(self.directory, file))
+        except Exception as e:
+            logger.error(f"Error removing old exports: {e}")
+
+    def prune_blobs(self, max_age: float):
+        """
+        Removes the stored asset files that no export has used in the last `max_age` seconds.
+        """
+        if not self.blob_directory or not os.path.isdir(self.blob_directory):
+            return
+        limit = time.time() - max_age
+        for file in os.listdir(self.blob_directory):
+            path = os.path.join(self.blob_directory, file)
+            # the .json is removed with its blob
+            if file.endswith(".json"):
+                continue
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+                    if os.path.exists(path + ".json"):
+                        os.remove(path + ".json")
+            except OSError as e:
+                logger.error(f"Error removing the stored file {file}: {e}")
+
+
+process_exporter = ProcessExporter(
+    directory=settings.EXPORT_DIRECTORY,
+    concurrency=settings.EXPORT_DOWNLOAD_CONCURRENCY,
+    timeout=settings.EXPORT_DOWNLOAD_TIMEOUT,
+    max_retries=settings.EXPORT_DOWNLOAD_RETRIES,
+    backoff=settings.EXPORT_DOWNLOAD_BACKOFF,
+    max_backoff=settings.EXPORT_DOWNLOAD_MAX_BACKOFF,
+    blob_directory=settings.EXPORT_BLOB_DIRECTORY,
+)
@@ -0,0 +1,77 @@
+import uuid
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+from uuid_by_string import generate_uuid
+
+from app.models import CoproductionProcessNotification, Notification, UserNotification
+from app.notifications.crud import exportCrud as notifications_crud
+from app.sockets import socket_manager
+from app.utils import ChannelTypes
+
+
+class NotificationFanout:
+    """
+    Creates the in-app notifications of an event for many users at once.
+
+    The template of the event is looked up once, the rows of all the recipients are inserted with one
+    bulk insert and the socket events of all of them are published together, so notifying a team costs
+    the same number of queries whatever its size.
+    """
+
+    async def template(self, db: Session, event: str, language: str) -> Optional[Notification]:
+        return await notifications_crud.get_notification_by_event(db=db, event=event, language=language)
+
+    def user_rows(self, notification: Notification, user_ids: Iterable[str], parameters: dict, coproductionprocess_id: uuid.UUID = None) -> List[dict]:
+        # every user once, in the given order
+        return [{
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "notification_id": notification.id,
+            "channel": ChannelTypes.in_app,
+            "state": False,
+            "coproductionprocess_id": coproductionprocess_id,
+            "parameters": parameters,
+        } for user_id in dict.fromkeys(user_ids)]
+
+    def add_to_users(self, db: Session, notification: Notification, user_ids: Iterable[str], parameters: dict, coproductionprocess_id: uuid.UUID = None) -> List[dict]:
+        """
+        Inserts the notification of every user without committing, returns the rows.
+        """
+        rows = self.user_rows(notification, user_ids, parameters, coproductionprocess_id)
+        if rows:
+            db.bulk_insert_mappings(UserNotification, rows)
+        return rows
+
+    def add_to_process(self, db: Session, rows: List[dict]):
+        """
+        Inserts the given coproductionprocess notifications without committing.
+        """
+        rows = [{"id": uuid.uuid4(), **row} for row in rows]
+        if rows:
+            db.bulk_insert_mappings(CoproductionProcessNotification, rows)
+        return rows
+
+    async def emit(self, user_ids: Iterable[str], event: str):
+        # the personal socket of every user
+        await socket_manager.send_to_ids([generate_uuid(user_id) for user_id in user_ids], {"event": event})
+
+    async def notify(
+        self, db: Session, event: str, language: str, user_ids: Iterable[str], parameters: dict,
+        coproductionprocess_id: uuid.UUID = None, socket_event: str = None
+    ) -> Optional[Notification]:
+        """
+        Notifies the users of the event and commits, returns the template or None if the event has no template
+        in the language. The socket event is sent in any case.
+        """
+        user_ids = list(user_ids)
+        notification = await self.template(db, event, language)
+        if notification:
+            self.add_to_users(db, notification, user_ids, parameters, coproductionprocess_id)
+            db.commit()
+        if socket_event:
+            await self.emit(user_ids, socket_event)
+        return notification
+
+
+notification_fanout = NotificationFanout()
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import psycopg2
+
+#Get the environment variables:
+username = os.getenv("POSTGRES_USER", "postgres")
+password = os.getenv("POSTGRES_PASSWORD", "")
+postgres_server = os.getenv("POSTGRES_SERVER", "db")
+postgres_db = os.getenv("POSTGRES_DB", "app")
+
+# Checks that treeitem_closure matches the phase / objective / task tables and repairs it:
+#   python /app/app/fixing_treeitem_ancestry.py          (check and fix)
+#   python /app/app/fixing_treeitem_ancestry.py --check  (only report)
+
+EXPECTED = """
+    SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM phase
+    UNION ALL SELECT id, id, 0 FROM objective
+    UNION ALL SELECT id, id, 0 FROM task
+    UNION ALL SELECT coproductionprocess_id, id, 1 FROM phase WHERE coproductionprocess_id IS NOT NULL
+    UNION ALL SELECT phase_id, id, 1 FROM objective WHERE phase_id IS NOT NULL
+    UNION ALL SELECT p.coproductionprocess_id, o.id, 2 FROM objective o JOIN phase p ON p.id = o.phase_id WHERE p.coproductionprocess_id IS NOT NULL
+    UNION ALL SELECT objective_id, id, 1 FROM task WHERE objective_id IS NOT NULL
+    UNION ALL SELECT o.phase_id, t.id, 2 FROM task t JOIN objective o ON o.id = t.objective_id WHERE o.phase_id IS NOT NULL
+    UNION ALL SELECT p.coproductionprocess_id, t.id, 3 FROM task t JOIN objective o ON o.id = t.objective_id JOIN phase p ON p.id = o.phase_id WHERE p.coproductionprocess_id IS NOT NULL
+"""
+
+MISSING = "SELECT ancestor_id, descendant_id, depth FROM (" + EXPECTED + ") expected EXCEPT SELECT ancestor_id, descendant_id, depth FROM treeitem_closure"
+EXTRA = "SELECT ancestor_id, descendant_id, depth FROM treeitem_closure EXCEPT SELECT ancestor_id, descendant_id, depth FROM (" + EXPECTED + ") expected"
+
+
+def checkAncestry(connection, fix=True):
+    cursor = connection.cursor()
+
+    cursor.execute("SELECT COUNT(*) FROM (" + MISSING + ") missing")
+    missing = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM (" + EXTRA + ") extra")
+    extra = cursor.fetchone()[0]
+    print(f"treeitem_closure: {missing} rows missing, {extra} rows that should not exist")
+
+    if fix and (missing or extra):
+        # rows with a wrong depth are both extra and missing, so delete first
+        cursor.execute("DELETE FROM treeitem_closure WHERE (ancestor_id, descendant_id, depth) IN (" + EXTRA + ")")
+        cursor.execute("INSERT INTO treeitem_closure (ancestor_id, descendant_id, depth) " + MISSING + " ON CONFLICT (ancestor_id, descendant_id) DO UPDATE SET depth = EXCLUDED.depth")
+        connection.commit()
+        print("treeitem_closure fixed")
+
+    cursor.close()
+    return missing + extra
+
+
+if __name__ == "__main__":
+    connection = psycopg2.connect(user=username,
+                                  password=password,
+                                  host=postgres_server,
+                                  port="5432",
+                                  database=postgres_db)
+    try:
+        inconsistencies = checkAncestry(connection, fix="--check" not in sys.argv)
+    finally:
+        connection.close()
+    if "--check" in sys.argv and inconsistencies:
+        sys.exit(1)
@@ -1,12 +1,115 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
-from jwt import PyJWKClient
+from jwt import PyJWKClient, PyJWKClientError
 import os
 
+from app.config import settings
+
 url = "https://aac.platform.smartcommunitylab.it/jwk"
 
+
+class JWKSCache:
+    """
+    Process-wide cache of the AAC signing keys, indexed by `kid`.
+
+    The key set is fetched once and refreshed when it is older than `ttl` seconds
+    or when a token comes signed with a `kid` we do not know yet (key rotation).
+    Only one thread fetches at a time; the rest wait and reuse its result.
+    """
+
+    def __init__(self, uri: str, ttl: int, min_refresh_interval: int):
+        self.client = PyJWKClient(uri, cache_keys=False)
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.keys = {}
+        self.fetched_at = None
+        self.lock = threading.Lock()
+
+    def refresh(self, force: bool = False):
+        fetched_at = self.fetched_at
+        with self.lock:
+            # another thread refreshed the keys while we were waiting for the lock
+            if self.fetched_at != fetched_at:
+                return
+            # do not let tokens with unknown kids hammer the JWK endpoint
+            if force and self.fetched_at and time.monotonic() - self.fetched_at < self.min_refresh_interval:
+                return
+            self.keys = {key.key_id: key for key in self.client.get_signing_keys()}
+            self.fetched_at = time.monotonic()
+
+    def get_signing_key(self, kid: str):
+        if not self.fetched_at or time.monotonic() - self.fetched_at > self.ttl:
+            self.refresh()
+        if kid not in self.keys:
+            self.refresh(force=True)
+        if kid not in self.keys:
+            raise PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+        return self.keys[kid]
+
+    def clear(self):
+        with self.lock:
+            self.keys = {}
+            self.fetched_at = None
+
+
+class VerifiedTokenCache:
+    """
+    Small LRU of tokens whose signature has already been checked, keyed by the token hash.
+    Entries are dropped as soon as the token expires, so a cached token is never accepted after its `exp`.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def hash(jwtoken: str) -> str:
+        return hashlib.sha256(jwtoken.encode()).hexdigest()
+
+    def get(self, jwtoken: str):
+        key = self.hash(jwtoken)
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            data, exp = entry
+            if exp <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return dict(data)
+
+    def set(self, jwtoken: str, data: dict):
+        exp = data.get("exp")
+        if not exp or self.maxsize <= 0:
+            return
+        key = self.hash(jwtoken)
+        with self.lock:
+            self.entries[key] = (dict(data), exp)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+jwks_cache = JWKSCache(url, ttl=settings.JWKS_CACHE_TTL, min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL)
+verified_tokens = VerifiedTokenCache(maxsize=settings.VERIFIED_TOKENS_CACHE_SIZE)
+
+
 def decode_token(jwtoken):
-    jwks_client = PyJWKClient(url)
-    signing_key = jwks_client.get_signing_key_from_jwt(jwtoken)
+    if data := verified_tokens.get(jwtoken):
+        return data
+
+    header = jwt.get_unverified_header(jwtoken)
+    signing_key = jwks_cache.get_signing_key(header.get("kid"))
     data = jwt.decode(
         jwtoken,
         signing_key.key,
@@ -14,4 +117,5 @@ def decode_token(jwtoken):
         audience=os.getenv("CLIENT_ID"),
         # options={"verify_nbf": False},
     )
-    return data
\ No newline at end of file
+    verified_tokens.set(jwtoken, data)
+    return data
@@ -1,7 +1,124 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import QueuePool
 from app.config import settings
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, poolclass=NullPool )
+
+class PoolStats:
+    """
+    Counters of the engine connection pool, so it can be sized per gunicorn / celery worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.connections_opened = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.wait_count = 0
+            self.wait_time_total = 0.0
+            self.wait_time_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.wait_count += 1
+            self.wait_time_total += seconds
+            self.wait_time_max = max(self.wait_time_max, seconds)
+
+    def incr(self, counter: str):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def dict(self) -> dict:
+        with self.lock:
+            return {
+                "connections_opened": self.connections_opened,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "wait_count": self.wait_count,
+                "wait_time_avg": self.wait_time_total / self.wait_count if self.wait_count else 0.0,
+                "wait_time_max": self.wait_time_max,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    def exhausted(self) -> bool:
+        # with no limit on the overflow it always opens a new connection instead of waiting
+        return self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+
+    # time spent waiting for a connection to be returned, only the checkouts that found every connection in use
+    def _do_get(self):
+        if not self.exhausted():
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+def get_pool_options(profile: str) -> dict:
+    if profile == "worker":
+        pool_size, max_overflow = settings.WORKER_DB_POOL_SIZE, settings.WORKER_DB_MAX_OVERFLOW
+    else:
+        pool_size, max_overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"
+
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
+def get_pool_status() -> dict:
+    return {
+        "profile": settings.DB_POOL_PROFILE,
+        "size": engine.pool.size(),
+        "checked_in": engine.pool.checkedin(),
+        "checked_out": engine.pool.checkedout(),
+        "overflow": engine.pool.overflow(),
+        **pool_stats.dict(),
+    }
+
+
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **get_pool_options(settings.DB_POOL_PROFILE))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@event.listens_for(engine, "connect")
+def on_connect(dbapi_connection, connection_record):
+    pool_stats.incr("connections_opened")
+
+
+@event.listens_for(engine, "checkout")
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.incr("checkouts")
+
+
+@event.listens_for(engine, "checkin")
+def on_checkin(dbapi_connection, connection_record):
+    pool_stats.incr("checkins")
+
+
+@event.listens_for(engine, "invalidate")
+def on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.incr("invalidations")
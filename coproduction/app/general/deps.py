@@ -80,11 +80,8 @@ def get_current_user_from_context(
 ):
     try:
         if user := context.data.get("user", None):
-            return db.query(
-                models.User
-            ).filter(
-                models.User.id == user["sub"]
-            ).first()
+            # get() reuses the user already loaded in the session instead of querying it for every serialized object
+            return db.query(models.User).get(user["sub"])
         return
 
     except Exception as e:
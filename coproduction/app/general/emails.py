@@ -1,30 +1,41 @@
-
 import logging
-from pathlib import Path
-from typing import Any, Dict
-import threading
+import random
 import smtplib
+import uuid
+from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from email.utils import make_msgid, formatdate, formataddr
+from email.utils import formataddr, formatdate, make_msgid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
 
-from app.models import Team
 from app.config import settings
+from app.general.db.session import SessionLocal
+from app.models import OutboundEmail, Team
+from app.outbox import outbox
+from app.utils import EmailStatus
 
-semaphore = threading.Semaphore(4)
+logger = logging.getLogger(__name__)
 
-def thread_send_email(message, email_to, settings):
-    with semaphore:
-        mail = smtplib.SMTP('mail.interlink-project.eu', 587)
-        mail.ehlo()
-        mail.starttls()
-        mail.login(settings.EMAILS_FROM_EMAIL, settings.SMTP_PASSWORD)
-        mail_from = formataddr((settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL))
-        response = mail.sendmail(mail_from, email_to, message.as_string())
-        mail.quit()
-        logging.info(f"send email result: {response}")
+
+@lru_cache()
+def template_environment() -> Environment:
+    # one environment per process, so every template is parsed once
+    return Environment(
+        loader=FileSystemLoader(settings.EMAIL_TEMPLATES_DIR),
+        autoescape=select_autoescape(['html', 'xml']),
+        # the templates are built with the image
+        auto_reload=False,
+    )
+
+
+def render(type: str, environment: Dict[str, Any]) -> str:
+    return template_environment().get_template(type + '.html').render(**environment)
 
 
 def new_message(from_mail, to, subject, body_text, body_html):
@@ -43,14 +54,182 @@ def new_message(from_mail, to, subject, body_text, body_html):
     return msg
 
 
-def send_email(
+def stage(db: Session, messages: List[Dict[str, Any]]) -> List[uuid.UUID]:
+    emails = [OutboundEmail(id=uuid.uuid4(), **message) for message in messages]
+    db.add_all(emails)
+    ids = [email.id for email in emails]
+    if ids:
+        # the delivery is asked for once they are stored
+        outbox.task(db, "app.worker.send_emails", args=[[str(id) for id in ids]])
+    return ids
+
+
+def queue(messages: List[Dict[str, Any]], db: Session = None) -> List[uuid.UUID]:
+    """
+    Stores the emails and asks the worker to deliver them, returns their ids.
+
+    With a session they are only added to it, and sent if and only if its transaction is committed.
+    Otherwise they are stored in their own transaction.
+    """
+    if db is not None:
+        return stage(db, messages)
+    db = SessionLocal()
+    try:
+        ids = stage(db, messages)
+        db.commit()
+    finally:
+        db.close()
+    return ids
+
+
+class SMTPMailer:
+    """
+    Sends a batch of emails over one SMTP connection (STARTTLS and login once per batch instead of once
+    per email), connecting again if the server drops it in the middle of the batch.
+    """
+
+    def __init__(self, host: str, port: int, tls: bool, user: Optional[str], password: Optional[str], timeout: float):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+
+    def connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        connection.ehlo()
+        if self.tls:
+            connection.starttls()
+            connection.ehlo()
+        if self.password:
+            connection.login(self.user, self.password)
+        return connection
+
+    def send_all(self, emails: List[OutboundEmail]) -> Dict[uuid.UUID, Optional[str]]:
+        """
+        Returns the error of every email by id, None for the ones sent.
+        """
+        results = {}
+        mail_from = formataddr((settings.EMAILS_FROM_NAME, settings.EMAILS_FROM_EMAIL))
+        connection = None
+        try:
+            for index, email in enumerate(emails):
+                message = new_message(
+                    from_mail=settings.EMAILS_FROM_EMAIL,
+                    to=email.email_to,
+                    subject=email.subject,
+                    body_text=email.body_text,
+                    body_html=email.body_html,
+                )
+                # once more with a new connection if the server closed it
+                for attempt in range(2):
+                    if connection is None:
+                        try:
+                            connection = self.connect()
+                        except (smtplib.SMTPException, OSError) as e:
+                            logger.error(f"Could not connect to {self.host}:{self.port}: {repr(e)}")
+                            for rest in emails[index:]:
+                                results[rest.id] = repr(e)
+                            return results
+                    try:
+                        connection.sendmail(mail_from, email.email_to, message.as_string())
+                        results[email.id] = None
+                        break
+                    except smtplib.SMTPServerDisconnected as e:
+                        connection = None
+                        results[email.id] = repr(e)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        # refused by the server, the connection is still good
+                        results[email.id] = repr(e)
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        results[email.id] = repr(e)
+                        connection.close()
+                        connection = None
+                        break
+        finally:
+            if connection is not None:
+                try:
+                    connection.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+        return results
+
+
+smtp_mailer = SMTPMailer(
+    host=settings.SMTP_HOST,
+    port=settings.SMTP_PORT,
+    tls=settings.SMTP_TLS,
+    user=settings.SMTP_USER or settings.EMAILS_FROM_EMAIL,
+    password=settings.SMTP_PASSWORD,
+    timeout=settings.SMTP_TIMEOUT,
+)
+
+
+def retry_delay(attempts: int) -> float:
+    return min(settings.EMAIL_RETRY_MAX_BACKOFF, settings.EMAIL_RETRY_BACKOFF * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+
+def mark(email: OutboundEmail, error: Optional[str], now: datetime):
+    email.attempts = (email.attempts or 0) + 1
+    email.last_error = error
+    if error is None:
+        email.status = EmailStatus.sent
+        email.sent_at = now
+        email.next_attempt_at = None
+    elif email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = EmailStatus.failed
+        email.next_attempt_at = None
+    else:
+        email.next_attempt_at = now + timedelta(seconds=retry_delay(email.attempts))
+
+
+def deliver_queued(db: Session, ids: Optional[List[uuid.UUID]] = None, mailer: SMTPMailer = None) -> List[OutboundEmail]:
+    """
+    Sends a batch of the queued emails that are due (of the given ones, or of all), returns the batch.
+    """
+    mailer = mailer or smtp_mailer
+    now = datetime.now()
+    query = db.query(OutboundEmail).filter(
+        OutboundEmail.status == EmailStatus.queued,
+        or_(OutboundEmail.next_attempt_at == None, OutboundEmail.next_attempt_at <= now)
+    )
+    if ids:
+        query = query.filter(OutboundEmail.id.in_(ids))
+    # locked so two deliveries never send the same email
+    emails = query.order_by(OutboundEmail.created_at.asc()).limit(settings.EMAIL_BATCH_SIZE).with_for_update(skip_locked=True).all()
+    if not emails:
+        db.commit()
+        return []
+    results = mailer.send_all(emails)
+    now = datetime.now()
+    for email in emails:
+        mark(email, results.get(email.id, "Not sent"), now)
+    db.commit()
+    sent = len([error for error in results.values() if error is None])
+    logger.info(f"{sent} of {len(emails)} emails sent")
+    return emails
+
+
+def next_attempt_at(db: Session) -> Optional[datetime]:
+    """
+    When the first of the queued emails waiting for a retry is due.
+    """
+    return db.query(OutboundEmail.next_attempt_at).filter(
+        OutboundEmail.status == EmailStatus.queued,
+        OutboundEmail.next_attempt_at != None,
+    ).order_by(OutboundEmail.next_attempt_at).limit(1).scalar()
+
+
+def prepare(
     email_to: str,
     type: str = "",
     environment: Dict[str, Any] = {},
-) -> None:
-    assert settings.EMAILS_ENABLED, "no provided configuration for email variables"
-
-    
+) -> Dict[str, Any]:
+    """
+    The message of send_email, rendered but not queued, to queue many of them together.
+    """
     environment["server"] = settings.SERVER_NAME
     if type == 'add_member_team':
         subject = 'Interlink: You have been added to a new team'
@@ -98,31 +277,25 @@ def send_email(
             coprod_id=environment['coproduction_process_id'])
 
 
-    # Load HTML template
-    env = Environment(
-        loader=FileSystemLoader(settings.EMAIL_TEMPLATES_DIR),
-        autoescape=select_autoescape(['html', 'xml'])
-    )
-    template = env.get_template(type + '.html')
-    
-    message = new_message(
-        from_mail=settings.EMAILS_FROM_EMAIL,
-        to=email_to,
-        subject=subject,
-        body_text="",
-        body_html=template.render(**environment),
-    )
+    return {"email_to": email_to, "type": type, "subject": subject, "body_html": render(type, environment)}
+
 
-        
-    t = threading.Thread(target=thread_send_email,args=(message, email_to, settings))
-    t.start()
+def send_email(
+    email_to: str,
+    type: str = "",
+    environment: Dict[str, Any] = {},
+    db: Session = None,
+) -> uuid.UUID:
+    assert settings.EMAILS_ENABLED, "no provided configuration for email variables"
+    return queue([prepare(email_to, type, environment)], db=db)[0]
 
 
 def send_team_email(
     team: Team,
     type: str = "",
     environment: Dict[str, Any] = {},
-) -> None:
+    db: Session = None,
+) -> List[uuid.UUID]:
     assert settings.EMAILS_ENABLED, "no provided configuration for email variables"
     
     environment["server"] = settings.SERVER_NAME
@@ -163,25 +336,13 @@ def send_team_email(
     elif type == 'ask_team_contribution':
         subject = environment['subject']
 
-    for user in team.users:
-        env = Environment(
-            loader=FileSystemLoader(settings.EMAIL_TEMPLATES_DIR),
-            autoescape=select_autoescape(['html', 'xml'])
-        )
-        template = env.get_template(type + '.html')
-        
-        message = new_message(
-            from_mail=settings.EMAILS_FROM_EMAIL,
-            to=user.email,
-            subject=subject,
-            body_text="",
-            body_html=template.render(**environment),
-        )
-        t = threading.Thread(target=thread_send_email, args=(message, user.email, settings))
-        t.start()
-
-def send_test_email(email_to: str) -> None:
+    # the same email for every member, delivered together over one connection
+    body_html = render(type, environment)
+    return queue([{"email_to": user.email, "type": type, "subject": subject, "body_html": body_html} for user in team.users], db=db)
+
+def send_test_email(email_to: str) -> uuid.UUID:
     project_name = settings.PROJECT_NAME
     subject = f"{project_name} - Test email"
     with open(Path(settings.EMAIL_TEMPLATES_DIR) / "added_to_process.html") as f:
         template_str = f.read()
+    return queue([{"email_to": email_to, "type": "test", "subject": subject, "body_html": template_str}])[0]
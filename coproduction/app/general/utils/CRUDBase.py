@@ -129,15 +129,24 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, PatchSchemaType]):
         return db_obj
 
     async def add_administrator(self, db: Session, *, db_obj: ModelType, user: User = None, notifyAfterAdded: bool = True) -> ModelType:
-        from app.worker import sync_asset_users
+        from app.aclsync import acl_sync
+        from app.permissions.resolver import clear_resolvers
         db_obj.administrators.append(user)
         db.add(db_obj)
+        if notifyAfterAdded:
+            # Send mail to user to know is added to a team, in the same transaction
+            _ = send_email(user.email,
+                           'add_admin_coprod',
+                           {"coprod_id": db_obj.id,
+                            "coprod_name": db_obj.name, },
+                           db=db)
         db.commit()
         db.refresh(db_obj)
+        clear_resolvers(db_obj.id if self.modelName == "COPRODUCTIONPROCESS" else None)
 
         # Sincroniza los usuarios administradores con cada uno de los assets:
         if notifyAfterAdded:
-            sync_asset_users([user.id])
+            acl_sync.request(user_ids=[user.id])
             enriched: dict = self.enrich_log_data(db_obj, {
                 "action": "ADD_ADMINISTRATOR",
                 "added_user_id": user.id
@@ -152,16 +161,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, PatchSchemaType]):
             # Send info to private socket to update workspace page
             await socket_manager.send_to_id(generate_uuid(user.id), {"event": self.modelName.lower() + "_administrator_added"})
 
-            # Send mail to user to know is added to a team
-            _ = send_email(user.email,
-                           'add_admin_coprod',
-                           {"coprod_id": db_obj.id,
-                            "coprod_name": db_obj.name, })
-
         return db_obj
 
     async def remove_administrator(self, db: Session, *, db_obj: ModelType, user: User = None) -> ModelType:
-        from app.worker import sync_asset_users
+        from app.aclsync import acl_sync
+        from app.permissions.resolver import clear_resolvers
         if len(db_obj.administrators) <= 1:
             raise HTTPException(
                 status_code=400, detail="Can not delete the last administrator")
@@ -170,7 +174,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, PatchSchemaType]):
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
-        sync_asset_users([user.id])
+        clear_resolvers(db_obj.id if self.modelName == "COPRODUCTIONPROCESS" else None)
+        acl_sync.request(user_ids=[user.id])
         enriched: dict = self.enrich_log_data(db_obj, {
             "action": "REMOVE_ADMINISTRATOR",
             "removed_user_id": user.id
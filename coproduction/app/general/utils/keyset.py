@@ -0,0 +1,93 @@
+import base64
+import uuid
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import Float, cast, tuple_
+from sqlalchemy.orm import Query as SQLQuery
+
+from app.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(key: Any, id: Any) -> str:
+    # the created_at of the last item, or its rank in a search
+    value = key.isoformat() if isinstance(key, datetime) else repr(key)
+    return base64.urlsafe_b64encode(f"{value}|{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str, parse: Callable[[str], Any] = datetime.fromisoformat) -> Tuple[Any, uuid.UUID]:
+    try:
+        key, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return parse(key), uuid.UUID(id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class KeysetPage:
+    """
+    Keyset pagination of a feed, newest first by (created_at, id).
+
+    Used as a dependency of the list endpoints: without `limit` the whole feed is returned as
+    before. With it, at most `limit` items are returned and the cursor of the next page goes in
+    the X-Next-Cursor header, to be sent back as `cursor`. Every page is an index range scan on
+    (..., created_at, id), however deep the client goes. Searches are paged by (rank, id) instead.
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=settings.FEED_MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.next_cursor: Optional[str] = None
+
+    def filter(self, model):
+        # the items older than the cursor, ties broken by id
+        return tuple_(model.created_at, model.id) < tuple_(*decode_cursor(self.cursor))
+
+    def paginate(self, query: SQLQuery, model) -> List[Any]:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+        if self.cursor:
+            query = query.filter(self.filter(model))
+        if not self.limit:
+            return query.all()
+        items = query.limit(self.limit).all()
+        # a full page, there may be more
+        if len(items) == self.limit:
+            self.next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+        return items
+
+    def paginate_ranked(self, query: SQLQuery, rank, model) -> List[Any]:
+        """
+        Pages of a search, the best ranked first, by (rank, id).
+        """
+        # ranks are real, read back as a double they would never equal the one of the cursor and the
+        # ties of the last item of a page would be skipped: FLOAT(53) is double precision
+        rank = cast(rank, Float(precision=53))
+        query = query.add_columns(rank.label("rank")).order_by(rank.desc(), model.id.desc())
+        if self.cursor:
+            query = query.filter(tuple_(rank, model.id) < tuple_(*decode_cursor(self.cursor, parse=float), types=[rank.type, model.id.type]))
+        if self.limit:
+            query = query.limit(self.limit)
+        rows = query.all()
+        if self.limit and len(rows) == self.limit:
+            self.next_cursor = encode_cursor(rows[-1].rank, rows[-1][0].id)
+        return [row[0] for row in rows]
+
+    def respond(self, response: Response, items: Any) -> Any:
+        if self.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        return items
+
+
+def paginate(query: SQLQuery, model, page: Optional[KeysetPage] = None) -> List[Any]:
+    """
+    The items of the query, newest first, in pages when a KeysetPage is given.
+    """
+    if page is None:
+        return query.order_by(model.created_at.desc(), model.id.desc()).all()
+    return page.paginate(query, model)
@@ -0,0 +1,77 @@
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal_column, or_
+
+# text search configuration of every language of the platform, Postgres has none for Latvian
+LANGUAGE_CONFIGS = {
+    "en": "english",
+    "es": "spanish",
+    "it": "italian",
+    "lv": "simple",
+}
+
+# shorter terms can not use a trigram index
+MIN_TRIGRAM_LENGTH = 3
+
+
+def regconfig_sql(language_column: str) -> str:
+    """
+    SQL of the configuration of a row, given the name of its language column.
+    """
+    cases = " ".join(f"WHEN '{language}' THEN '{config}'::regconfig" for language, config in LANGUAGE_CONFIGS.items())
+    return f"CASE {language_column} {cases} ELSE 'simple'::regconfig END"
+
+
+def weighted_vector_sql(language_column: Optional[str], weighted_columns: Sequence[Tuple[str, str]]) -> str:
+    """
+    SQL of the tsvector of a row, for a generated column: every column gets its weight (A to D) and is
+    parsed with the configuration of the language of the row, or the simple one if it has none.
+    """
+    config = regconfig_sql(language_column) if language_column else "'simple'::regconfig"
+    return " || ".join(
+        f"setweight(to_tsvector({config}, coalesce({column}, '')), '{weight}')" for column, weight in weighted_columns
+    )
+
+
+def search_words(search: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", (search or "").lower())
+
+
+def search_query(search: Optional[str]):
+    """
+    tsquery of the words of the search (the last one as a prefix, as it may be half written), in the
+    configurations of every language, so a row matches whatever its language. None when there are no words.
+    """
+    words = search_words(search)
+    if not words:
+        return None
+    text = " & ".join(words[:-1] + [words[-1] + ":*"])
+    configs = dict.fromkeys(LANGUAGE_CONFIGS.values())
+    query = None
+    for config in configs:
+        config_query = func.to_tsquery(literal_column(f"'{config}'::regconfig"), text)
+        query = config_query if query is None else query.op("||")(config_query)
+    return query
+
+
+def like_pattern(search: str) -> str:
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def text_search(vector, search: str, trigram_column=None):
+    """
+    Filter and rank of a search: the tsvector matches the words, or (for terms long enough to use its trigram
+    index) the column contains the text. Returns (None, None) when there is nothing to search.
+    """
+    query = search_query(search)
+    if query is None:
+        return None, None
+    condition = vector.op("@@")(query)
+    rank = func.ts_rank_cd(vector, query)
+    search = search.strip()
+    if trigram_column is not None and len(search) >= MIN_TRIGRAM_LENGTH:
+        condition = or_(condition, trigram_column.ilike(like_pattern(search), escape="\\"))
+        rank = rank + func.similarity(trigram_column, search)
+    return condition, rank
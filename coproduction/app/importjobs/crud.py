@@ -0,0 +1,19 @@
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.general.utils.CRUDBase import CRUDBase
+from app.models import ImportJob, User
+from app.schemas import ImportJobCreate, ImportJobPatch
+
+
+class CRUDImportJob(CRUDBase[ImportJob, ImportJobCreate, ImportJobPatch]):
+    async def create(self, db: Session, *, obj_in: ImportJobCreate, creator: User, access_token: str = None) -> ImportJob:
+        # no socket events, the process does not exist yet
+        db_obj = ImportJob(**jsonable_encoder(obj_in), creator_id=creator.id, access_token=access_token)
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+
+exportCrud = CRUDImportJob(ImportJob)
@@ -0,0 +1,42 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.general.db.base_class import Base as BaseModel
+from app.utils import JobStatus
+
+
+class ImportJob(BaseModel):
+    """Import of an exported coproduction process, with its progress and the process it created."""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    creator_id = Column(String, ForeignKey("user.id", ondelete='CASCADE'), index=True)
+    creator = relationship('User', foreign_keys=[creator_id])
+    # id of the celery task when it runs in the worker
+    task_id = Column(String, nullable=True)
+    # token of the creator for the worker, kept out of the celery message and cleared when the job ends
+    access_token = Column(Text, nullable=True)
+
+    status = Column(Enum(JobStatus, create_constraint=False, native_enum=False), default=JobStatus.pending, nullable=False)
+
+    filename = Column(String)
+    # the uploaded zip, removed when the import ends
+    upload_path = Column(String, nullable=True)
+
+    treeitems_total = Column(Integer, default=0)
+    assets_total = Column(Integer, default=0)
+    assets_done = Column(Integer, default=0)
+    assets_failed = Column(Integer, default=0)
+
+    coproductionprocess_id = Column(
+        UUID(as_uuid=True), ForeignKey("coproductionprocess.id", ondelete='SET NULL'), nullable=True
+    )
+    error = Column(Text, nullable=True)
+
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<ImportJob {self.id} {self.filename} {self.status}>"
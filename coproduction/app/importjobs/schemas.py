@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.utils import JobStatus
+
+
+class ImportJobBase(BaseModel):
+    filename: Optional[str]
+    treeitems_total: Optional[int]
+
+
+class ImportJobCreate(ImportJobBase):
+    upload_path: str
+
+
+class ImportJobPatch(BaseModel):
+    task_id: Optional[str]
+
+
+class ImportJob(ImportJobBase):
+    id: uuid.UUID
+    created_at: datetime
+    updated_at: Optional[datetime]
+    creator_id: Optional[str]
+    task_id: Optional[str]
+    status: JobStatus
+    assets_total: int
+    assets_done: int
+    assets_failed: int
+    coproductionprocess_id: Optional[uuid.UUID]
+    error: Optional[str]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class ImportJobOut(ImportJob):
+    pass
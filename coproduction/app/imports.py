@@ -0,0 +1,389 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import posixpath
+import re
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import aiofiles
+import httpx
+from fastapi import UploadFile
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models, schemas
+from app.config import settings
+from app.jobs import JobCancelled, JobProgress, Progress, start
+from app.outbox import outbox
+from app.sockets import socket_manager
+from app.treeitems.bulk import TreeBuilder, summarize
+from app.utils import JobStatus, Status
+
+logger = logging.getLogger(__name__)
+
+ROOT = "processes_exported"
+CHUNK_SIZE = 1024 * 1024
+
+
+class InvalidArchive(Exception):
+    pass
+
+
+class ImportManifest:
+    """
+    The contents of an exported process, read and validated before anything is created.
+
+    `phases` is the tree as (PhaseCreate, [(ObjectiveCreate, [(TaskCreate, [asset dict])])]) in the
+    order of schema.json; `asset_files` has the zip entry of every internal asset file by asset id.
+    """
+
+    def __init__(self, root: str, process: schemas.CoproductionProcessCreate, phases: list, logotype: Optional[str], asset_files: Dict[str, str]):
+        self.root = root
+        self.process = process
+        self.phases = phases
+        self.logotype = logotype
+        self.asset_files = asset_files
+
+    @property
+    def treeitems(self) -> int:
+        return sum(1 + sum(1 + len(tasks) for _, tasks in objectives) for _, objectives in self.phases)
+
+    @property
+    def assets(self) -> List[dict]:
+        return [asset for _, objectives in self.phases for _, tasks in objectives for _, assets in tasks for asset in assets]
+
+
+def read_json(zipf: zipfile.ZipFile, name: str):
+    try:
+        return json.loads(zipf.read(name))
+    except KeyError:
+        raise InvalidArchive(f"{posixpath.basename(name)} is missing")
+    except ValueError:
+        raise InvalidArchive(f"{posixpath.basename(name)} is not valid json")
+
+
+def parse(schema, data: dict, where: str):
+    try:
+        return schema(**data)
+    except (ValidationError, TypeError) as e:
+        raise InvalidArchive(f"{where}: {str(e)}")
+
+
+def read_manifest(zipf: zipfile.ZipFile) -> ImportManifest:
+    names = zipf.namelist()
+    for name in names:
+        if name.startswith("/") or ".." in name.split("/"):
+            raise InvalidArchive(f"Unsafe path in the archive: {name}")
+
+    processes = {name.split("/")[1] for name in names if name.startswith(ROOT + "/") and name.count("/") >= 2}
+    if len(processes) != 1:
+        raise InvalidArchive(f"The archive must contain one process in {ROOT}/, found {len(processes)}")
+    root = f"{ROOT}/{processes.pop()}/"
+
+    process = read_json(zipf, root + "coproduction.json")
+    if not isinstance(process, dict):
+        raise InvalidArchive("coproduction.json must be an object")
+    # the export writes None as a string
+    for key in ("rating", "schema_used"):
+        if process.get(key) == "None":
+            process[key] = None
+    process_in = parse(schemas.CoproductionProcessCreate, process, "coproduction.json")
+
+    schema = read_json(zipf, root + "schema.json")
+    if not isinstance(schema, list):
+        raise InvalidArchive("schema.json must be a list of phases")
+
+    # items of other types are ignored, as they always were
+    phases = []
+    for phase in schema:
+        if not isinstance(phase, dict) or phase.get("type") != "phase":
+            continue
+        objectives = []
+        for objective in phase.get("objectives") or []:
+            if not isinstance(objective, dict) or objective.get("type") != "objective":
+                continue
+            tasks = []
+            for task in objective.get("tasks") or []:
+                if not isinstance(task, dict) or task.get("type") != "task":
+                    continue
+                if task.get("status") and task["status"] not in [status.value for status in Status]:
+                    raise InvalidArchive(f"Task {task.get('name')}: unknown status {task['status']}")
+                assets = []
+                for asset in task.get("assets") or []:
+                    if not isinstance(asset, dict):
+                        raise InvalidArchive(f"Invalid asset in the task {task.get('name')}")
+                    if asset.get("type") == "internalasset" and not (asset.get("id") and asset.get("internal_link")):
+                        raise InvalidArchive(f"Internal asset without id or link in the task {task.get('name')}")
+                    if asset.get("type") == "externalasset" and not asset.get("uri"):
+                        raise InvalidArchive(f"External asset without uri in the task {task.get('name')}")
+                    if asset.get("type") in ("internalasset", "externalasset"):
+                        assets.append(asset)
+                tasks.append((parse(schemas.TaskCreate, task, f"Task {task.get('name')}"), assets))
+            objectives.append((parse(schemas.ObjectiveCreate, objective, f"Objective {objective.get('name')}"), tasks))
+        phases.append((parse(schemas.PhaseCreate, phase, f"Phase {phase.get('name')}"), objectives))
+
+    # the files are saved as <asset id>.<file name>
+    asset_files = {}
+    for name in names:
+        if name.startswith(root + "assets/") and not name.endswith("/"):
+            asset_files[posixpath.basename(name).split(".", 1)[0]] = name
+
+    logotype = None
+    if process.get("logotype") and (root + posixpath.basename(process["logotype"])) in names:
+        logotype = root + posixpath.basename(process["logotype"])
+
+    return ImportManifest(root, process_in, phases, logotype, asset_files)
+
+
+class ProcessImporter:
+    """
+    Imports the zips made by ProcessExporter.
+
+    The upload is streamed to `directory` and read from there without extracting it. Its manifest
+    (coproduction.json and schema.json) is validated before anything is created, then the files of
+    the internal assets are uploaded again to their services, at most `concurrency` at a time, and
+    the process with its whole tree and assets is inserted with bulk inserts in one transaction.
+    """
+
+    def __init__(self, directory: str, concurrency: int, timeout: float):
+        self.directory = directory
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    async def save(self, file: UploadFile) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{uuid.uuid4()}.zip")
+        async with aiofiles.open(path, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                await out.write(chunk)
+        return path
+
+    def manifest(self, path: str) -> ImportManifest:
+        try:
+            with zipfile.ZipFile(path) as zipf:
+                return read_manifest(zipf)
+        except zipfile.BadZipFile:
+            raise InvalidArchive("The file is not a zip")
+
+    async def get_json(self, client: httpx.AsyncClient, url: str, token: str) -> Optional[dict]:
+        try:
+            response = await client.get(url, headers={'Authorization': token})
+            if response.status_code == 200:
+                return response.json()
+            logger.warning(f"{url} answered {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error requesting {url}: {repr(e)}")
+
+    async def upload(self, client: httpx.AsyncClient, zipf: zipfile.ZipFile, entry: str, service: str, token: str) -> str:
+        content = await run_in_threadpool(zipf.read, entry)
+        filename = posixpath.basename(entry).split(".", 1)[-1]
+        response = await client.post(
+            f"http://{service}:80/assets",
+            headers={'Authorization': token},
+            files={'file': (filename, io.BytesIO(content))}
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def upload_all(self, manifest: ImportManifest, zipf: zipfile.ZipFile, token: str, progress: Progress) -> Dict[str, dict]:
+        """
+        Uploads the files of the internal assets, returns the data of the assets to create by asset id.
+        """
+        internal_assets = [asset for asset in manifest.assets if asset["type"] == "internalasset"]
+        progress.assets(len(internal_assets))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        lookups = {}
+        client = httpx.AsyncClient(
+            timeout=self.timeout,
+            pool_limits=httpx.PoolLimits(soft_limit=self.concurrency, hard_limit=self.concurrency * 2),
+        )
+
+        def lookup(url: str):
+            # every service and knowledge interlinker is asked once
+            if url not in lookups:
+                lookups[url] = asyncio.ensure_future(self.get_json(client, url, token))
+            return lookups[url]
+
+        async def upload(asset: dict):
+            async with semaphore:
+                progress.check()
+                match = re.search(r'http://(.*?)/', asset["internal_link"])
+                entry = manifest.asset_files.get(str(asset["id"]))
+                if not match or not entry:
+                    logger.error(f"The file of the asset {asset['id']} is not in the archive")
+                    progress.asset_done("failed")
+                    return asset["id"], None
+                service = match.group(1)
+                try:
+                    serviceinfo = await lookup(f"http://catalogue:80/api/v1/softwareinterlinkers/{service}")
+                    if not serviceinfo:
+                        raise Exception(f"Software interlinker {service} not found")
+                    knowledgeinterlinker_id = None
+                    if asset.get("knowledgeinterlinker_id") and asset.get("knowledgeinterlinker"):
+                        knowledgeinterlinker = await lookup(f"http://catalogue:80/api/v1/interlinkers/get_by_name/{asset['knowledgeinterlinker']['name']}")
+                        knowledgeinterlinker_id = knowledgeinterlinker["id"] if knowledgeinterlinker else None
+                    external_asset_id = await self.upload(client, zipf, entry, service, token)
+                except Exception as e:
+                    logger.error(f"Error while trying to upload the asset {asset['id']}: {repr(e)}")
+                    progress.asset_done("failed")
+                    return asset["id"], None
+                progress.asset_done("done")
+                return asset["id"], {
+                    "softwareinterlinker_id": uuid.UUID(serviceinfo["id"]),
+                    "knowledgeinterlinker_id": knowledgeinterlinker_id,
+                    "external_asset_id": external_asset_id,
+                }
+
+        async def icon(asset: dict):
+            async with semaphore:
+                return asset["id"], {"icon_path": await run_in_threadpool(crud.asset.download_icon, asset["uri"])}
+
+        try:
+            results = await asyncio.gather(
+                *[upload(asset) for asset in internal_assets],
+                *[icon(asset) for asset in manifest.assets if asset["type"] == "externalasset"]
+            )
+        finally:
+            for future in lookups.values():
+                future.cancel()
+            await client.close()
+        return {id: data for id, data in results if data is not None}
+
+    def insert(self, db: Session, manifest: ImportManifest, user: models.User, uploads: Dict[str, dict]) -> models.CoproductionProcess:
+        """
+        Adds the process, its tree, ancestry, prerequisites and assets to the session without committing.
+        """
+        process = models.CoproductionProcess(**jsonable_encoder(manifest.process), id=uuid.uuid4(), creator_id=user.id)
+        process.administrators.append(user)
+        db.add(process)
+        db.flush()
+
+        tree = TreeBuilder(process.id, creator_id=user.id)
+        assets = {"internalasset": [], "externalasset": []}
+
+        def data(item_in) -> dict:
+            # the disabler of the exported process does not exist here
+            return {"disabled_on": None, **item_in.dict(exclude={"prerequisites_ids", "postrequisites_ids"}, exclude_none=True), "disabler_id": None}
+
+        def chain(rows: List[dict]):
+            # every item depends on the previous one, like the tree was created
+            for previous, row in zip(rows, rows[1:]):
+                tree.set_prerequisites(row, [previous["id"]])
+
+        phases = []
+        for phase_in, objective_ins in manifest.phases:
+            phase = tree.phase(data(phase_in))
+            objectives = []
+            for objective_in, task_ins in objective_ins:
+                objective = tree.objective(phase, data(objective_in))
+                tasks = []
+                for task_in, task_assets in task_ins:
+                    task = tree.task(objective, data(task_in))
+                    task["status"] = Status(task.get("status") or Status.awaiting)
+                    created = 0
+                    for asset in task_assets:
+                        if asset["id"] not in uploads:
+                            continue
+                        assets[asset["type"]].append({
+                            "id": uuid.uuid4(),
+                            "type": asset["type"],
+                            "task_id": task["id"],
+                            "objective_id": objective["id"],
+                            "phase_id": phase["id"],
+                            "coproductionprocess_id": process.id,
+                            "creator_id": user.id,
+                            **({"name": asset.get("name"), "uri": asset["uri"], "externalinterlinker_id": None} if asset["type"] == "externalasset" else {}),
+                            **uploads[asset["id"]],
+                        })
+                        created += 1
+                    # a task with assets is in progress
+                    if created and task["status"] == Status.awaiting:
+                        task["status"] = Status.in_progress
+                    tasks.append(task)
+                summarize(objective, tasks)
+                chain(tasks)
+                objectives.append(objective)
+            summarize(phase, objectives)
+            chain(objectives)
+            phases.append(phase)
+        chain(phases)
+
+        tree.insert(db)
+        db.bulk_insert_mappings(models.InternalAsset, assets["internalasset"])
+        db.bulk_insert_mappings(models.ExternalAsset, assets["externalasset"])
+        # the bulk inserts skip the signals that request it
+        outbox.add_ids(db, "acl_sync", coproductionprocess_ids=[process.id])
+
+        start_dates = [phase["start_date"] for phase in phases if phase["start_date"]]
+        end_dates = [phase["end_date"] for phase in phases if phase["end_date"]]
+        process.start_date = min(start_dates) if start_dates else None
+        process.end_date = max(end_dates) if end_dates else None
+        return process
+
+    async def import_process(self, db: Session, path: str, user: models.User, token: str, progress: Progress = Progress()) -> models.CoproductionProcess:
+        manifest = await run_in_threadpool(self.manifest, path)
+        with zipfile.ZipFile(path) as zipf:
+            uploads = await self.upload_all(manifest, zipf, token, progress)
+            progress.check()
+            try:
+                process = self.insert(db, manifest, user, uploads)
+                if manifest.logotype:
+                    extension = os.path.splitext(manifest.logotype)[1]
+                    process.logotype = f"/static/coproductionprocesses/{process.id}{extension}"
+                    content = await run_in_threadpool(zipf.read, manifest.logotype)
+                    async with aiofiles.open("/app" + process.logotype, "wb") as out:
+                        await out.write(content)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        db.refresh(process)
+        await crud.coproductionprocess.log_on_create(process)
+        await socket_manager.send_to_id(process.id, {"event": "coproductionprocess_created"})
+        return process
+
+    async def run(self, db: Session, job: models.ImportJob, token: str) -> Optional[models.CoproductionProcess]:
+        """
+        Runs the import of the job and keeps its status, removes the upload when it ends.
+        """
+        # cancelled, or taken by another worker
+        if not start(db, job):
+            return None
+        process = None
+        try:
+            process = await self.import_process(db, job.upload_path, job.creator, token, JobProgress(db, job))
+        except JobCancelled:
+            db.rollback()
+            job.status = JobStatus.cancelled
+        except Exception as e:
+            logger.error(f"Error importing {job.filename}: {repr(e)}")
+            db.rollback()
+            job.status = JobStatus.failed
+            job.error = str(e)
+        else:
+            job.status = JobStatus.finished
+            job.coproductionprocess_id = process.id
+        finally:
+            try:
+                os.remove(job.upload_path)
+            except OSError:
+                pass
+        job.upload_path = None
+        job.access_token = None
+        job.finished_at = datetime.now()
+        db.commit()
+        return process
+
+
+process_importer = ProcessImporter(
+    directory=settings.IMPORT_DIRECTORY,
+    concurrency=settings.IMPORT_UPLOAD_CONCURRENCY,
+    timeout=settings.IMPORT_UPLOAD_TIMEOUT,
+)
@@ -0,0 +1,97 @@
+import time
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.utils import JobStatus
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def start(db: Session, job) -> bool:
+    """
+    Moves a pending ExportJob or ImportJob to running. Only one worker (or request) gets it: False
+    when it was cancelled or already taken by another one.
+    """
+    model = type(job)
+    started = db.query(model).filter(model.id == job.id, model.status == JobStatus.pending).update(
+        {model.status: JobStatus.running, model.started_at: datetime.now()}, synchronize_session=False
+    )
+    db.commit()
+    db.refresh(job)
+    return started == 1
+
+
+class Progress:
+    """
+    Receives the progress of an export or an import. This one ignores it, see JobProgress.
+    """
+
+    def phases(self, total: int):
+        pass
+
+    def phase_done(self):
+        pass
+
+    def assets(self, total: int):
+        pass
+
+    def asset_done(self, status: str):
+        # status is "done", "reused" or "failed"
+        pass
+
+    def check(self):
+        """
+        Raises JobCancelled when the job should stop.
+        """
+        pass
+
+
+class JobProgress(Progress):
+    """
+    Stores the progress in an ExportJob or ImportJob. The counters are committed at most once every
+    `interval` seconds, and that is also when the status of the job is read again to notice a cancellation.
+    """
+
+    def __init__(self, db: Session, job, interval: float = 1.0):
+        self.db = db
+        self.job = job
+        self.interval = interval
+        self.last_flush = 0
+
+    def flush(self, force: bool = False):
+        if not force and time.monotonic() - self.last_flush < self.interval:
+            return False
+        self.db.commit()
+        self.last_flush = time.monotonic()
+        return True
+
+    def phases(self, total: int):
+        self.job.phases_total = total
+        self.flush(force=True)
+
+    def phase_done(self):
+        self.job.phases_done += 1
+        self.flush()
+
+    def assets(self, total: int):
+        self.job.assets_total = total
+        self.flush(force=True)
+
+    def asset_done(self, status: str):
+        self.job.assets_done += 1
+        if status == "reused":
+            self.job.assets_reused += 1
+        elif status == "failed":
+            self.job.assets_failed += 1
+        self.flush()
+
+    def check(self):
+        if not self.flush():
+            return
+        model = type(self.job)
+        status = self.db.query(model.status).filter(model.id == self.job.id).scalar()
+        if status == JobStatus.cancelled:
+            raise JobCancelled()
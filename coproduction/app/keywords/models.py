@@ -3,7 +3,7 @@ from sqlalchemy import (
 )
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String, func
 from app.general.db.base_class import Base as BaseModel
 
 from sqlalchemy.ext.associationproxy import association_proxy
@@ -18,6 +18,11 @@ class Keyword(BaseModel):
     description = Column(String, nullable=True)
     stories_ids = association_proxy('stories', 'id')
 
+    __table_args__ = (
+        # the names come from a comma separated list, they are matched trimmed and in lowercase
+        Index('ix_keyword_name_lower', func.lower(func.trim(name))),
+    )
+
 
     def __repr__(self) -> str:
         return f"<Keyword {self.name}>"
@@ -5,11 +5,14 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api_v1 import api_router
 from app.config import settings
+from app.general.utils.keyset import NEXT_CURSOR_HEADER
 from starlette.middleware import Middleware
 
 from starlette_context import plugins, context
 from starlette_context.middleware import ContextMiddleware
 from app.middleware import UserPlugin, LanguagePlugin, TokenPlugin
+from app.messages import log_shipper
+from app.sockets import socket_manager
 from app.signals import *
 
 middleware = [
@@ -37,6 +40,19 @@ def main():
 def healthcheck():
     return None
 
+
+@app.on_event("startup")
+async def startup():
+    await log_shipper.start()
+    await socket_manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # send the log entries that are still queued
+    await log_shipper.stop()
+    await socket_manager.stop()
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -46,6 +62,8 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # the cursor of the next page of the feeds
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 
 
@@ -1,10 +1,17 @@
+import asyncio
 import json
-import json
+import logging
 from uuid import UUID
+import httpx
 import requests
+from starlette.concurrency import run_in_threadpool
 from starlette_context import context
 from contextvars import ContextVar
 
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
 _disable_logging: ContextVar[str] = ContextVar("disable_logging", default=False)
 
 def set_logging_disabled(val: bool) -> str:
@@ -23,7 +30,151 @@ class UUIDEncoder(json.JSONEncoder):
             # if the obj is uuid, we simply return the value of uuid
             return str(obj)
         return json.JSONEncoder.default(self, obj)
-        
+
+
+class LogShipper:
+    """
+    Ships log entries to the logging service without blocking the request.
+
+    Entries are put in a bounded in-memory queue and a background task drains it in batches,
+    posting them through a pooled async HTTP client. When the queue is full the caller waits
+    at most `enqueue_timeout` seconds and then the entry is dropped (and counted).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        batch_url: str = None,
+        max_queue_size: int = 10000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        enqueue_timeout: float = 0.05,
+        timeout: float = 2,
+    ):
+        self.url = url
+        self.batch_url = batch_url
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.timeout = timeout
+        self.queue: asyncio.Queue = None
+        self.client: httpx.AsyncClient = None
+        self.task: asyncio.Task = None
+        self.sending: asyncio.Future = None
+        # entries already taken from the queue but not handed to send() yet
+        self.pending = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            pool_limits=httpx.PoolLimits(soft_limit=self.batch_size, hard_limit=self.batch_size * 2),
+        )
+        self.task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        """
+        Stops the background task and sends everything that is still queued.
+        """
+        if not self.running:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        # the batch that was being sent when the task got cancelled
+        if self.sending and not self.sending.done():
+            await self.sending
+        await self.send(self.pending)
+        self.pending = []
+        while not self.queue.empty():
+            await self.send(self.take_batch())
+        await self.client.close()
+        self.task = None
+
+    async def put(self, data: dict):
+        try:
+            await asyncio.wait_for(self.queue.put(data), timeout=self.enqueue_timeout)
+            self.enqueued += 1
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Log queue is full, {self.dropped} log entries dropped so far")
+
+    def take_batch(self, size: int = None) -> list:
+        size = self.batch_size if size is None else size
+        batch = []
+        while len(batch) < size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def run(self):
+        while True:
+            self.pending = [await self.queue.get()]
+            # give the batch some time to fill up before sending it
+            if self.queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_interval)
+            batch, self.pending = self.pending + self.take_batch(self.batch_size - 1), []
+            # a shutdown must not cut a batch in half
+            self.sending = asyncio.ensure_future(self.send(batch))
+            await asyncio.shield(self.sending)
+
+    async def send(self, batch: list):
+        if not batch:
+            return
+        try:
+            if self.batch_url:
+                await self.post(self.batch_url, batch)
+            else:
+                await asyncio.gather(*[self.post(self.url, data) for data in batch])
+            self.sent += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Could not send {len(batch)} log entries: {str(e)}")
+
+    async def post(self, url: str, data):
+        response = await self.client.post(
+            url,
+            data=json.dumps(data, cls=UUIDEncoder),
+            headers={"Content-Type": "application/json"},
+        )
+        response.raise_for_status()
+
+
+log_shipper = LogShipper(
+    url=settings.LOGGING_URL,
+    batch_url=settings.LOGGING_BATCH_URL,
+    max_queue_size=settings.LOGGING_QUEUE_SIZE,
+    batch_size=settings.LOGGING_BATCH_SIZE,
+    flush_interval=settings.LOGGING_FLUSH_INTERVAL,
+)
+
+
 async def log(data: dict):
     if is_logging_disabled():
         print("logging disabled")
@@ -31,7 +182,10 @@ async def log(data: dict):
 
     if not "user_id" in data:
         data["user_id"] = context.data.get("user", {}).get("sub", "anonymous")
-            
+
     data["service"] = "coproduction"
-    res = requests.post("http://logging/api/v1/log", data=json.dumps(data,cls=UUIDEncoder), timeout=2)
-    # print("message sent", res.json())
+    if log_shipper.running:
+        await log_shipper.put(data)
+    else:
+        # scripts and the celery worker do not start the shipper
+        await run_in_threadpool(requests.post, settings.LOGGING_URL, data=json.dumps(data,cls=UUIDEncoder), timeout=2)
@@ -1,5 +1,6 @@
 from typing import Any, Optional, Union
 
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import HTTPConnection, Request
 from starlette_context.plugins import Plugin
 
@@ -16,7 +17,8 @@ class UserPlugin(Plugin):
     ) -> Optional[Any]:
         token = deps.get_current_token(request=request)
         if token:
-            return decode_token(token)
+            # key refreshes and signature checks must not block the event loop
+            return await run_in_threadpool(decode_token, token)
         return None
 
 
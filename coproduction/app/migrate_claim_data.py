@@ -46,7 +46,8 @@ def migrate_data_claims(connection):
     for row in rows:
         id,coproductionprocess_id, asset_id, user_id, parameters, created_at = row
        
-        parameters_dict = json.loads(parameters)
+        # JSONB, read as a dict
+        parameters_dict = parameters if isinstance(parameters, dict) else json.loads(parameters)
     
         assetId = parameters_dict.get('assetId')
         commentTitle = parameters_dict.get('commentTitle')
@@ -17,4 +17,11 @@ from app.tags.models import *
 from app.ratings.models import *
 from app.keywords.models import *
 from app.claims.models import *
-from app.assignments.models import *
\ No newline at end of file
+from app.assignments.models import *
+from app.exportjobs.models import *
+from app.importjobs.models import *
+from app.outboundemails.models import *
+from app.assetacls.models import *
+from app.outboxmessages.models import *
+# maintains treeitem_closure
+from app.treeitems import ancestry
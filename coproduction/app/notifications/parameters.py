@@ -0,0 +1,46 @@
+import ast
+import json
+from typing import Any, Dict, Optional, Union
+
+
+def notification_parameters(**values: Any) -> Dict[str, str]:
+    """
+    The parameters of a notification as stored in its JSONB column.
+
+    Every value is kept as a string, as the templates and the clients expect, and the ones that
+    are None are left out. Names must be escaped by the caller.
+    """
+    return {key: str(value) for key, value in values.items() if value is not None}
+
+
+def parse_parameters(value: Union[str, dict, None]) -> Optional[dict]:
+    """
+    Parameters given as JSON or in the single quoted format of the older notifications.
+    """
+    if value is None or isinstance(value, dict):
+        return value
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        try:
+            parsed = json.loads(value.replace("'", '"'))
+        except ValueError:
+            try:
+                parsed = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                raise ValueError("The parameters of a notification are not valid JSON")
+    if isinstance(parsed, str):
+        # stored as a string inside the JSON
+        return parse_parameters(parsed)
+    if not isinstance(parsed, dict):
+        raise ValueError("The parameters of a notification must be an object")
+    return parsed
+
+
+def dump_parameters(value: Union[str, dict, None]) -> Optional[str]:
+    """
+    The parameters as the API returns them, a JSON string.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
@@ -8,6 +8,7 @@ import json
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app import crud, models, schemas
+from app.notifications.parameters import notification_parameters
 import html
 
 class NotificationsManager:
@@ -47,7 +48,17 @@ class NotificationsManager:
                 assetLink=asset.uri
 
 
-                newCoproNotification.parameters="{'treeitem_id':'"+str(task.id)+"','treeItemName':'"+str(html.escape(task.name))+"','assetId':'"+str(db_obj.id)+"','assetName':'"+html.escape(asset.name)+"','assetLink':'"+str(assetLink)+"','interlinkerName':'"+html.escape(nameInterlinker)+"','processName':'"+html.escape(coproduction.name)+"','userName':'"+html.escape(shortName(db_obj.creator.full_name))+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters=notification_parameters(
+                    treeitem_id=task.id,
+                    treeItemName=html.escape(task.name),
+                    assetId=db_obj.id,
+                    assetName=html.escape(asset.name),
+                    assetLink=assetLink,
+                    interlinkerName=html.escape(nameInterlinker),
+                    processName=html.escape(coproduction.name),
+                    userName=html.escape(shortName(db_obj.creator.full_name)),
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
         if type(db_obj) == InternalAssetCreate:
             
@@ -80,7 +91,17 @@ class NotificationsManager:
                         nameInterlinker=db_obj.knowledgeinterlinker['name']
 
                 
-                newCoproNotification.parameters="{'treeitem_id':'"+str(task.id)+"','treeItemName':'"+str(html.escape(task.name))+"','assetId':'"+str(db_obj.id)+"','assetName':'{assetid:"+str(db_obj.id)+"}','assetLink':'"+str(assetLink)+"','interlinkerName':'"+html.escape(nameInterlinker)+"','processName':'"+html.escape(coproduction.name)+"','userName':'"+html.escape(shortName(db_obj.creator.full_name))+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters=notification_parameters(
+                    treeitem_id=task.id,
+                    treeItemName=html.escape(task.name),
+                    assetId=db_obj.id,
+                    assetName="{assetid:"+str(db_obj.id)+"}",
+                    assetLink=assetLink,
+                    interlinkerName=html.escape(nameInterlinker),
+                    processName=html.escape(coproduction.name),
+                    userName=html.escape(shortName(db_obj.creator.full_name)),
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
 
         return None
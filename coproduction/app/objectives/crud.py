@@ -16,6 +16,7 @@ from fastapi.encoders import jsonable_encoder
 from app.sockets import socket_manager
 from app import models
 from app.utils import check_prerequistes
+from app.notifications.parameters import notification_parameters
 import html
 
 
@@ -75,8 +76,12 @@ class CRUDObjective(CRUDBase[Objective, ObjectiveCreate, ObjectivePatch]):
                 newCoproNotification.notification_id = notification.id
                 newCoproNotification.coproductionprocess_id = coproduction.id
 
-                newCoproNotification.parameters = "{'objectiveName':'"+html.escape(db_obj.name)+"','processName':'"+html.escape(
-                    coproduction.name)+"','treeitem_id':'"+str(treeitem.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    objectiveName=html.escape(db_obj.name),
+                    processName=html.escape(coproduction.name),
+                    treeitem_id=treeitem.id,
+                    copro_id=db_obj.coproductionprocess_id,
+                )
 
                 db.add(newCoproNotification)
                 db.commit()
@@ -146,8 +151,13 @@ class CRUDObjective(CRUDBase[Objective, ObjectiveCreate, ObjectivePatch]):
                 newCoproNotification.coproductionprocess_id = coproduction.id
 
                 # phase_treeitem_id   and  phaseName
-                newCoproNotification.parameters = "{'phase_treeitem_id':'"+str(obj.phase.id)+"','phaseName':'"+html.escape(obj.phase.name)+"','objectiveName':'"+html.escape(
-                    obj.name)+"','processName':'"+html.escape(coproduction.name)+"','copro_id':'"+str(obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    phase_treeitem_id=obj.phase.id,
+                    phaseName=html.escape(obj.phase.name),
+                    objectiveName=html.escape(obj.name),
+                    processName=html.escape(coproduction.name),
+                    copro_id=obj.coproductionprocess_id,
+                )
 
                 db.add(newCoproNotification)
                 db.commit()
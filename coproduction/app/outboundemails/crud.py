@@ -0,0 +1,21 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.general.utils.CRUDBase import CRUDBase
+from app.models import OutboundEmail
+from app.schemas import OutboundEmailCreate, OutboundEmailPatch
+from app.utils import EmailStatus
+
+
+class CRUDOutboundEmail(CRUDBase[OutboundEmail, OutboundEmailCreate, OutboundEmailPatch]):
+    async def get_multi_filtered(self, db: Session, status: Optional[EmailStatus] = None, email_to: Optional[str] = None, skip: int = 0, limit: int = 100) -> List[OutboundEmail]:
+        query = db.query(OutboundEmail)
+        if status:
+            query = query.filter(OutboundEmail.status == status)
+        if email_to:
+            query = query.filter(OutboundEmail.email_to == email_to)
+        return query.order_by(OutboundEmail.created_at.desc()).offset(skip).limit(limit).all()
+
+
+exportCrud = CRUDOutboundEmail(OutboundEmail)
@@ -0,0 +1,29 @@
+import uuid
+
+from sqlalchemy import Column, DateTime, Enum, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.general.db.base_class import Base as BaseModel
+from app.utils import EmailStatus
+
+
+class OutboundEmail(BaseModel):
+    """Rendered email waiting to be delivered (or already delivered) by the worker."""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+
+    email_to = Column(String, nullable=False, index=True)
+    # name of the template
+    type = Column(String, nullable=True)
+    subject = Column(String, nullable=False)
+    body_text = Column(Text, nullable=False, default="")
+    body_html = Column(Text, nullable=False)
+
+    status = Column(Enum(EmailStatus, create_constraint=False, native_enum=False), default=EmailStatus.queued, nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    # a queued email is not sent before this
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<OutboundEmail {self.id} {self.email_to} {self.status}>"
@@ -0,0 +1,41 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.utils import EmailStatus
+
+
+class OutboundEmailBase(BaseModel):
+    email_to: str
+    type: Optional[str]
+    subject: str
+
+
+class OutboundEmailCreate(OutboundEmailBase):
+    body_text: str = ""
+    body_html: str
+
+
+class OutboundEmailPatch(BaseModel):
+    status: Optional[EmailStatus]
+    next_attempt_at: Optional[datetime]
+
+
+class OutboundEmail(OutboundEmailBase):
+    id: uuid.UUID
+    created_at: datetime
+    updated_at: Optional[datetime]
+    status: EmailStatus
+    attempts: int
+    next_attempt_at: Optional[datetime]
+    last_error: Optional[str]
+    sent_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
+
+
+class OutboundEmailOut(OutboundEmail):
+    pass
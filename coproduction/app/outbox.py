@@ -0,0 +1,225 @@
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import requests
+from sqlalchemy import event, exists, text
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.models import OutboxMessage
+from app.utils import OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+# only one relay delivers at a time, so the messages of an aggregate keep their order
+RELAY_LOCK = 7307101
+
+
+class Outbox:
+    """
+    Side effects (HTTP calls, Celery jobs, syncs of the users of the assets) stored in the same
+    transaction as the change that causes them and delivered by the worker once it is committed.
+
+    `add` only stages the message in the session: it is inserted by the next flush or by the commit,
+    also when it is added from a mapper event, so it exists if and only if the change does. After the
+    commit the relay job is asked for. The relay delivers the pending messages in batches and in order
+    for each aggregate: when one fails, the later ones of the same aggregate wait for its retry.
+    Delivery is at least once. HTTP calls carry the id of the message as Idempotency-Key. Celery does
+    not deduplicate tasks, so the jobs queued with `task` must be idempotent themselves: send_emails
+    only sends the emails still queued, locking them.
+    """
+
+    def __init__(self, batch_size: int, http_timeout: float, max_attempts: int, backoff: float, max_backoff: float):
+        self.batch_size = batch_size
+        self.http_timeout = http_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # the HTTP connections of a relay
+        self.client: requests.Session = None
+        self.handlers = {
+            "http": self.deliver_http,
+            "task": self.deliver_task,
+            "acl_sync": self.deliver_acl_sync,
+            "asset_delete": self.deliver_asset_delete,
+        }
+
+    def add(self, session: Session, kind: str, payload: dict, aggregate: str = None):
+        session.info.setdefault("outbox", []).append({
+            "id": uuid.uuid4(),
+            "kind": kind,
+            "payload": payload,
+            "aggregate": aggregate,
+            "status": OutboxStatus.pending,
+            "attempts": 0,
+        })
+
+    def add_ids(self, session: Session, kind: str, **ids):
+        """
+        Adds the ids to the message of the kind staged in the session, one message per flush.
+        """
+        staged = session.info.setdefault("outbox_ids", {}).setdefault(kind, {})
+        for name, values in ids.items():
+            staged.setdefault(name, set()).update(str(value) for value in values if value)
+
+    def http(self, session: Session, method: str, url: str, json: Any = None, backend_auth: bool = False, aggregate: str = None):
+        # the secret of the backends is added when the call is made, it is not stored
+        self.add(session, "http", {"method": method, "url": url, "json": json, "backend_auth": backend_auth}, aggregate)
+
+    def task(self, session: Session, name: str, args: List = None, kwargs: Dict = None, aggregate: str = None):
+        # the task may run more than once
+        self.add(session, "task", {"name": name, "args": args or [], "kwargs": kwargs or {}}, aggregate)
+
+    def write(self, session: Session):
+        for kind, ids in session.info.pop("outbox_ids", {}).items():
+            self.add(session, kind, {name: sorted(values) for name, values in ids.items()})
+        messages = session.info.pop("outbox", None)
+        if messages:
+            session.connection().execute(OutboxMessage.__table__.insert(), messages)
+            session.info["outbox_written"] = True
+
+    def kick(self):
+        from app.celery_app import celery_app
+        try:
+            celery_app.send_task("app.worker.relay_outbox")
+        except Exception as e:
+            # they are delivered by the next relay
+            logger.error(f"Could not ask for the relay of the outbox: {repr(e)}")
+
+    def call(self, message: OutboxMessage, method: str, url: str, json: Any = None, backend_auth: bool = False):
+        headers = {"Idempotency-Key": str(message.id)}
+        if backend_auth:
+            headers["Authorization"] = settings.BACKEND_SECRET
+        response = self.client.request(method, url, json=json, headers=headers, timeout=self.http_timeout)
+        # already deleted
+        if method == "DELETE" and response.status_code in (404, 410):
+            return
+        response.raise_for_status()
+
+    def deliver_http(self, message: OutboxMessage):
+        payload = message.payload
+        self.call(message, payload["method"], payload["url"], json=payload.get("json"), backend_auth=payload.get("backend_auth"))
+
+    def deliver_asset_delete(self, message: OutboxMessage):
+        from app.catalogue import interlinker_cache
+        payload = message.payload
+        # the backend of the interlinker is looked up when it is delivered, the relay does not run in the event loop
+        interlinker = interlinker_cache.get(payload["softwareinterlinker_id"])
+        if not interlinker or not interlinker.get("service_name"):
+            raise Exception(f"Interlinker {payload['softwareinterlinker_id']} of asset {payload['external_asset_id']} not found in the catalogue")
+        url = f"http://{interlinker['service_name']}{interlinker.get('api_path')}/{payload['external_asset_id']}"
+        self.call(message, "DELETE", url, backend_auth=True)
+
+    def deliver_task(self, message: OutboxMessage):
+        from app.celery_app import celery_app
+        payload = message.payload
+        # the id of the message only identifies the task in the logs, Celery does not deduplicate by it
+        celery_app.send_task(payload["name"], args=payload["args"], kwargs=payload["kwargs"], task_id=str(message.id))
+
+    def deliver_acl_sync(self, message: OutboxMessage):
+        from app.aclsync import acl_sync
+        acl_sync.request(**message.payload)
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+    def mark(self, message: OutboxMessage, error: Optional[str], now: datetime):
+        message.attempts = (message.attempts or 0) + 1
+        message.last_error = error
+        if error is None:
+            message.status = OutboxStatus.delivered
+            message.delivered_at = now
+            message.next_attempt_at = None
+        elif message.attempts >= self.max_attempts:
+            message.status = OutboxStatus.failed
+            message.next_attempt_at = None
+        else:
+            message.next_attempt_at = now + timedelta(seconds=self.retry_delay(message.attempts))
+
+    def pending(self, db: Session, now: datetime) -> List[OutboxMessage]:
+        # the due ones, except the ones behind a message of their aggregate that waits for a retry
+        waiting = aliased(OutboxMessage)
+        return db.query(OutboxMessage).filter(
+            OutboxMessage.status == OutboxStatus.pending,
+            (OutboxMessage.next_attempt_at == None) | (OutboxMessage.next_attempt_at <= now),
+            ~exists().where(
+                waiting.aggregate == OutboxMessage.aggregate,
+                waiting.status == OutboxStatus.pending,
+                waiting.seq < OutboxMessage.seq,
+                waiting.next_attempt_at > now,
+            ),
+        ).order_by(OutboxMessage.seq).limit(self.batch_size).all()
+
+    def relay(self, db: Session) -> Optional[List[OutboxMessage]]:
+        """
+        Delivers a batch of the pending messages and returns it, or None if another relay is running.
+        """
+        # a transaction lock: released by the commit or the rollback of the delivery, on whatever
+        # connection of the pool it ran
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RELAY_LOCK}).scalar():
+            db.rollback()
+            return None
+        try:
+            now = datetime.now()
+            messages = self.pending(db, now)
+            blocked = set()
+            with requests.Session() as self.client:
+                for message in messages:
+                    if message.aggregate and message.aggregate in blocked:
+                        continue
+                    try:
+                        self.handlers[message.kind](message)
+                        error = None
+                    except Exception as e:
+                        error = repr(e)
+                        logger.warning(f"Could not deliver the {message.kind} message {message.id}: {error}")
+                    self.mark(message, error, now)
+                    if message.status == OutboxStatus.pending and message.aggregate:
+                        blocked.add(message.aggregate)
+            db.commit()
+            return messages
+        except BaseException:
+            db.rollback()
+            raise
+
+    def next_attempt_at(self, db: Session) -> Optional[datetime]:
+        return db.query(OutboxMessage.next_attempt_at).filter(
+            OutboxMessage.status == OutboxStatus.pending,
+            OutboxMessage.next_attempt_at != None,
+        ).order_by(OutboxMessage.next_attempt_at).limit(1).scalar()
+
+
+outbox = Outbox(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    http_timeout=settings.OUTBOX_HTTP_TIMEOUT,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff=settings.OUTBOX_RETRY_BACKOFF,
+    max_backoff=settings.OUTBOX_RETRY_MAX_BACKOFF,
+)
+
+
+@event.listens_for(Session, "after_flush")
+def write_after_flush(session, flush_context):
+    # the ones added by the mapper events of the flush
+    outbox.write(session)
+
+
+@event.listens_for(Session, "before_commit")
+def write_before_commit(session):
+    # the ones added since the last flush, if the commit has nothing else to flush
+    outbox.write(session)
+
+
+@event.listens_for(Session, "after_commit")
+def relay_after_commit(session):
+    if session.info.pop("outbox_written", False):
+        outbox.kick()
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_after_rollback(session):
+    for key in ("outbox", "outbox_ids", "outbox_written"):
+        session.info.pop(key, None)
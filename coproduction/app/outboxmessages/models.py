@@ -0,0 +1,34 @@
+import uuid
+
+from sqlalchemy import BigInteger, Column, DateTime, Enum, Identity, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+from app.general.db.base_class import Base as BaseModel
+from app.utils import OutboxStatus
+
+
+class OutboxMessage(BaseModel):
+    """Side effect stored with the change that caused it, delivered by the worker after the commit."""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # order of creation, the messages of an aggregate are delivered in this order
+    seq = Column(BigInteger, Identity(), nullable=False, unique=True)
+    # e.g. "asset:<id>", None when the order does not matter
+    aggregate = Column(String, nullable=True)
+    # http, task, acl_sync or asset_delete
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+
+    status = Column(Enum(OutboxStatus, create_constraint=False, native_enum=False), default=OutboxStatus.pending, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)
+
+    # the relay reads the pending ones in order
+    __table_args__ = (
+        Index('ix_outboxmessage_pending', 'seq', postgresql_where=text("status = 'pending'")),
+        Index('ix_outboxmessage_pending_aggregate', 'aggregate', 'seq', postgresql_where=text("status = 'pending'")),
+    )
+
+    def __repr__(self) -> str:
+        return f"<OutboxMessage {self.seq} {self.kind} {self.aggregate} {self.status}>"
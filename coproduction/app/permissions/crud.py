@@ -2,22 +2,29 @@ import copy
 import uuid
 from typing import List
 
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, select
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
 
 from app import models, schemas
 from app.general.utils.CRUDBase import CRUDBase
-from app.models import Permission, TreeItem, CoproductionProcessNotification, UserNotification
+from app.models import Permission, TreeItem, CoproductionProcessNotification
 from app.permissions.models import DENY_ALL, PERMS, GRANT_ALL, INDEXES
+from app.permissions.resolver import PermissionResolver, get_resolver, clear_resolvers
+from app.treeitems.ancestry import get_path_ids
+from app.treeitems.models import ancestor_ids, closure
+from app.tables import coproductionprocess_administrators_association_table, user_team_association_table
 from app.coproductionprocesses.crud import exportCrud as coproductionprocesses_crud
 from app.notifications.crud import exportCrud as notifications_crud
 from app.treeitems.crud import exportCrud as treeitems_crud
 from app.teams.crud import exportCrud as teams_crud
 from app.schemas import PermissionCreate
 from fastapi.encoders import jsonable_encoder
+from app.fanout import notification_fanout
 from app.sockets import socket_manager
 from uuid_by_string import generate_uuid
 from app.general.emails import send_email, send_team_email
+from app.notifications.parameters import notification_parameters
 import html
 
 
@@ -29,9 +36,11 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
 
         db.delete(db_obj)
         # db.commit()
+        clear_resolvers(db_obj.coproductionprocess_id)
 
         # Save the event as a notification of coproduction
         coproduction = await coproductionprocesses_crud.get(db=db, id=db_obj.coproductionprocess_id)
+        user_ids = []
 
         if (db_obj.team_id and db_obj.treeitem_id):
             # Se ha seleccionado un equipo para trabajar sonbre un treeitem.
@@ -44,8 +53,14 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
             newCoproNotification.notification_id = notification.id
             newCoproNotification.coproductionprocess_id = coproduction.id
 
-            newCoproNotification.parameters = "{'teamName':'"+html.escape(team.name)+"','processName':'"+html.escape(coproduction.name)+"','team_id':'"+str(
-                team.id)+"','treeItemName':'"+html.escape(treeitem.name)+"','treeitem_id':'"+str(treeitem.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+            newCoproNotification.parameters = notification_parameters(
+                teamName=html.escape(team.name),
+                processName=html.escape(coproduction.name),
+                team_id=team.id,
+                treeItemName=html.escape(treeitem.name),
+                treeitem_id=treeitem.id,
+                copro_id=db_obj.coproductionprocess_id,
+            )
 
             db.add(newCoproNotification)
         else:
@@ -58,32 +73,30 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
                 newCoproNotification.notification_id = notification.id
                 newCoproNotification.coproductionprocess_id = coproduction.id
                 # newCoproNotification.asset_id=null
-                newCoproNotification.parameters = "{'teamName':'"+html.escape(team.name)+"','processName':'"+html.escape(
-                    coproduction.name)+"','team_id':'"+str(team.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
-                db.add(newCoproNotification)
-
+                newCoproNotification.parameters = notification_parameters(
+                    teamName=html.escape(team.name),
+                    processName=html.escape(coproduction.name),
+                    team_id=team.id,
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
 
                 # Create a notification for every user:
                 user_ids = team.user_ids
-                for user_id in user_ids:
-                    newUserNotification = UserNotification()
-                    newUserNotification.user_id = user_id
-
-                    newUserNotification.notification_id = notification.id
-                    newUserNotification.channel = "in_app"
-                    newUserNotification.state = False
-                    newUserNotification.coproductionprocess_id = str(
-                        db_obj.coproductionprocess_id)
-                    newUserNotification.parameters = "{'teamName':'"+html.escape(team.name)+"','processName':'"+html.escape(
-                        coproduction.name)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"','org_id':'"+str(team.organization_id)+"'}"
-
-                    db.add(newUserNotification)
-
-                    await socket_manager.send_to_id(generate_uuid(user_id), {"event": self.modelName.lower() + "_created"})
+                notification_fanout.add_to_users(
+                    db, notification, user_ids,
+                    notification_parameters(
+                        teamName=html.escape(team.name),
+                        processName=html.escape(coproduction.name),
+                        copro_id=db_obj.coproductionprocess_id,
+                        org_id=team.organization_id,
+                    ),
+                    coproductionprocess_id=db_obj.coproductionprocess_id,
+                )
 
         db.commit()
         db.refresh(newCoproNotification)
+        await notification_fanout.emit(user_ids, self.modelName.lower() + "_created")
 
         return None
 
@@ -98,11 +111,13 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        clear_resolvers(db_obj.coproductionprocess_id)
 
         # verify if the permission is of a (team or coproductionprocess)
 
         coproduction = await coproductionprocesses_crud.get(db=db, id=db_obj.coproductionprocess_id)
         if notifyAfterAdded:
+            user_ids = []
             # Se ha seleccionado un equipo para trabajar sonbre un treeitem.
             if (db_obj.team_id and db_obj.treeitem_id):
 
@@ -115,8 +130,14 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
                 newCoproNotification.notification_id = notification.id
                 newCoproNotification.coproductionprocess_id = coproduction.id
 
-                newCoproNotification.parameters = "{'teamName':'"+html.escape(team.name)+"','processName':'"+html.escape(coproduction.name)+"','team_id':'"+str(
-                    team.id)+"','treeItemName':'"+html.escape(treeitem.name)+"','treeitem_id':'"+str(treeitem.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    teamName=html.escape(team.name),
+                    processName=html.escape(coproduction.name),
+                    team_id=team.id,
+                    treeItemName=html.escape(treeitem.name),
+                    treeitem_id=treeitem.id,
+                    copro_id=db_obj.coproductionprocess_id,
+                )
                 db.add(newCoproNotification)
             else:
 
@@ -131,34 +152,29 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
                     newCoproNotification.notification_id = notification.id
                     newCoproNotification.coproductionprocess_id = coproduction.id
 
-                    newCoproNotification.parameters = "{'teamName':'"+html.escape(team.name)+"','processName':'"+html.escape(
-                        coproduction.name)+"','team_id':'"+str(team.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                    newCoproNotification.parameters = notification_parameters(
+                        teamName=html.escape(team.name),
+                        processName=html.escape(coproduction.name),
+                        team_id=team.id,
+                        copro_id=db_obj.coproductionprocess_id,
+                    )
 
                     db.add(newCoproNotification)
 
                     # Create a notification for every user:
                     user_ids = team.user_ids
-                    for user_id in user_ids:
-                        newUserNotification = UserNotification()
-                        newUserNotification.user_id = user_id
-
-                        newUserNotification.notification_id = notification.id
-                        newUserNotification.channel = "in_app"
-                        newUserNotification.state = False
-                        newUserNotification.coproductionprocess_id = str(
-                            db_obj.coproductionprocess_id)
-
-                        newUserNotification.parameters = "{'teamName':'"+html.escape(team.name)+"','processName':'"+html.escape(
-                            coproduction.name)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"','org_id':'"+str(team.organization_id)+"'}"
-
-                        db.add(newUserNotification)
-
-                        await socket_manager.send_to_id(generate_uuid(user_id), {"event": self.modelName.lower() + "_created"})
-
-            db.commit()
-            db.refresh(newCoproNotification)
-
-            # Send mail to a team to know they are added to a coprod or treeitem
+                    notification_fanout.add_to_users(
+                        db, notification, user_ids,
+                        notification_parameters(
+                            teamName=html.escape(team.name),
+                            processName=html.escape(coproduction.name),
+                            copro_id=db_obj.coproductionprocess_id,
+                            org_id=team.organization_id,
+                        ),
+                        coproductionprocess_id=db_obj.coproductionprocess_id,
+                    )
+
+            # Send mail to a team to know they are added to a coprod or treeitem, in the same transaction
             if db_obj.treeitem_id and db_obj.team_id:
                 treeitem = await treeitems_crud.get(db=db, id=db_obj.treeitem_id)
                 _ = send_team_email(team,
@@ -170,7 +186,8 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
                                      "team_name": team.name,
                                      "team_id": team.id,
                                      "org_id": team.organization_id
-                                     })
+                                     },
+                                    db=db)
             else:
                 _ = send_team_email(team,
                                     'add_team_coprod',
@@ -179,7 +196,12 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
                                      "team_name": team.name,
                                      "org_id": team.organization_id,
                                      "team_id": team.id
-                                     })
+                                     },
+                                    db=db)
+
+            db.commit()
+            db.refresh(newCoproNotification)
+            await notification_fanout.emit(user_ids, self.modelName.lower() + "_created")
 
         await socket_manager.send_to_id(generate_uuid(creator.id), {"event": "permission" + "_created"})
 
@@ -190,7 +212,7 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
         self, db: Session, *, skip: int = 0, limit: int = 100, treeitem: TreeItem
     ) -> List[Permission]:
         return db.query(Permission).filter(
-            Permission.treeitem_id.in_(treeitem.path_ids)
+            Permission.treeitem_id.in_(ancestor_ids(treeitem.id))
         ).order_by(Permission.created_at.asc()).offset(skip).limit(limit).all()
 
     async def get_permission_user_coproduction(
@@ -210,17 +232,15 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
     ):
         #print('Llega a preguntar por los assets:')
         #print(db)
+        # the ancestors of the treeitem include its coproduction process
         return db.query(
             Permission
         ).filter(
             or_(
-                and_(
-                    Permission.treeitem_id.in_(treeitem.path_ids),
-                    Permission.coproductionprocess_id == treeitem.coproductionprocess.id
-                ),
+                Permission.treeitem_id.in_(ancestor_ids(treeitem.id)),
                 and_(
                     Permission.treeitem_id == None,
-                    Permission.coproductionprocess_id == treeitem.coproductionprocess.id
+                    Permission.coproductionprocess_id.in_(ancestor_ids(treeitem.id))
                 ),
             ),
             Permission.team_id.in_(user.teams_ids)
@@ -231,22 +251,54 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
     ):
         #print('Llega a preguntar por los assets:')
         #print(db)
+        # the ancestors of the treeitem include its coproduction process
         return db.query(
             Permission
         ).filter(
             or_(
-                and_(
-                    Permission.treeitem_id.in_(treeitem.path_ids),
-                    Permission.coproductionprocess_id == treeitem.coproductionprocess.id
-                ),
+                Permission.treeitem_id.in_(ancestor_ids(treeitem.id)),
                 and_(
                     Permission.treeitem_id == None,
-                    Permission.coproductionprocess_id == treeitem.coproductionprocess.id
+                    Permission.coproductionprocess_id.in_(ancestor_ids(treeitem.id))
                 ),
             ),
             Permission.team_id.in_(user.teams_ids)
         ).all()
 
+    def treeitem_ids_with(self, user: models.User, coproductionprocess_id: uuid.UUID, permission: str) -> Select:
+        """
+        Select of the treeitems of the process where the user has the permission through their teams, to
+        filter by it in SQL. Same rules as get_dict_for_user_and_treeitem: the permissions set closest
+        to the treeitem in its path win and the ones at the same level are OR-ed. Administrators are not
+        included, see is_administrator.
+        """
+        if permission not in PERMS:
+            raise Exception(permission + " is not a valid permission")
+        granted = getattr(Permission, permission)
+        # every permission of the teams of the user on the path of every treeitem, the closest first
+        closest = select(
+            closure.c.descendant_id.label("treeitem_id"), granted.label("granted")
+        ).join(
+            Permission, or_(
+                Permission.treeitem_id == closure.c.ancestor_id,
+                and_(Permission.treeitem_id == None, Permission.coproductionprocess_id == closure.c.ancestor_id),
+            )
+        ).where(
+            Permission.coproductionprocess_id == coproductionprocess_id,
+            Permission.team_id.in_(select(user_team_association_table.c.team_id).where(user_team_association_table.c.user_id == user.id)),
+        ).distinct(
+            closure.c.descendant_id
+        ).order_by(
+            closure.c.descendant_id, closure.c.depth, granted.desc().nullslast()
+        ).subquery()
+        return select(closest.c.treeitem_id).where(closest.c.granted == True)
+
+    def is_administrator(self, user: models.User, coproductionprocess_id: uuid.UUID):
+        return select(coproductionprocess_administrators_association_table.c.user_id).where(
+            coproductionprocess_administrators_association_table.c.coproductionprocess_id == coproductionprocess_id,
+            coproductionprocess_administrators_association_table.c.user_id == user.id,
+        ).exists()
+
     def get_user_roles(self, db: Session, treeitem: models.TreeItem, user: models.User):
         roles = []
         for perm in self.get_for_user_and_treeitem(db=db, user=user, treeitem=treeitem):
@@ -267,7 +319,7 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
         final_permissions_dict = copy.deepcopy(DENY_ALL)
         indexes_dict = copy.deepcopy(INDEXES)
 
-        path = treeitem.path_ids
+        path = get_path_ids(db, treeitem.id)
 
         for permission in permissions:
             path_con = permission.treeitem_id or permission.coproductionprocess_id
@@ -291,6 +343,10 @@ class CRUDPermission(CRUDBase[Permission, schemas.PermissionCreate, schemas.Perm
         logData["team_id"] = obj.team_id
         return logData
 
+    def get_resolver(self, db: Session, coproductionprocess: models.CoproductionProcess) -> PermissionResolver:
+        # use it instead of get_dict_for_user_and_treeitem / user_can when checking many treeitems or users
+        return get_resolver(db=db, coproductionprocess=coproductionprocess)
+
     def user_can(self, db, user, task, permission):
         if user in task.coproductionprocess.administrators:
             return True
@@ -0,0 +1,129 @@
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, Union
+
+from sqlalchemy.orm import Session, joinedload
+from starlette_context import context
+
+from app import models
+from app.permissions.models import DENY_ALL, GRANT_ALL, INDEXES, PERMS, Permission
+from app.treeitems.ancestry import get_parents
+
+
+class PermissionResolver:
+    """
+    Answers effective-permission queries for many (user, treeitem) pairs of one coproduction process.
+
+    Every permission of the process and the parent of every treeitem are loaded once, so resolving
+    a pair does not touch the database (apart from the teams of a user the first time it is seen).
+    Results follow the same rules as `CRUDPermission.get_dict_for_user_and_treeitem`: the permissions
+    set closest to the treeitem in its path win, and permissions at the same level are OR-ed.
+    """
+
+    def __init__(self, coproductionprocess_id: uuid.UUID, administrator_ids: Iterable[str], permissions: Iterable[Permission], parents: Dict[uuid.UUID, uuid.UUID]):
+        self.coproductionprocess_id = coproductionprocess_id
+        self.administrator_ids = set(administrator_ids)
+        # (team_id, treeitem_id) -> permissions, treeitem_id is None for the whole process
+        self.index: Dict[Tuple[uuid.UUID, uuid.UUID], List[Permission]] = defaultdict(list)
+        for permission in permissions:
+            self.index[(permission.team_id, permission.treeitem_id)].append(permission)
+        # treeitem_id -> id of its parent (the process for phases)
+        self.parents = parents
+        self.user_teams: Dict[str, List[uuid.UUID]] = {}
+        self.cache: Dict[Tuple[str, uuid.UUID], dict] = {}
+
+    @classmethod
+    def load(cls, db: Session, coproductionprocess: models.CoproductionProcess) -> "PermissionResolver":
+        permissions = db.query(Permission).options(
+            joinedload(Permission.team)
+        ).filter(
+            Permission.coproductionprocess_id == coproductionprocess.id
+        ).all()
+        return cls(coproductionprocess.id, [user.id for user in coproductionprocess.administrators], permissions, get_parents(db, coproductionprocess.id))
+
+    def path_ids(self, treeitem_id: uuid.UUID) -> List[uuid.UUID]:
+        path = [treeitem_id]
+        while path[0] in self.parents:
+            path.insert(0, self.parents[path[0]])
+        return path
+
+    def teams_of(self, user: models.User) -> List[uuid.UUID]:
+        if user.id not in self.user_teams:
+            self.user_teams[user.id] = list(user.teams_ids)
+        return self.user_teams[user.id]
+
+    def permissions_of(self, user: models.User, treeitem_id: uuid.UUID) -> List[Tuple[int, Permission]]:
+        path = self.path_ids(treeitem_id)
+        found = []
+        for team_id in self.teams_of(user):
+            # permissions granted on the whole process are at the same level as the process itself
+            for permission in self.index.get((team_id, None), []):
+                found.append((0, permission))
+            for index, node_id in enumerate(path):
+                for permission in self.index.get((team_id, node_id), []):
+                    found.append((index, permission))
+        return found
+
+    def get_dict(self, user: models.User, treeitem: Union[models.TreeItem, uuid.UUID]) -> dict:
+        treeitem_id = getattr(treeitem, "id", treeitem)
+        key = (user.id, treeitem_id)
+        if key in self.cache:
+            return self.cache[key]
+
+        if user.id in self.administrator_ids:
+            self.cache[key] = GRANT_ALL
+            return GRANT_ALL
+
+        final_permissions_dict = dict(DENY_ALL)
+        indexes_dict = dict(INDEXES)
+        for index, permission in self.permissions_of(user, treeitem_id):
+            for permission_key in PERMS:
+                if index > indexes_dict[permission_key]:
+                    final_permissions_dict[permission_key] = getattr(permission, permission_key)
+                    indexes_dict[permission_key] = index
+                elif index == indexes_dict[permission_key] and not final_permissions_dict[permission_key] and getattr(permission, permission_key):
+                    final_permissions_dict[permission_key] = True
+
+        self.cache[key] = final_permissions_dict
+        return final_permissions_dict
+
+    def get_many(self, pairs: Iterable[Tuple[models.User, Union[models.TreeItem, uuid.UUID]]]) -> Dict[Tuple[str, uuid.UUID], dict]:
+        return {(user.id, getattr(treeitem, "id", treeitem)): self.get_dict(user, treeitem) for user, treeitem in pairs}
+
+    def user_can(self, user: models.User, treeitem: Union[models.TreeItem, uuid.UUID], permission: str) -> bool:
+        if permission not in PERMS:
+            raise Exception(permission + " is not a valid permission")
+        return self.get_dict(user, treeitem)[permission]
+
+    def get_user_roles(self, user: models.User, treeitem: Union[models.TreeItem, uuid.UUID]) -> List[str]:
+        roles = []
+        for _, permission in self.permissions_of(user, getattr(treeitem, "id", treeitem)):
+            role = permission.team.type.value
+            if role not in roles:
+                roles.append(role)
+        if user.id in self.administrator_ids:
+            roles.append("administrator")
+        return roles
+
+
+def get_resolver(db: Session, coproductionprocess: models.CoproductionProcess) -> PermissionResolver:
+    """
+    Returns the resolver of the process, shared by everything that runs in the same request.
+    Outside a request (celery worker, scripts) a new resolver is built every time.
+    """
+    if not context.exists():
+        return PermissionResolver.load(db, coproductionprocess)
+    resolvers = context.data.setdefault("permission_resolvers", {})
+    if coproductionprocess.id not in resolvers:
+        resolvers[coproductionprocess.id] = PermissionResolver.load(db, coproductionprocess)
+    return resolvers[coproductionprocess.id]
+
+
+def clear_resolvers(coproductionprocess_id: uuid.UUID = None):
+    if not context.exists():
+        return
+    resolvers = context.data.get("permission_resolvers", {})
+    if coproductionprocess_id is None:
+        resolvers.clear()
+    else:
+        resolvers.pop(coproductionprocess_id, None)
@@ -17,6 +17,7 @@ from fastapi.encoders import jsonable_encoder
 from app.sockets import socket_manager
 from app import models
 from app.utils import check_prerequistes
+from app.notifications.parameters import notification_parameters
 import html
 
 
@@ -101,8 +102,12 @@ class CRUDPhase(CRUDBase[Phase, PhaseCreate, PhasePatch]):
                 newCoproNotification.notification_id = notification.id
                 newCoproNotification.coproductionprocess_id = coproduction.id
 
-                newCoproNotification.parameters = "{'phaseName':'"+html.escape(db_obj.name)+"','processName':'"+html.escape(
-                    coproduction.name)+"','treeitem_id':'"+str(treeitem.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    phaseName=html.escape(db_obj.name),
+                    processName=html.escape(coproduction.name),
+                    treeitem_id=treeitem.id,
+                    copro_id=db_obj.coproductionprocess_id,
+                )
 
                 db.add(newCoproNotification)
                 db.commit()
@@ -147,8 +152,11 @@ class CRUDPhase(CRUDBase[Phase, PhaseCreate, PhasePatch]):
                 newCoproNotification.notification_id = notification.id
                 newCoproNotification.coproductionprocess_id = coproduction.id
 
-                newCoproNotification.parameters = "{'phaseName':'"+obj.name+"','processName':'"+html.escape(
-                    coproduction.name)+"','copro_id':'"+str(obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters = notification_parameters(
+                    phaseName=obj.name,
+                    processName=html.escape(coproduction.name),
+                    copro_id=obj.coproductionprocess_id,
+                )
 
                 db.add(newCoproNotification)
                 db.commit()
@@ -19,6 +19,9 @@ from app.ratings.schemas import *
 from app.keywords.schemas import *
 from app.claims.schemas import *
 from app.assignments.schemas import *
+from app.exportjobs.schemas import *
+from app.importjobs.schemas import *
+from app.outboundemails.schemas import *
 
 # out
 
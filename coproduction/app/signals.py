@@ -1,32 +1,54 @@
-
-from sqlalchemy import event
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
 from app.models import Permission, InternalAsset, User
-from app.worker import sync_asset_users, sync_asset_treeitems
-import requests
-from app.config import settings
+from app.aclsync import acl_sync
+from app.outbox import outbox
+
+# The side effects go through the outbox: they are stored with the change and delivered by the
+# worker once the transaction is committed.
+
+
+def request_acl_sync(target, **ids):
+    session = object_session(target)
+    if session is None:
+        acl_sync.request(**ids)
+        return
+    outbox.add_ids(session, "acl_sync", **ids)
+
 
 @event.listens_for(User, "after_update")
+def after_user_update(mapper, connection, target: User):
+    # only the emails are sent to the interlinkers
+    state = inspect(target)
+    if state.attrs.email.history.has_changes() or state.attrs.additionalEmails.history.has_changes():
+        request_acl_sync(target, user_ids=[target.id])
+
 @event.listens_for(User, "after_delete")
-def after_user_update_or_delete(mapper, connection, target: User):
-    sync_asset_users.delay([target.id])
+def after_user_delete(mapper, connection, target: User):
+    request_acl_sync(target, user_ids=[target.id])
 
 @event.listens_for(Permission, "after_insert")
 @event.listens_for(Permission, "after_update")
 @event.listens_for(Permission, "after_delete")
 def after_permission_insert_update_or_delete(mapper, connection, target: Permission):
-    sync_asset_treeitems.delay([target.treeitem_id])
+    # the permissions without treeitem are of the whole process
+    if target.treeitem_id:
+        request_acl_sync(target, treeitem_ids=[target.treeitem_id])
+    else:
+        request_acl_sync(target, coproductionprocess_ids=[target.coproductionprocess_id])
 
 @event.listens_for(InternalAsset, "after_insert")
 @event.listens_for(InternalAsset, "after_update")
 def after_asset_insert_or_update(mapper, connection, target: InternalAsset):
     #print("Asset created", target)
-    sync_asset_treeitems.delay([target.task_id])
+    request_acl_sync(target, treeitem_ids=[target.task_id])
 
 
 @event.listens_for(InternalAsset, "after_delete")
-async def after_asset_delete(mapper, connection, target: InternalAsset):
-    #print("Asset deleted", target)
-    URL = target.internal_link
-    requests.delete(URL, headers={
-        "Authorization": settings.BACKEND_SECRET
-    })
\ No newline at end of file
+def after_asset_delete(mapper, connection, target: InternalAsset):
+    # deleted from the backend of its interlinker once the deletion is committed, the backend is
+    # looked up by the relay
+    outbox.add(object_session(target), "asset_delete", {
+        "softwareinterlinker_id": str(target.softwareinterlinker_id),
+        "external_asset_id": target.external_asset_id,
+    }, aggregate=f"asset:{target.id}")
@@ -1,46 +1,247 @@
+import asyncio
 import json
+import logging
 import uuid
-from typing import Dict, List
+import weakref
+from typing import Dict, List, Optional, Union
 
 from fastapi import (
     WebSocket,
 )
+from redis import asyncio as aioredis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+BROADCAST = "broadcast"
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[uuid.UUID, List[WebSocket]] = {}
+    """
+    Websockets of the clients, keyed by coproduction process id or user uuid.
+
+    Every worker process keeps its own connections. When `redis_url` is set, `send_to_id` and
+    `broadcast` publish the event to a Redis channel (one per id, plus a broadcast channel) and each
+    worker is subscribed to the channels of the ids it has connections for, so the event reaches
+    the clients connected to any worker or replica. Without Redis (or while it is unreachable) the
+    events are only delivered to the connections of this process, and the subscription is retried
+    in the background. Processes that never start the subscription, like the Celery worker, have
+    no clients: they publish with a client of their own, one per event loop.
+    """
+
+    def __init__(self, redis_url: str = None, channel_prefix: str = "sockets", send_timeout: float = 5, max_retry_delay: float = 30):
+        self.redis_url = redis_url
+        self.channel_prefix = channel_prefix
+        self.send_timeout = send_timeout
+        self.max_retry_delay = max_retry_delay
+        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.redis: aioredis.Redis = None
+        self.pubsub = None
+        self.task: asyncio.Task = None
+        self.started = False
+        # the clients of the processes that do not subscribe, by event loop
+        self.publishers = weakref.WeakKeyDictionary()
+        # the deliveries of the events received from Redis
+        self.deliveries = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def channel(self, id: Union[uuid.UUID, str]) -> str:
+        return f"{self.channel_prefix}:{id}"
+
+    @property
+    def running(self) -> bool:
+        return self.pubsub is not None and self.task is not None and not self.task.done()
+
+    async def start(self):
+        if not self.redis_url or self.started:
+            return
+        self.started = True
+        try:
+            await self.subscribe()
+        except Exception as e:
+            logger.error(f"Could not subscribe to the socket events in Redis, only local clients will get them until it is back: {str(e)}")
+        self.task = asyncio.ensure_future(self.listen())
+
+    async def subscribe(self):
+        redis = aioredis.from_url(self.redis_url)
+        pubsub = redis.pubsub()
+        keys = list(self.active_connections)
+        try:
+            await pubsub.subscribe(self.channel(BROADCAST), *[self.channel(key) for key in keys])
+            # the ones connected in the meantime
+            if connected := [self.channel(key) for key in self.active_connections if key not in keys]:
+                await pubsub.subscribe(*connected)
+        except BaseException:
+            await pubsub.close()
+            await redis.close()
+            raise
+        self.redis, self.pubsub = redis, pubsub
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        self.started = False
+        if self.pubsub is not None:
+            await self.pubsub.close()
+            await self.redis.close()
+            self.pubsub, self.redis = None, None
+
+    async def listen(self):
+        delay = 1
+        while True:
+            if self.pubsub is None:
+                await asyncio.sleep(delay)
+                try:
+                    await self.subscribe()
+                    logger.info("Subscribed to the socket events in Redis")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    delay = min(delay * 2, self.max_retry_delay)
+                    logger.error(f"Could not subscribe to the socket events in Redis, retrying in {delay}s: {str(e)}")
+                    continue
+                delay = 1
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Lost the subscription to the socket events: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+            if not message or message["type"] != "message":
+                continue
+            id = message["channel"].decode()[len(self.channel_prefix) + 1:]
+            text = message["data"].decode()
+            # a slow client does not hold back the next events
+            delivery = asyncio.ensure_future(self.local_broadcast(text) if id == BROADCAST else self.local_send(id, text))
+            self.deliveries.add(delivery)
+            delivery.add_done_callback(self.deliveries.discard)
 
     async def connect(self, websocket: WebSocket, id: uuid.UUID):
-        #print("Connecting", id)
         await websocket.accept()
-        if id in self.active_connections and len(self.active_connections[id]) > 0:
-            self.active_connections[id] = self.active_connections[id] + [websocket]
-        else:
-            self.active_connections[id] = [websocket]
+        key = str(id)
+        if key in self.active_connections and len(self.active_connections[key]) > 0:
+            self.active_connections[key] = self.active_connections[key] + [websocket]
+            return
+        self.active_connections[key] = [websocket]
+        if self.running:
+            try:
+                await self.pubsub.subscribe(self.channel(key))
+            except Exception as e:
+                logger.error(f"Could not subscribe to the socket events of {key}: {str(e)}")
 
     def disconnect(self, websocket: WebSocket, id: uuid.UUID):
-        #print("Disconnecting", id)
-        if id in self.active_connections:
-            filtered_active_connections = [conn for conn in self.active_connections[id] if conn != websocket]
+        key = str(id)
+        if key in self.active_connections:
+            filtered_active_connections = [conn for conn in self.active_connections[key] if conn != websocket]
             if len(filtered_active_connections) == 0:
-                del self.active_connections[id]
+                del self.active_connections[key]
+                if self.running:
+                    asyncio.ensure_future(self.unsubscribe(key))
             else:
-                self.active_connections[id] = filtered_active_connections
+                self.active_connections[key] = filtered_active_connections
+
+    async def unsubscribe(self, key: str):
+        # somebody could have connected again in the meantime
+        if key in self.active_connections:
+            return
+        try:
+            await self.pubsub.unsubscribe(self.channel(key))
+        except Exception as e:
+            logger.error(f"Could not unsubscribe from the socket events of {key}: {str(e)}")
+
+    def publisher(self) -> Optional[aioredis.Redis]:
+        if self.running:
+            return self.redis
+        # subscribed elsewhere, or waiting for Redis to be back
+        if not self.redis_url or self.started:
+            return None
+        # the connections of a client belong to the event loop that opened them
+        loop = asyncio.get_event_loop()
+        client = self.publishers.get(loop)
+        if client is None:
+            client = self.publishers[loop] = aioredis.from_url(self.redis_url)
+        return client
+
+    async def publish(self, keys: List[str], text: str) -> bool:
+        client = self.publisher()
+        if client is None:
+            return False
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.publish(self.channel(key), text)
+                await pipe.execute()
+            self.published += len(keys)
+            return True
+        except Exception as e:
+            logger.error(f"Could not publish the socket events, delivering them only to local clients: {str(e)}")
+            return False
+
+    async def send(self, id: str, websocket: WebSocket, text: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(text), timeout=self.send_timeout)
+            self.delivered += 1
+        except Exception:
+            # closed or too slow: forget it, the client reconnects
+            self.dropped += 1
+            self.disconnect(websocket, id)
+            try:
+                await asyncio.wait_for(websocket.close(), timeout=self.send_timeout)
+            except Exception:
+                pass
+
+    async def local_send(self, id: str, text: str):
+        await asyncio.gather(*[self.send(id, connection, text) for connection in self.active_connections.get(id, [])])
+
+    async def local_broadcast(self, text: str):
+        await asyncio.gather(*[
+            self.send(id, connection, text) for id, connections in list(self.active_connections.items()) for connection in connections
+        ])
 
     async def send_to_id(self, id: uuid.UUID, data: dict):
-        #print(self.active_connections)
-        if id in self.active_connections:
-            for connection in self.active_connections[id]:
-                #print("Sending", data, "to", connection, "in", id)
-                await connection.send_text(json.dumps(data))
-                
+        text = json.dumps(data)
+        if not await self.publish([str(id)], text):
+            await self.local_send(str(id), text)
+
+    async def send_to_ids(self, ids: List[Union[uuid.UUID, str]], data: dict):
+        """
+        send_to_id for many ids, published to Redis in one round trip.
+        """
+        text = json.dumps(data)
+        keys = list(dict.fromkeys(str(id) for id in ids))
+        if not keys or await self.publish(keys, text):
+            return
+        await asyncio.gather(*[self.local_send(key, text) for key in keys])
+
     #Method to send events to everybody connected to personal socket:
     async def broadcast(self, data: dict):
-        #print(self.active_connections)
-        #print(data)
-        for key in self.active_connections:
-            for connection in self.active_connections[key]:
-                #print("Sending", data, "to", connection, "in", key)
-                await connection.send_text(json.dumps(data))
-
-socket_manager = ConnectionManager()
+        text = json.dumps(data)
+        if not await self.publish([BROADCAST], text):
+            await self.local_broadcast(text)
+
+    def stats(self) -> dict:
+        return {
+            "redis": self.running,
+            "ids": len(self.active_connections),
+            "connections": sum(len(connections) for connections in self.active_connections.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+socket_manager = ConnectionManager(
+    redis_url=settings.SOCKETS_REDIS_URL,
+    channel_prefix=settings.SOCKETS_CHANNEL_PREFIX,
+    send_timeout=settings.SOCKETS_SEND_TIMEOUT,
+)
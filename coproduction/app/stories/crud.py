@@ -12,11 +12,14 @@ from app.assets.crud import exportCrud as assets_crud
 from app.treeitems.crud import exportCrud as treeitems_crud
 
 
-from sqlalchemy import and_, func, or_
+from sqlalchemy import and_, func, or_, select
 from fastapi.encoders import jsonable_encoder
 from app.sockets import socket_manager
 from uuid_by_string import generate_uuid
 from fastapi_pagination.ext.sqlalchemy import paginate
+from app.general.utils.keyset import KeysetPage
+from app.general.utils.search import text_search
+from app.tables import coproductionprocess_keywords_association_table
 from app import schemas
 import json
 from fastapi import HTTPException
@@ -26,8 +29,8 @@ class CRUDStory(CRUDBase[Story, StoryCreate, StoryPatch]):
 
   
     async def get_multiDict(
-        self, db: Session, exclude: list = [], search: str = "", rating: int = 0, language: str = "en", keyword: str = "en"
-    ) -> List[Story]:
+        self, db: Session, exclude: list = [], search: str = "", rating: int = 0, language: str = "en", keyword: str = "en", page: Optional[KeysetPage] = None
+    ):
         queries = []
 
         
@@ -39,30 +42,31 @@ class CRUDStory(CRUDBase[Story, StoryCreate, StoryPatch]):
 
         if rating:
             queries.append(Story.rating >= rating)
-            
-        if search:
-            search = search.lower()
-            queries.append(or_(
-                    # func.lower(Story.keywords_translations[language]).contains(
-                    #     search),
-                    func.lower(Story.data_story['title'].astext).contains(func.lower(
-                        search)),
-                    func.lower(
-                        Story.data_story['description'].astext).contains(func.lower(search))
-                ))
+
+        condition, rank = text_search(Story.search_vector, search or "", trigram_column=Story.data_story['title'].astext)
+        if condition is not None:
+            queries.append(condition)
         
-        if keyword:
-            queries.append(
-                #Story.data_story.keywords.in_(keyword)
-                func.lower(Story.data_story['keywords'].astext).contains(func.lower(
-                        keyword))
-            )
+        if keyword and keyword.strip():
+            # through the keywords of the story, not a scan of its data
+            queries.append(Story.id.in_(
+                select(coproductionprocess_keywords_association_table.c.story_id).join(
+                    Keyword, Keyword.id == coproductionprocess_keywords_association_table.c.keyword_id
+                ).where(func.lower(func.trim(Keyword.name)) == keyword.strip().lower())
+            ))
         
         # if creator:
         #     queries.append(
         #         Interlinker.creator_id != None
         #     )
-        return paginate(db.query(Story).filter(*queries, Story.id.not_in(exclude)))
+        query = db.query(Story).filter(*queries, Story.id.not_in(exclude))
+        if page is not None and (page.limit or page.cursor):
+            if rank is not None:
+                return page.paginate_ranked(query, rank, Story)
+            return page.paginate(query, Story)
+        if rank is not None:
+            query = query.order_by(rank.desc(), Story.id.desc())
+        return paginate(query)
         #return paginate(db.query(Story).all())
 
 
@@ -3,13 +3,14 @@ from sqlalchemy import (
     Integer,
     Numeric,
 )
-from sqlalchemy import Date, Column, ForeignKey, String, Table, Integer, func, Boolean, Enum, Text, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Date, Column, Computed, ForeignKey, Index, String, Table, Integer, func, Boolean, Enum, Text, JSON
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import backref, relationship, declarative_base
+from sqlalchemy.orm import backref, deferred, relationship, declarative_base
 
 from app.general.db.base_class import Base as BaseModel
 from app.config import settings
+from app.general.utils.search import weighted_vector_sql
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy_utils import aggregated
 from sqlalchemy.orm import Session
@@ -31,6 +32,10 @@ class Story(BaseModel):
 
     #Json object with information relevant to a story:
     data_story = Column(JSONB, nullable=True)
+    # stories have no language, their texts are parsed with the simple configuration
+    search_vector = deferred(Column(TSVECTOR, Computed(weighted_vector_sql(None, [
+        ("data_story ->> 'title'", "A"), ("data_story ->> 'description'", "B"), ("data_story ->> 'keywords'", "C"),
+    ]), persisted=True)))
 
     # 1 digit for decimals
     rating= Column(Numeric(2, 1), default=0)
@@ -48,5 +53,13 @@ class Story(BaseModel):
     published_date = Column(Date, nullable=True)
     
 
+    __table_args__ = (
+        Index('ix_story_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
     def __repr__(self) -> str:
-        return f"<Story {self.created_at}>"
\ No newline at end of file
+        return f"<Story {self.created_at}>"
+
+
+# partial titles, needs pg_trgm
+Index('ix_story_title_trgm', Story.data_story['title'].astext.label('title'), postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
\ No newline at end of file
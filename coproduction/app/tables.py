@@ -1,4 +1,4 @@
-from sqlalchemy import ARRAY, Column, ForeignKey, String, Table, func, Boolean, DateTime
+from sqlalchemy import ARRAY, Column, ForeignKey, Index, String, Table, func, Boolean, DateTime
 
 from app.general.db.base_class import Base as BaseModel
 from app.utils import ChannelTypes
@@ -30,4 +30,6 @@ coproductionprocess_tags_association_table = Table('coproductionprocess_tags', B
 
 coproductionprocess_keywords_association_table = Table('story_keywords', BaseModel.metadata,
                                                    Column('story_id', ForeignKey('story.id', ondelete="CASCADE"), primary_key=True),
-                                                   Column('keyword_id', ForeignKey('keyword.id', ondelete="CASCADE"), primary_key=True))
\ No newline at end of file
+                                                   Column('keyword_id', ForeignKey('keyword.id', ondelete="CASCADE"), primary_key=True),
+                                                   # the stories of a keyword
+                                                   Index('ix_story_keywords_keyword_id', 'keyword_id'))
\ No newline at end of file
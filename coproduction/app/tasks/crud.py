@@ -15,6 +15,7 @@ from app.notifications.crud import exportCrud as notification_crud
 from app.coproductionprocesses.crud import exportCrud as coproductionprocesses_crud
 from app.sockets import socket_manager
 from app import models
+from app.notifications.parameters import notification_parameters
 import html
 
 class CRUDTask(CRUDBase[Task, TaskCreate, TaskPatch]):
@@ -74,7 +75,12 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskPatch]):
                 newCoproNotification.notification_id=notification.id
                 newCoproNotification.coproductionprocess_id=coproduction.id
 
-                newCoproNotification.parameters="{'taskName':'"+html.escape(db_obj.name)+"','processName':'"+html.escape(coproduction.name)+"','treeitem_id':'"+str(treeitem.id)+"','copro_id':'"+str(db_obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters=notification_parameters(
+                    taskName=html.escape(db_obj.name),
+                    processName=html.escape(coproduction.name),
+                    treeitem_id=treeitem.id,
+                    copro_id=db_obj.coproductionprocess_id,
+                )
 
                 db.add(newCoproNotification)
                 db.commit()
@@ -177,7 +183,15 @@ class CRUDTask(CRUDBase[Task, TaskCreate, TaskPatch]):
                 newCoproNotification.notification_id=notification.id
                 newCoproNotification.coproductionprocess_id=coproduction.id
 
-                newCoproNotification.parameters="{'objective_treeitem_id':'"+str(obj.objective.id)+"','objectiveName':'"+html.escape(obj.objective.name)+"','phase_treeitem_id':'"+str(obj.objective.phase.id)+"','phaseName':'"+html.escape(obj.objective.phase.name)+"','taskName':'"+html.escape(obj.name)+"','processName':'"+html.escape(coproduction.name)+"','copro_id':'"+str(obj.coproductionprocess_id)+"'}"
+                newCoproNotification.parameters=notification_parameters(
+                    objective_treeitem_id=obj.objective.id,
+                    objectiveName=html.escape(obj.objective.name),
+                    phase_treeitem_id=obj.objective.phase.id,
+                    phaseName=html.escape(obj.objective.phase.name),
+                    taskName=html.escape(obj.name),
+                    processName=html.escape(coproduction.name),
+                    copro_id=obj.coproductionprocess_id,
+                )
 
                 db.add(newCoproNotification)
                 db.commit()
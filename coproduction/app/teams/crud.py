@@ -3,21 +3,22 @@ from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 from app.general.utils.CRUDBase import CRUDBase
-from app.models import Team, User, Organization, UserNotification
+from app.models import Team, User, Organization
 from app.schemas import TeamCreate, TeamPatch
 import uuid
 from app import models
 from app.users.crud import exportCrud as users_crud
 from app.organizations.crud import exportCrud as organizations_crud
 from app.usernotifications.crud import exportCrud as usernotification_crud
-from app.notifications.crud import exportCrud as notification_crud
 from sqlalchemy import or_, and_
 from fastapi.encoders import jsonable_encoder
-from app.sockets import socket_manager
-from uuid_by_string import generate_uuid
+from app.aclsync import acl_sync
+from app.permissions.resolver import clear_resolvers
+from app.fanout import notification_fanout
 from app.general.emails import send_email, send_team_email
 from app.locales import get_language
 from fastapi import HTTPException
+from app.notifications.parameters import notification_parameters
 import html
 
 
@@ -41,19 +42,8 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
     
 
     async def add_user(self, db: Session, team: Team, user: models.User) -> Team:
-        from app.worker import sync_asset_treeitems
-
-        sync_asset_treeitems.delay(
-            [permission.treeitem_id for permission in team.permissions]
-        )
         team.users.append(user)
-        db.commit()
-        db.refresh(team)
-        await log(
-            self.enrich_log_data(team, {"action": "ADD_USER", "added_user_id": user.id})
-        )
-
-        # Send mail to user to know is added to a team
+        # Send mail to user to know is added to a team, in the same transaction
         _ = send_email(
             user.email,
             "add_member_team",
@@ -62,48 +52,41 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
                 "team_name": team.name,
                 "org_id": team.organization_id,
             },
+            db=db,
         )
-
-        # Agrego la notificacion cuando un usuario es removido de un equipo:
-        newUserNotification = UserNotification()
-        newUserNotification.user_id = user.id
-        notification = await notification_crud.get_notification_by_event(
-            db=db, event="add_user_team", language=get_language()
+        db.commit()
+        db.refresh(team)
+        # the permissions of the team may be in any process
+        clear_resolvers()
+        acl_sync.request(user_ids=[user.id])
+        await log(
+            self.enrich_log_data(team, {"action": "ADD_USER", "added_user_id": user.id})
         )
-        if notification:
-            newUserNotification.notification_id = notification.id
-            newUserNotification.channel = "in_app"
-            newUserNotification.state = False
-            newUserNotification.parameters = (
-                "{'teamName':'"
-                + html.escape(team.name)
-                + "','team_id':'"
-                + str(team.id)
-                + "','org_id':'"
-                + str(team.organization_id)
-                + "'}"
-            )
 
-            db.add(newUserNotification)
-            db.commit()
-            db.refresh(newUserNotification)
-
-        # Send a msn to the user to know is added to a team
-        await socket_manager.send_to_id(
-            generate_uuid(user.id), {"event": "team" + "_created"}
+        # Agrego la notificacion cuando un usuario es removido de un equipo:
+        # and a msn to the user to know about it
+        await notification_fanout.notify(
+            db,
+            "add_user_team",
+            get_language(),
+            [user.id],
+            notification_parameters(
+                teamName=html.escape(team.name),
+                team_id=team.id,
+                org_id=team.organization_id,
+            ),
+            socket_event="team" + "_created",
         )
 
         return team
 
     async def remove_user(self, db: Session, team: Team, user: models.User) -> Team:
-        from app.worker import sync_asset_treeitems
-
         team.users.remove(user)
         db.commit()
         db.refresh(team)
-        sync_asset_treeitems.delay(
-            [permission.treeitem_id for permission in team.permissions]
-        )
+        # the permissions of the team may be in any process
+        clear_resolvers()
+        acl_sync.request(user_ids=[user.id])
         await log(
             self.enrich_log_data(
                 team, {"action": "REMOVE_USER", "removed_user_id": user.id}
@@ -111,32 +94,18 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
         )
 
         # Agrego la notificacion cuando un usuario es removido de un equipo:
-        newUserNotification = UserNotification()
-        newUserNotification.user_id = user.id
-        notification = await notification_crud.get_notification_by_event(
-            db=db, event="remove_user_team", language=get_language()
-        )
-        if notification:
-            newUserNotification.notification_id = notification.id
-            newUserNotification.channel = "in_app"
-            newUserNotification.state = False
-            newUserNotification.parameters = (
-                "{'teamName':'"
-                + html.escape(team.name)
-                + "','team_id':'"
-                + str(team.id)
-                + "','org_id':'"
-                + str(team.organization_id)
-                + "'}"
-            )
-
-            db.add(newUserNotification)
-            db.commit()
-            db.refresh(newUserNotification)
-
-        # Send a msn to the user to know is removed to a team
-        await socket_manager.send_to_id(
-            generate_uuid(user.id), {"event": "team" + "_created"}
+        # and a msn to the user to know about it
+        await notification_fanout.notify(
+            db,
+            "remove_user_team",
+            get_language(),
+            [user.id],
+            notification_parameters(
+                teamName=html.escape(team.name),
+                team_id=team.id,
+                org_id=team.organization_id,
+            ),
+            socket_event="team" + "_created",
         )
 
         return team
@@ -155,10 +124,9 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
             db_obj.users.append(user)
 
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        db.flush()
 
-        # Send mail to user to know is added to a team
+        # Send mail to user to know is added to a team, in the same transaction
         _ = send_team_email(
             team=db_obj,
             type='add_member_team',
@@ -167,45 +135,24 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
                 "team_name": db_obj.name,
                 "org_id": db_obj.organization_id,
             },
+            db=db,
         )
+        db.commit()
+        db.refresh(db_obj)
 
-        # Send msn to all user part of a team create
-        #print("El team model is:"+get_language())
-        #print(user_ids)
-        for user_id in user_ids:
-
-            # Create a notification for every user
-            newUserNotification = UserNotification()
-            newUserNotification.user_id = user_id
-
-            notification = await notification_crud.get_notification_by_event(
-                db=db, event="add_user_team", language=get_language()
-            )
-            #print("La notification es:::::")
-            #print(notification)
-            if notification:
-                #print("Entra a crear notificacion"+str(notification.id))
-
-                newUserNotification.notification_id = notification.id
-                newUserNotification.channel = "in_app"
-                newUserNotification.state = False
-                newUserNotification.parameters = (
-                    "{'teamName':'"
-                    + html.escape(db_obj.name)
-                    + "','team_id':'"
-                    + str(db_obj.id)
-                    + "','org_id':'"
-                    + str(db_obj.organization_id)
-                    + "'}"
-                )
-
-                db.add(newUserNotification)
-                db.commit()
-                db.refresh(newUserNotification)
-
-            await socket_manager.send_to_id(
-                generate_uuid(user_id), {"event": "team" + "_created"}
-            )
+        # Create a notification and send a msn to all user part of a team create
+        await notification_fanout.notify(
+            db,
+            "add_user_team",
+            get_language(),
+            user_ids,
+            notification_parameters(
+                teamName=html.escape(db_obj.name),
+                team_id=db_obj.id,
+                org_id=db_obj.organization_id,
+            ),
+            socket_event="team" + "_created",
+        )
 
         await self.log_on_create(db_obj)
         return db_obj
@@ -215,6 +162,17 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
             if user.id not in db_obj.appliers_ids:
                 db_obj.applies.append(user)
                 db.add(db_obj)
+                # Send mail to administrators to know there is an application to the team
+                for admin in db_obj.administrators:
+                    _ = send_email(
+                        admin.email,
+                        'user_apply_team',
+                        {"org_id": db_obj.organization_id,
+                         "team_id": db_obj.id,
+                         "team_name": db_obj.name,
+                         "user_email": user.email,
+                         "user_name": user.full_name},
+                        db=db)
                 db.commit()
                 db.refresh(db_obj)
             else:
@@ -229,16 +187,6 @@ class CRUDTeam(CRUDBase[Team, TeamCreate, TeamPatch]):
             )
         #print(db_obj.organization_id)
         #print(db_obj.id)
-        # Send mail to administrators to know there is an application to the team
-        for admin in db_obj.administrators:
-            _ = send_email(
-                admin.email,
-                'user_apply_team',
-                {"org_id": db_obj.organization_id,
-                 "team_id": db_obj.id,
-                 "team_name": db_obj.name,
-                 "user_email": user.email,
-                 "user_name": user.full_name})
 
         await self.log_on_create(db_obj)
         return db_obj.applies
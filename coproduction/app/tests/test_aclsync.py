@@ -0,0 +1,95 @@
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app.aclsync import AclSync
+
+
+@pytest.fixture
+def backend():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests.append((self.path, payload))
+            self.send_response(500 if "broken" in self.path else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+
+
+class Asset(SimpleNamespace):
+    # the changes are keyed by asset, as the models
+    __hash__ = object.__hash__
+
+
+def internal_asset(service, external_asset_id, bulk=False):
+    return Asset(
+        id=uuid.uuid4(),
+        external_asset_id=external_asset_id,
+        internal_link=f"http://{service}/assets/{external_asset_id}",
+        software_response={"service_name": service, "bulk": bulk},
+    )
+
+
+def entry(user_id, administrator=False):
+    return {"emails": [f"{user_id}@example.com"], "user_id": user_id, "administrator": administrator}
+
+
+def test_only_the_changes_are_sent():
+    pushed = {"a": entry("a"), "b": entry("b")}
+    assert AclSync.diff(pushed, dict(pushed)) is None
+    assert AclSync.diff(pushed, {"a": entry("a", administrator=True), "c": entry("c")}) == {
+        "add": [entry("a", administrator=True), entry("c")],
+        "remove": ["b"],
+    }
+
+
+def test_pushes_per_service_and_reports_the_synced_assets(backend):
+    service, requests = backend
+    sync = AclSync(timeout=3)
+    users = {"a": entry("a")}
+    bulk = [internal_asset(service, f"b{i}", bulk=True) for i in range(3)]
+    single, broken = internal_asset(service, "single"), internal_asset(service, "broken")
+    changes = {asset: {"add": [entry("a")], "remove": ["old"], "users": users} for asset in bulk}
+
+    assert sync.push(changes) == {asset.id for asset in bulk}
+    assert requests == [("/assets/sync_users", {"assets": [
+        {"id": f"b{i}", "add": [entry("a")], "remove": ["old"]} for i in range(3)
+    ]})]
+
+    requests.clear()
+    changes = {asset: {"add": [entry("a")], "remove": [], "users": users} for asset in (single, broken)}
+    # the ones without the bulk capability get their full list, as before
+    assert sync.push(changes) == {single.id}
+    assert sorted(requests) == [("/assets/broken/sync_users", [entry("a")]), ("/assets/single/sync_users", [entry("a")])]
+
+
+def test_failed_assets_back_off_until_the_last_attempt():
+    sync = AclSync(max_attempts=2, backoff=10, max_backoff=60)
+    users = {"a": entry("a")}
+    synced, failed = internal_asset("service", "synced"), internal_asset("service", "failed")
+    changes = {asset: {"add": [entry("a")], "remove": [], "users": users} for asset in (synced, failed)}
+    pushed, now = {}, datetime.now()
+
+    assert len(sync.record(pushed, changes, {synced.id}, now)) == 2
+    assert pushed[synced.id].users == users and pushed[synced.id].next_attempt_at is None
+    # the users last pushed are kept until it works
+    assert pushed[failed.id].users == {} and pushed[failed.id].attempts == 1
+    assert now < pushed[failed.id].next_attempt_at <= now + timedelta(seconds=10)
+
+    assert sync.record(pushed, {failed: changes[failed]}, set(), now) == []
+    assert pushed[failed.id].attempts == 2 and pushed[failed.id].next_attempt_at is None
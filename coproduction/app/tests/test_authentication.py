@@ -0,0 +1,89 @@
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt import PyJWK
+
+from app.general.authentication import JWKSCache, VerifiedTokenCache, decode_token, jwks_cache, verified_tokens
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    return private_key, PyJWK.from_dict({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+
+
+class FakeClient:
+    def __init__(self, keys):
+        self.keys = keys
+        self.calls = 0
+
+    def get_signing_keys(self):
+        self.calls += 1
+        return list(self.keys)
+
+
+@pytest.fixture
+def signing(monkeypatch):
+    private_key, public_jwk = make_key("k1")
+    client = FakeClient([public_jwk])
+    monkeypatch.setattr(jwks_cache, "client", client)
+    monkeypatch.delenv("CLIENT_ID", raising=False)
+    jwks_cache.clear()
+    verified_tokens.clear()
+    yield private_key, client
+    jwks_cache.clear()
+    verified_tokens.clear()
+
+
+def test_decode_token_fetches_keys_once(signing):
+    private_key, client = signing
+    for sub in ("a", "b", "c"):
+        token = jwt.encode({"sub": sub, "exp": int(time.time()) + 60}, private_key, algorithm="RS256", headers={"kid": "k1"})
+        assert decode_token(token)["sub"] == sub
+    assert client.calls == 1
+
+
+def test_decode_token_refreshes_on_unknown_kid(signing):
+    _, client = signing
+    jwks_cache.get_signing_key("k1")
+    rotated_key, rotated_jwk = make_key("k2")
+    client.keys.append(rotated_jwk)
+    token = jwt.encode({"sub": "a", "exp": int(time.time()) + 60}, rotated_key, algorithm="RS256", headers={"kid": "k2"})
+    # a refresh right after the previous one is throttled
+    with pytest.raises(jwt.PyJWKClientError):
+        decode_token(token)
+    jwks_cache.fetched_at -= jwks_cache.min_refresh_interval
+    assert decode_token(token)["sub"] == "a"
+    assert client.calls == 2
+
+
+def test_jwks_cache_expires_keys():
+    _, public_jwk = make_key("k1")
+    cache = JWKSCache("http://jwks", ttl=10, min_refresh_interval=0)
+    cache.client = FakeClient([public_jwk])
+    cache.get_signing_key("k1")
+    cache.get_signing_key("k1")
+    assert cache.client.calls == 1
+    cache.fetched_at -= 11
+    cache.get_signing_key("k1")
+    assert cache.client.calls == 2
+
+
+def test_verified_tokens_are_bounded_by_size_and_exp():
+    cache = VerifiedTokenCache(maxsize=2)
+    now = int(time.time())
+    cache.set("t1", {"sub": "1", "exp": now + 60})
+    cache.set("t2", {"sub": "2", "exp": now + 60})
+    assert cache.get("t1")["sub"] == "1"
+    cache.set("t3", {"sub": "3", "exp": now + 60})
+    # t2 was the least recently used
+    assert cache.get("t2") is None
+    assert cache.get("t1")["sub"] == "1"
+
+    cache.set("expired", {"sub": "4", "exp": now - 1})
+    assert cache.get("expired") is None
+    cache.set("no-exp", {"sub": "5"})
+    assert cache.get("no-exp") is None
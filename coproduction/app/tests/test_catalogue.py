@@ -0,0 +1,66 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.catalogue import InterlinkerCache, InterlinkerNotLoaded
+
+
+def make_cache(catalogue, **kwargs):
+    cache = InterlinkerCache(ttl=60, negative_ttl=60, maxsize=kwargs.get("maxsize", 100))
+    cache.requested = []
+
+    def fetch(id):
+        cache.requested.append(id)
+        return catalogue.get(id, {})
+
+    cache.fetch = fetch
+    return cache
+
+
+def test_prefetch_requests_each_interlinker_once():
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    cache = make_cache({id: {"id": id, "name": f"interlinker {i}"} for i, id in enumerate(ids)})
+    cache.prefetch(ids * 50)
+    assert sorted(cache.requested) == sorted(ids)
+    for id in ids:
+        assert cache.get(id)["id"] == id
+    assert len(cache.requested) == 3
+
+
+def test_unknown_interlinkers_are_cached_as_missing():
+    cache = make_cache({})
+    missing = uuid.uuid4()
+    assert cache.get(missing) == {}
+    assert cache.get(missing) == {}
+    assert cache.requested == [str(missing)]
+
+
+def test_cache_is_bounded_and_invalidated():
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    cache = make_cache({id: {"id": id} for id in ids}, maxsize=2)
+    cache.prefetch(ids)
+    assert cache.stats()["size"] == 2
+    cache.invalidate([ids[-1]])
+    cache.get(ids[-1])
+    assert cache.requested.count(ids[-1]) == 2
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+
+
+def test_misses_in_the_event_loop_are_not_served_empty():
+    loaded, missed = str(uuid.uuid4()), str(uuid.uuid4())
+    cache = make_cache({loaded: {"id": loaded}, missed: {"id": missed}})
+
+    async def read():
+        claim = SimpleNamespace(asset=SimpleNamespace(softwareinterlinker_id=loaded))
+        await cache.load_for_assets_of([claim])
+        assert cache.get(loaded) == {"id": loaded}
+        with pytest.raises(InterlinkerNotLoaded):
+            cache.get(missed)
+
+    asyncio.get_event_loop().run_until_complete(read())
+    # outside of the loop it is fetched
+    assert cache.get(missed) == {"id": missed}
+    assert cache.requested == [loaded, missed]
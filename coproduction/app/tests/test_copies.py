@@ -0,0 +1,85 @@
+import asyncio
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from app.copies import ProcessCopier
+from app.utils import Status
+
+
+def treeitem(name, **data):
+    return SimpleNamespace(
+        id=uuid.uuid4(), name=name, description="", disabler_id=None, disabled_on=None, from_item=None, from_schema=None,
+        is_part_of_codelivery=False, problemprofiles=[], management=0, development=0, exploitation=0, **data
+    )
+
+
+def test_builds_the_copy_with_the_ids_remapped():
+    phase = treeitem("Engage")
+    objective = treeitem("Map", phase_id=phase.id)
+    first = treeitem("A", objective_id=objective.id)
+    second = treeitem("B", objective_id=objective.id)
+    team_id = uuid.uuid4()
+    snapshot = SimpleNamespace(
+        phases=[phase], objectives=[objective], tasks=[first, second],
+        # the prerequisite outside the process is dropped
+        prerequisites={second.id: [first.id, uuid.uuid4()]},
+        permissions=[
+            SimpleNamespace(team_id=team_id, treeitem_id=None, access_assets_permission=True, create_assets_permission=False, delete_assets_permission=False),
+            SimpleNamespace(team_id=team_id, treeitem_id=second.id, access_assets_permission=True, create_assets_permission=True, delete_assets_permission=True),
+        ],
+    )
+    process_id = uuid.uuid4()
+    copier = ProcessCopier(1, 1)
+
+    tree, rows = copier.build(snapshot, process_id)
+    assert [row["name"] for row in tree.phases + tree.objectives + tree.tasks] == ["Engage", "Map", "A", "B"]
+    assert not {row["id"] for row in rows.values()} & {phase.id, objective.id, first.id, second.id}
+    assert tree.prerequisites == {rows[second.id]["id"]: [rows[first.id]["id"]]}
+    assert rows[first.id]["objective_id"] == rows[objective.id]["id"] and rows[first.id]["status"] == Status.awaiting
+
+    permissions = copier.permissions(snapshot, process_id, rows, SimpleNamespace(id="user"))
+    assert [(permission["treeitem_id"], permission["coproductionprocess_id"], permission["creator_id"]) for permission in permissions] == [
+        (None, process_id, "user"), (rows[second.id]["id"], process_id, "user")
+    ]
+
+
+def test_clones_concurrently_and_reports_the_failures():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            requests.append(self.path)
+            kind = self.path.split("/")[2]
+            status, body = {
+                "ok": (200, {"id": "new"}),
+                "mongo": (200, {"_id": "new_mongo"}),
+                "noid": (200, {"detail": "?"}),
+            }.get(kind, (500, {}))
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = f"http://127.0.0.1:{server.server_port}"
+
+    def asset(internal, backend):
+        return SimpleNamespace(id=uuid.uuid4(), internal_link=f"{address}/internal/{internal}", link=f"{address}/backend/{backend}")
+
+    assets = [asset("ok", "ok"), asset("down", "mongo"), asset("noid", "ok"), asset("down", "down")]
+    try:
+        cloned, failed = asyncio.get_event_loop().run_until_complete(ProcessCopier(2, 5).clone_all(assets, "token", just_read=True))
+    finally:
+        server.shutdown()
+
+    assert cloned == {assets[0].id: "new", assets[1].id: "new_mongo"}
+    assert set(failed) == {assets[2].id, assets[3].id}
+    assert "/internal/ok/clone?justRead=True" in requests
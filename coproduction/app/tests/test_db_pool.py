@@ -0,0 +1,32 @@
+import sqlite3
+import threading
+
+from app.config import settings
+from app.general.db.session import InstrumentedQueuePool, get_pool_options, pool_stats
+
+
+def test_pool_size_depends_on_the_profile(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 10)
+    monkeypatch.setattr(settings, "WORKER_DB_POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "WORKER_DB_MAX_OVERFLOW", 0)
+    assert (get_pool_options("api")["pool_size"], get_pool_options("api")["max_overflow"]) == (5, 10)
+    assert (get_pool_options("worker")["pool_size"], get_pool_options("worker")["max_overflow"]) == (2, 0)
+    assert get_pool_options("worker")["poolclass"] is InstrumentedQueuePool
+
+
+def test_only_waits_for_a_busy_pool_are_recorded():
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:", check_same_thread=False), pool_size=1, max_overflow=0, timeout=5)
+    pool_stats.reset()
+
+    first = pool.connect()
+    first.close()
+    # a free connection: not a wait
+    first = pool.connect()
+    assert pool_stats.dict()["wait_count"] == 0
+
+    threading.Timer(0.2, first.close).start()
+    second = pool.connect()
+    second.close()
+    stats = pool_stats.dict()
+    assert stats["wait_count"] == 1 and stats["wait_time_max"] >= 0.15
@@ -0,0 +1,92 @@
+import asyncore
+import smtpd
+import threading
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.general.emails import SMTPMailer, mark
+from app.utils import EmailStatus
+
+
+class DebuggingServer(smtpd.SMTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), None)
+        self.connections = 0
+        self.received = []
+
+    def handle_accepted(self, conn, addr):
+        self.connections += 1
+        super().handle_accepted(conn, addr)
+
+    def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+        if rcpttos == ["nobody@example.com"]:
+            return "550 No such user"
+        self.received += rcpttos
+
+
+@pytest.fixture
+def smtp_server():
+    server = DebuggingServer()
+    thread = threading.Thread(target=asyncore.loop, kwargs={"timeout": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.close()
+    thread.join()
+
+
+def email(email_to):
+    return SimpleNamespace(id=uuid.uuid4(), email_to=email_to, subject="Hi", body_text="", body_html="<p>Hi</p>")
+
+
+def test_sends_the_batch_over_one_connection(smtp_server):
+    mailer = SMTPMailer("127.0.0.1", smtp_server.socket.getsockname()[1], tls=False, user=None, password=None, timeout=5)
+    emails = [email("a@example.com"), email("nobody@example.com"), email("b@example.com")]
+
+    results = mailer.send_all(emails)
+
+    assert smtp_server.connections == 1
+    assert smtp_server.received == ["a@example.com", "b@example.com"]
+    assert results[emails[0].id] is None and results[emails[2].id] is None
+    assert "550" in results[emails[1].id]
+
+
+def test_fails_every_email_when_the_server_is_down():
+    mailer = SMTPMailer("127.0.0.1", 1, tls=False, user=None, password=None, timeout=1)
+    results = mailer.send_all([email("a@example.com"), email("b@example.com")])
+    assert len(results) == 2 and all(results.values())
+
+
+def test_retries_with_backoff_until_the_last_attempt():
+    message = SimpleNamespace(attempts=0, status=EmailStatus.queued, next_attempt_at=None, sent_at=None, last_error=None)
+    now = datetime.now()
+    delays = []
+    for _ in range(settings.EMAIL_MAX_ATTEMPTS - 1):
+        mark(message, "timeout", now)
+        assert message.status == EmailStatus.queued
+        delays.append((message.next_attempt_at - now).total_seconds())
+    mark(message, "timeout", now)
+
+    assert message.status == EmailStatus.failed and message.attempts == settings.EMAIL_MAX_ATTEMPTS
+    assert delays[0] <= settings.EMAIL_RETRY_BACKOFF and delays[-1] > settings.EMAIL_RETRY_BACKOFF
+
+
+def test_emails_are_staged_in_the_transaction_of_the_caller():
+    from app.general.emails import queue
+
+    class Session:
+        def __init__(self):
+            self.info = {}
+            self.added = []
+
+        def add_all(self, objects):
+            self.added += objects
+
+    db = Session()
+    ids = queue([{"email_to": "user@example.com", "type": "test", "subject": "Subject", "body_html": "<p></p>"}], db=db)
+    # nothing is committed, they are written with the transaction of the caller
+    assert [email.id for email in db.added] == ids
+    assert db.info["outbox"][0]["payload"] == {"name": "app.worker.send_emails", "args": [[str(ids[0])]], "kwargs": {}}
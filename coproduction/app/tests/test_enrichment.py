@@ -0,0 +1,188 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from app.enrichment import AssetEnricher, CircuitBreaker
+
+
+@pytest.fixture
+def backend():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            external_id = self.path.split("/")[-1]
+            if external_id.startswith("slow"):
+                time.sleep(0.5)
+            if external_id.startswith("broken"):
+                self.send_response(500)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({"name": f"asset {external_id}"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            requests.append((self.path, payload["ids"]))
+            body = json.dumps(
+                [
+                    {"id": id, "name": f"asset {id}"}
+                    for id in payload["ids"]
+                    if id != "missing"
+                ]
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+
+
+def internal_asset(service, external_asset_id, bulk=False):
+    return SimpleNamespace(
+        id=uuid.uuid4(),
+        type="internalasset",
+        link=f"http://localhost/{service}/assets/{external_asset_id}",
+        external_asset_id=external_asset_id,
+        software_response={"bulk": bulk},
+    )
+
+
+def enrich(enricher, assets):
+    return asyncio.get_event_loop().run_until_complete(enricher.enrich(assets))
+
+
+def test_assets_are_enriched_concurrently_with_partial_failures(backend):
+    service, requests = backend
+    enricher = AssetEnricher(
+        concurrency=10,
+        timeout=3,
+        service_timeouts={},
+        breaker_threshold=100,
+        breaker_reset_timeout=30,
+    )
+    assets = [internal_asset(service, f"slow{i}") for i in range(10)] + [
+        internal_asset(service, "broken")
+    ]
+
+    start = time.monotonic()
+    enrich(enricher, assets)
+    # one request at a time would take 5 seconds
+    assert time.monotonic() - start < 2.5
+
+    assert [asset.internalData["name"] for asset in assets[:10]] == [
+        f"asset slow{i}" for i in range(10)
+    ]
+    assert assets[-1].internalData["error"] == "unavailable"
+
+
+def test_service_timeout_marks_the_asset(backend):
+    service, _ = backend
+    enricher = AssetEnricher(
+        concurrency=10,
+        timeout=5,
+        service_timeouts={service: 0.1},
+        breaker_threshold=100,
+        breaker_reset_timeout=30,
+    )
+    slow, fast = internal_asset(service, "slow"), internal_asset(service, "fast")
+    enrich(enricher, [slow, fast])
+    assert slow.internalData["error"] == "timeout"
+    assert fast.internalData["name"] == "asset fast"
+
+
+def test_open_breaker_skips_the_service(backend):
+    service, requests = backend
+    enricher = AssetEnricher(
+        concurrency=1,
+        timeout=1,
+        service_timeouts={},
+        breaker_threshold=2,
+        breaker_reset_timeout=30,
+    )
+    assets = [internal_asset(service, f"broken{i}") for i in range(5)]
+    enrich(enricher, assets)
+    assert len(requests) == 2
+    assert all(asset.internalData["error"] == "unavailable" for asset in assets)
+    assert enricher.stats()[service]["state"] == "open"
+
+
+def test_breaker_lets_a_trial_call_through_after_the_reset_timeout():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10)
+    breaker.failure()
+    assert not breaker.allow()
+    breaker.opened_at -= 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+
+
+def test_a_cancelled_trial_call_does_not_keep_the_breaker_open():
+    class HangingClient:
+        async def request(self, *args, **kwargs):
+            await asyncio.sleep(10)
+
+    enricher = AssetEnricher(
+        concurrency=1,
+        timeout=30,
+        service_timeouts={},
+        breaker_threshold=1,
+        breaker_reset_timeout=10,
+    )
+    breaker = enricher.breaker("service")
+    breaker.failure()
+    breaker.opened_at -= 10
+
+    async def cancel_the_trial():
+        trial = asyncio.ensure_future(
+            enricher.fetch(HangingClient(), "service", "http://service/assets/1")
+        )
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.get_event_loop().run_until_complete(cancel_the_trial())
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+
+
+def test_services_with_bulk_capability_get_one_request(backend):
+    service, requests = backend
+    enricher = AssetEnricher(
+        concurrency=10,
+        timeout=3,
+        service_timeouts={},
+        breaker_threshold=100,
+        breaker_reset_timeout=30,
+    )
+    assets = [internal_asset(service, f"a{i}", bulk=True) for i in range(20)] + [
+        internal_asset(service, "missing", bulk=True)
+    ]
+    enrich(enricher, assets)
+    assert requests == [("/assets/bulk", [f"a{i}" for i in range(20)] + ["missing"])]
+    assert [asset.internalData["name"] for asset in assets[:20]] == [
+        f"asset a{i}" for i in range(20)
+    ]
+    assert assets[-1].internalData["error"] == "not found"
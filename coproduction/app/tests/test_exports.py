@@ -0,0 +1,161 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, DateTime, Enum, Integer, create_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from app.exports import ProcessExporter
+from app.jobs import Progress, start
+from app.utils import JobStatus
+
+
+@pytest.fixture
+def drive():
+    attempts = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            id = self.path.split("/")[-2]
+            attempts[id] = attempts.get(id, 0) + 1
+            if id.startswith("broken") or (id.startswith("flaky") and attempts[id] < 3):
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(0.3)
+            body = b"x" * 200000
+            self.send_response(200)
+            self.send_header("Content-Disposition", f'attachment; filename="{id} report.pdf"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_port}", attempts
+    server.shutdown()
+
+
+def make_exporter(drive_address, tmp_path):
+    exporter = ProcessExporter(str(tmp_path / "zipfiles"), concurrency=4, timeout=5, max_retries=3, backoff=0.05, max_backoff=0.1)
+    exporter.download_url = lambda asset: f"http://{drive_address}/assets/{asset.internalData['id']}/download"
+    return exporter
+
+
+def internal_asset(drive_id):
+    return SimpleNamespace(id=uuid.uuid4(), type="internalasset", internalData={"id": drive_id, "name": drive_id})
+
+
+def test_downloads_concurrently_and_retries_with_backoff(drive, tmp_path):
+    address, attempts = drive
+    exporter = make_exporter(address, tmp_path)
+    assets = [internal_asset(f"file{i}") for i in range(4)] + [internal_asset("flaky"), internal_asset("broken")]
+    assets.append(SimpleNamespace(id=uuid.uuid4(), type="externalasset"))
+
+    start = time.monotonic()
+    paths = asyncio.get_event_loop().run_until_complete(exporter.download_all(assets, str(tmp_path / "assets"), token="token"))
+    # six downloads of 0.3s, four at a time
+    assert time.monotonic() - start < 1.5
+
+    assert set(paths) == {asset.id for asset in assets[:5]}
+    assert attempts["flaky"] == 3 and attempts["broken"] == 3
+    for asset in assets[:5]:
+        assert os.path.basename(paths[asset.id]) == f"{asset.id}.{asset.internalData['id']}_report.pdf"
+        assert os.path.getsize(paths[asset.id]) == 200000
+    assert not [file for file in os.listdir(tmp_path / "assets") if file.endswith(".part")]
+
+
+def test_zip_keeps_the_layout_of_the_import(tmp_path):
+    exporter = ProcessExporter(str(tmp_path / "zipfiles"), 1, 1, 1, 1, 1)
+    root = tmp_path / "work" / "processes_exported" / "My_process"
+    (root / "assets").mkdir(parents=True)
+    (root / "schema.json").write_text("[]")
+    (root / "assets" / "a.pdf").write_bytes(b"pdf")
+    os.makedirs(exporter.directory)
+    zip_path = os.path.join(exporter.directory, "process.zip")
+
+    exporter.write_zip(str(tmp_path / "work"), zip_path)
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert sorted(zipf.namelist()) == ["processes_exported/My_process/assets/a.pdf", "processes_exported/My_process/schema.json"]
+
+
+def test_reuses_the_stored_file_when_it_was_not_modified(tmp_path):
+    downloads = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            downloads.append(self.path)
+            body = b"x" * 1000
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Disposition", 'attachment; filename="report.pdf"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        exporter = make_exporter(f"127.0.0.1:{server.server_port}", tmp_path)
+        exporter.blob_directory = str(tmp_path / "blobs")
+        asset = internal_asset("file")
+        run = asyncio.get_event_loop().run_until_complete
+
+        progress = CountingProgress()
+        first = run(exporter.download_all([asset], str(tmp_path / "first"), token="token", progress=progress))
+        second = run(exporter.download_all([asset], str(tmp_path / "second"), token="token", progress=progress))
+    finally:
+        server.shutdown()
+
+    assert len(downloads) == 1
+    assert progress.statuses == ["done", "reused"]
+    assert os.path.basename(second[asset.id]) == f"{asset.id}.report.pdf"
+    assert open(second[asset.id], "rb").read() == open(first[asset.id], "rb").read()
+
+
+class CountingProgress(Progress):
+    def __init__(self):
+        self.statuses = []
+
+    def asset_done(self, status):
+        self.statuses.append(status)
+
+
+def test_only_one_worker_starts_a_job(tmp_path):
+    Base = declarative_base()
+
+    class Job(Base):
+        __tablename__ = "job"
+        id = Column(Integer, primary_key=True)
+        status = Column(Enum(JobStatus, create_constraint=False, native_enum=False), default=JobStatus.pending)
+        started_at = Column(DateTime)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Job(id=1))
+        db.commit()
+
+    # the same task delivered twice
+    first, second = Session(engine), Session(engine)
+    first_job, second_job = first.query(Job).get(1), second.query(Job).get(1)
+    assert start(first, first_job)
+    assert not start(second, second_job)
+    assert first_job.started_at and second_job.status == JobStatus.running
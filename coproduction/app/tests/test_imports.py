@@ -0,0 +1,80 @@
+import json
+import zipfile
+
+import pytest
+
+from app.imports import InvalidArchive, read_manifest, summarize
+from app.utils import Status
+
+ROOT = "processes_exported/My_process/"
+
+
+def phase(name, objectives):
+    return {"type": "phase", "name": name, "description": "", "objectives": objectives}
+
+
+def objective(name, tasks):
+    return {"type": "objective", "name": name, "description": "", "tasks": tasks}
+
+
+def task(name, status="awaiting", assets=[]):
+    return {"type": "task", "name": name, "description": "", "status": status, "assets": assets}
+
+
+def archive(path, schema, files={}, process=None):
+    with zipfile.ZipFile(path, "w") as zipf:
+        zipf.writestr(ROOT + "coproduction.json", json.dumps(process or {
+            "name": "import_My process", "language": "en", "logotype": "/static/coproductionprocesses/a.png",
+            "rating": "None", "schema_used": "None",
+        }))
+        zipf.writestr(ROOT + "schema.json", json.dumps(schema))
+        for name, content in files.items():
+            zipf.writestr(name, content)
+    return zipfile.ZipFile(path)
+
+
+def test_reads_and_validates_the_manifest(tmp_path):
+    internal = {"type": "internalasset", "id": "1234", "internal_link": "http://googledrive/assets/x"}
+    external = {"type": "externalasset", "id": "5678", "name": "web", "uri": "https://example.org"}
+    schema = [
+        phase("Engage", [objective("Map", [task("A", assets=[internal, external]), task("B", "finished")])]),
+        phase("Design", [objective("Ideas", [task("C")]), objective("Plan", [])]),
+        {"type": "unknown"},
+    ]
+    manifest = read_manifest(archive(tmp_path / "a.zip", schema, {
+        ROOT + "assets/1234.report_v1.pdf": "pdf",
+        ROOT + "a.png": "png",
+    }))
+
+    assert manifest.process.name == "import_My process" and manifest.process.rating is None
+    assert [phase_in.name for phase_in, _ in manifest.phases] == ["Engage", "Design"]
+    assert manifest.treeitems == 8
+    assert [asset["id"] for asset in manifest.assets] == ["1234", "5678"]
+    assert manifest.asset_files == {"1234": ROOT + "assets/1234.report_v1.pdf"}
+    assert manifest.logotype == ROOT + "a.png"
+
+
+@pytest.mark.parametrize("schema,files,message", [
+    ([], {"../evil": "x"}, "Unsafe path"),
+    ("phases", {}, "must be a list"),
+    ([phase("Engage", [objective("Map", [task("A", status="lost")])])], {}, "unknown status"),
+    ([phase("Engage", [objective("Map", [task("A", assets=[{"type": "externalasset"}])])])], {}, "without uri"),
+    ([{"type": "phase", "objectives": []}], {}, "Phase None"),
+])
+def test_rejects_invalid_archives(tmp_path, schema, files, message):
+    with pytest.raises(InvalidArchive, match=message):
+        read_manifest(archive(tmp_path / "a.zip", schema, files))
+
+
+def test_summarizes_status_and_progress_like_the_crud():
+    row = {}
+    summarize(row, [
+        {"status": Status.finished, "disabled_on": None},
+        {"status": Status.in_progress, "disabled_on": None},
+        {"status": Status.awaiting, "disabled_on": "2024-01-01"},
+    ])
+    assert row == {"status": Status.in_progress, "progress": 75}
+
+    empty = {}
+    summarize(empty, [])
+    assert empty == {"status": Status.awaiting, "progress": 0}
@@ -0,0 +1,70 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, Float, create_engine, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session, declarative_base
+from sqlalchemy_utils import UUIDType
+
+from app import models
+from app.general.utils.keyset import KeysetPage, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at, id = datetime(2026, 1, 1, 12, 30), uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+    # the rank of a search
+    assert decode_cursor(encode_cursor(0.1 + 0.2, id), parse=float) == (0.1 + 0.2, id)
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not a cursor")
+    assert error.value.status_code == 400
+
+
+def test_pages_after_the_cursor():
+    page = KeysetPage(limit=20, cursor=encode_cursor(datetime(2026, 1, 1), uuid.uuid4()))
+    query = Session().query(models.UserNotification).filter(models.UserNotification.user_id == "user")
+    query = query.order_by(models.UserNotification.created_at.desc(), models.UserNotification.id.desc())
+    query = query.filter(page.filter(models.UserNotification)).limit(page.limit)
+    sql = str(query.statement.compile(dialect=postgresql.dialect()))
+    assert "(usernotification.created_at, usernotification.id) < (%(param_1)s, %(param_2)s)" in sql
+    assert "ORDER BY usernotification.created_at DESC, usernotification.id DESC" in sql
+
+
+def test_pages_through_tied_ranks():
+    Base = declarative_base()
+
+    class Result(Base):
+        __tablename__ = "result"
+        id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+        score = Column(Float)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = Session(engine)
+    db.add_all([Result(score=score) for score in (0.1, 0.1, 0.1, 0.1, 0.1, 0.7)])
+    db.commit()
+
+    rank = func.round(Result.score, 1)
+    seen, cursor = [], None
+    while True:
+        page = KeysetPage(limit=2, cursor=cursor)
+        seen += page.paginate_ranked(db.query(Result), rank, Result)
+        if not (cursor := page.next_cursor):
+            break
+    assert len({result.id for result in seen}) == len(seen) == 6
+    assert seen[0].score == 0.7
+
+
+def test_the_rank_is_compared_as_read(monkeypatch):
+    statements = []
+    monkeypatch.setattr(Query, "all", lambda query: statements.append(query.statement) or [])
+    page = KeysetPage(limit=2, cursor=encode_cursor(0.1, uuid.uuid4()))
+    page.paginate_ranked(Session().query(models.Story), func.ts_rank_cd(models.Story.search_vector, func.to_tsquery("park")), models.Story)
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    rank = "CAST(ts_rank_cd(story.search_vector, to_tsquery(%(to_tsquery_1)s)) AS FLOAT(53))"
+    # the same double precision rank in the select, the order and the cursor
+    assert f"{rank} AS rank" in sql
+    assert f"({rank}, story.id) < (%(param_1)s, %(param_2)s)" in sql
+    assert f"ORDER BY {rank} DESC, story.id DESC" in sql
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.messages import LogShipper
+
+
+@pytest.fixture
+def logging_stub():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, json.loads(body)))
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", received
+    server.shutdown()
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_entries_are_sent_in_batches(logging_stub):
+    url, received = logging_stub
+    shipper = LogShipper(url=f"{url}/log", batch_url=f"{url}/log/bulk", batch_size=10, flush_interval=0.01)
+
+    async def scenario():
+        await shipper.start()
+        for i in range(25):
+            await shipper.put({"action": "CREATE", "i": i})
+        await asyncio.sleep(0.5)
+        await shipper.stop()
+
+    run(scenario())
+    assert all(path == "/log/bulk" for path, _ in received)
+    assert sorted(entry["i"] for _, batch in received for entry in batch) == list(range(25))
+    assert max(len(batch) for _, batch in received) <= 10
+    assert shipper.stats()["sent"] == 25
+
+
+def test_stop_flushes_queued_entries(logging_stub):
+    url, received = logging_stub
+    shipper = LogShipper(url=f"{url}/log", batch_size=5, flush_interval=60)
+
+    async def scenario():
+        await shipper.start()
+        for i in range(12):
+            await shipper.put({"i": i})
+        await shipper.stop()
+
+    run(scenario())
+    assert sorted(data["i"] for _, data in received) == list(range(12))
+
+
+def test_full_queue_drops_entries():
+    shipper = LogShipper(url="http://logging/api/v1/log", max_queue_size=3, enqueue_timeout=0.01)
+
+    async def scenario():
+        # only the queue is needed, the background task is not started
+        shipper.queue = asyncio.Queue(maxsize=shipper.max_queue_size)
+        for i in range(5):
+            await shipper.put({"i": i})
+
+    run(scenario())
+    assert shipper.stats()["enqueued"] == 3
+    assert shipper.stats()["dropped"] == 2
@@ -0,0 +1,40 @@
+import json
+import uuid
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app import models, schemas
+from app.notifications.parameters import notification_parameters, parse_parameters
+
+
+def test_builds_string_parameters():
+    team_id = uuid.uuid4()
+    assert notification_parameters(teamName="A &amp; B", team_id=team_id, org_id=None) == {"teamName": "A &amp; B", "team_id": str(team_id)}
+
+
+def test_parses_the_stored_formats():
+    expected = {"teamName": "Team", "copro_id": "1"}
+    assert parse_parameters("{'teamName':'Team','copro_id':'1'}") == expected
+    assert parse_parameters(json.dumps(expected)) == expected
+    # a JSON string with the parameters inside
+    assert parse_parameters(json.dumps("{'teamName':'Team','copro_id':'1'}")) == expected
+    assert parse_parameters(expected) == expected
+    assert parse_parameters(None) is None
+    with pytest.raises(ValueError):
+        parse_parameters("[1, 2]")
+    with pytest.raises(ValueError):
+        parse_parameters("{'teamName':")
+
+
+def test_returns_the_parameters_as_a_json_string():
+    parameters = notification_parameters(treeitem_id="task", copro_id="process")
+    notification = schemas.UserNotificationOut(
+        id=uuid.uuid4(), created_at="2026-01-01T00:00:00", user_id="user", notification_id=uuid.uuid4(), channel="in_app", state=False, parameters=parameters
+    )
+    assert json.loads(notification.parameters) == parameters
+
+
+def test_filters_by_the_indexed_expression():
+    query = models.CoproductionProcessNotification.parameters["treeitem_id"].astext == "task"
+    assert "(coproductionprocessnotification.parameters ->> %(parameters_1)s)" in str(query.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,104 @@
+import threading
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import requests
+
+from app.outbox import Outbox
+from app.utils import OutboxStatus
+
+
+class FakeSession:
+    def __init__(self):
+        self.info = {}
+        self.inserted = []
+
+    def connection(self):
+        return SimpleNamespace(execute=lambda statement, rows: self.inserted.extend(rows))
+
+
+def test_stages_the_messages_until_the_flush():
+    outbox = Outbox(batch_size=10, http_timeout=1, max_attempts=3, backoff=1, max_backoff=10)
+    session = FakeSession()
+    for i in range(3):
+        outbox.add_ids(session, "acl_sync", treeitem_ids=[f"t{i}", None], user_ids=["u"])
+    outbox.http(session, "DELETE", "http://service/assets/1", backend_auth=True, aggregate="asset:1")
+    assert session.inserted == []
+
+    outbox.write(session)
+    # the ids of the flush in one message
+    assert [(row["kind"], row["payload"]) for row in session.inserted] == [
+        ("http", {"method": "DELETE", "url": "http://service/assets/1", "json": None, "backend_auth": True}),
+        ("acl_sync", {"treeitem_ids": ["t0", "t1", "t2"], "user_ids": ["u"]}),
+    ]
+    assert session.info == {"outbox_written": True}
+
+
+def test_retries_with_backoff_until_the_last_attempt():
+    outbox = Outbox(batch_size=10, http_timeout=1, max_attempts=2, backoff=1, max_backoff=10)
+    message = SimpleNamespace(attempts=0, status=OutboxStatus.pending)
+    now = datetime.now()
+    outbox.mark(message, "timeout", now)
+    assert message.status == OutboxStatus.pending and message.next_attempt_at > now
+    outbox.mark(message, "timeout", now)
+    assert message.status == OutboxStatus.failed and message.next_attempt_at is None
+
+
+def test_http_calls_are_idempotent():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_DELETE(self):
+            received.append(self.headers["Idempotency-Key"])
+            self.send_response(404 if len(received) > 1 else 204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    outbox = Outbox(batch_size=10, http_timeout=3, max_attempts=3, backoff=1, max_backoff=10)
+    message = SimpleNamespace(id=uuid.uuid4(), payload={"method": "DELETE", "url": f"http://127.0.0.1:{server.server_port}/assets/1"})
+    try:
+        with requests.Session() as outbox.client:
+            outbox.deliver_http(message)
+            # delivered again after a crash of the relay: already deleted
+            outbox.deliver_http(message)
+    finally:
+        server.shutdown()
+    assert received == [str(message.id)] * 2
+
+
+def test_assets_are_deleted_from_the_backend_of_their_interlinker(monkeypatch):
+    from app.catalogue import interlinker_cache
+
+    interlinker_id = str(uuid.uuid4())
+    monkeypatch.setattr(interlinker_cache, "fetch", lambda id: {"service_name": "googledrive", "api_path": "/assets"})
+    interlinker_cache.invalidate([interlinker_id])
+    outbox = Outbox(batch_size=10, http_timeout=3, max_attempts=3, backoff=1, max_backoff=10)
+    requested = []
+    outbox.client = SimpleNamespace(request=lambda method, url, **kwargs: requested.append((method, url)) or SimpleNamespace(status_code=204, raise_for_status=lambda: None))
+    message = SimpleNamespace(id=uuid.uuid4(), payload={"softwareinterlinker_id": interlinker_id, "external_asset_id": "x"})
+    outbox.deliver_asset_delete(message)
+    assert requested == [("DELETE", "http://googledrive/assets/x")]
+
+
+def test_the_relay_lock_ends_with_its_transaction():
+    statements = []
+
+    class Session:
+        def execute(self, statement, params=None):
+            statements.append(str(statement))
+            return SimpleNamespace(scalar=lambda: False)
+
+        def rollback(self):
+            statements.append("ROLLBACK")
+
+    outbox = Outbox(batch_size=10, http_timeout=1, max_attempts=3, backoff=1, max_backoff=10)
+    # another relay holds it
+    assert outbox.relay(Session()) is None
+    assert statements == ["SELECT pg_try_advisory_xact_lock(:key)", "ROLLBACK"]
@@ -0,0 +1,85 @@
+import uuid
+from types import SimpleNamespace
+
+from app.permissions.models import GRANT_ALL, PERMS
+from app.permissions.resolver import PermissionResolver
+
+
+def permission(team_id, treeitem_id=None, **values):
+    return SimpleNamespace(team_id=team_id, treeitem_id=treeitem_id, team=SimpleNamespace(type=SimpleNamespace(value="citizen")), **{
+        key: values.get(key, False) for key in PERMS
+    })
+
+
+def make_tree():
+    process, phase, objective, task, other_task = (uuid.uuid4() for _ in range(5))
+    parents = {phase: process, objective: phase, task: objective, other_task: objective}
+    return SimpleNamespace(process=process, phase=phase, objective=objective, task=task, other_task=other_task, parents=parents)
+
+
+def test_closest_permission_wins_and_same_level_is_ored():
+    tree = make_tree()
+    team, other_team = uuid.uuid4(), uuid.uuid4()
+    resolver = PermissionResolver(tree.process, [], [
+        permission(team, access_assets_permission=True, create_assets_permission=True),
+        permission(team, tree.task, access_assets_permission=True),
+        permission(other_team, tree.task, delete_assets_permission=True),
+    ], tree.parents)
+    user = SimpleNamespace(id="user", teams_ids=[team, other_team])
+
+    perms = resolver.get_dict(user, tree.task)
+    assert perms["access_assets_permission"]
+    assert perms["delete_assets_permission"]
+    # overridden by the permissions set on the task itself
+    assert not perms["create_assets_permission"]
+
+    perms = resolver.get_dict(user, tree.other_task)
+    assert perms["create_assets_permission"]
+    assert not perms["delete_assets_permission"]
+
+
+def test_administrators_and_strangers():
+    tree = make_tree()
+    team = uuid.uuid4()
+    resolver = PermissionResolver(tree.process, ["admin"], [permission(team, tree.objective, access_assets_permission=True)], tree.parents)
+
+    assert resolver.get_dict(SimpleNamespace(id="admin", teams_ids=[]), tree.task) == GRANT_ALL
+    assert not resolver.user_can(SimpleNamespace(id="stranger", teams_ids=[]), tree.task, "access_assets_permission")
+    assert not resolver.user_can(SimpleNamespace(id="member", teams_ids=[team]), tree.phase, "access_assets_permission")
+    assert resolver.user_can(SimpleNamespace(id="member", teams_ids=[team]), tree.task, "access_assets_permission")
+
+
+def test_get_many_reads_the_teams_of_each_user_once():
+    tree = make_tree()
+    team = uuid.uuid4()
+    resolver = PermissionResolver(tree.process, [], [permission(team, access_assets_permission=True)], tree.parents)
+    reads = []
+
+    class User:
+        def __init__(self, id):
+            self.id = id
+
+        @property
+        def teams_ids(self):
+            reads.append(self.id)
+            return [team]
+
+    users = [User(i) for i in range(10)]
+    result = resolver.get_many([(user, treeitem) for user in users for treeitem in tree.parents])
+    assert len(result) == 40
+    assert all(perms["access_assets_permission"] for perms in result.values())
+    assert sorted(reads) == list(range(10))
+
+
+def test_filters_the_treeitems_with_a_permission_in_sql():
+    from sqlalchemy.dialects import postgresql
+
+    from app.permissions.crud import exportCrud as permissions_crud
+
+    user = SimpleNamespace(id="user")
+    query = permissions_crud.treeitem_ids_with(user, uuid.uuid4(), "access_assets_permission")
+    sql = str(query.compile(dialect=postgresql.dialect()))
+    # the closest level of every treeitem, granted ones first
+    assert "DISTINCT ON (treeitem_closure.descendant_id)" in sql
+    assert "ORDER BY treeitem_closure.descendant_id, treeitem_closure.depth, permission.access_assets_permission DESC NULLS LAST" in sql
+    assert "association_user_team.user_id = %(user_id_1)s" in sql
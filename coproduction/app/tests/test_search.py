@@ -0,0 +1,60 @@
+import asyncio
+import uuid
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from app import models
+from app.general.utils.search import like_pattern, search_words, text_search
+
+
+def compile(expression):
+    return str(expression.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_searches_the_words_in_every_language():
+    assert search_words(" Green  city's ") == ["green", "city", "s"]
+    condition, rank = text_search(models.CoproductionProcess.search_vector, "green cit", models.CoproductionProcess.name)
+    sql = compile(condition)
+    # the last word may be half written
+    for config in ("english", "spanish", "italian", "simple"):
+        assert f"to_tsquery('{config}'::regconfig, 'green & cit:*')" in sql
+    assert "coproductionprocess.name ILIKE" in sql
+    assert "similarity(coproductionprocess.name" in compile(rank)
+
+
+def test_short_terms_only_use_the_text_search():
+    condition, _ = text_search(models.CoproductionProcess.search_vector, "gr", models.CoproductionProcess.name)
+    assert "ILIKE" not in compile(condition)
+    assert text_search(models.CoproductionProcess.search_vector, " ?! ") == (None, None)
+    assert like_pattern("50%_off") == "%50\\%\\_off%"
+
+
+def test_the_vector_is_generated_in_the_language_of_the_process():
+    column = models.CoproductionProcess.__table__.c.search_vector
+    sql = str(column.computed.sqltext)
+    assert sql.startswith("setweight(to_tsvector(CASE language WHEN 'en' THEN 'english'::regconfig")
+    assert "coalesce(idea, '')), 'D')" in sql
+
+
+def test_stories_are_searched_in_their_generated_vector():
+    sql = str(models.Story.__table__.c.search_vector.computed.sqltext)
+    assert sql.startswith("setweight(to_tsvector('simple'::regconfig, coalesce(data_story ->> 'title', '')), 'A')")
+    condition, rank = text_search(models.Story.search_vector, "park", models.Story.data_story["title"].astext)
+    assert "story.search_vector @@" in compile(condition)
+    assert "similarity((story.data_story ->> 'title')" in compile(rank)
+
+
+def test_users_are_searched_in_the_organization_in_one_query(monkeypatch):
+    from app import crud
+    from app.config import settings
+
+    statements = []
+    monkeypatch.setattr(Query, "all", lambda query: statements.append(query.statement) or [])
+    asyncio.get_event_loop().run_until_complete(crud.user.search(db=Session(), user=None, search="ana", organization_id=uuid.uuid4()))
+    assert len(statements) == 1
+    sql = compile(statements[0])
+    assert "FROM association_user_team JOIN team ON team.id = association_user_team.team_id" in sql
+    assert "\"user\".full_name ILIKE" in sql and "\"user\".email ILIKE" in sql
+    assert "greatest(similarity(\"user\".full_name, 'ana'), similarity(\"user\".email, 'ana')) DESC NULLS LAST" in sql
+    assert f"LIMIT {settings.USER_SEARCH_LIMIT}" in sql
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import pytest
+import redis
+
+from app.sockets import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0, broken: bool = False):
+        self.delay = delay
+        self.broken = broken
+        self.received = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.delay)
+        if self.broken:
+            raise RuntimeError("connection closed")
+        self.received.append(json.loads(text))
+
+    async def close(self):
+        self.closed = True
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def test_sends_concurrently_and_drops_dead_connections():
+    manager = ConnectionManager(send_timeout=0.5)
+    id = uuid.uuid4()
+    slow = [FakeWebSocket(delay=0.3) for _ in range(5)]
+    broken, stuck = FakeWebSocket(broken=True), FakeWebSocket(delay=10)
+    for websocket in slow + [broken, stuck]:
+        run(manager.connect(websocket, id))
+
+    start = time.monotonic()
+    run(manager.send_to_id(id, {"event": "task_created"}))
+    assert time.monotonic() - start < 1.5
+    assert all(websocket.received == [{"event": "task_created"}] for websocket in slow)
+    assert broken.closed and stuck.closed
+    assert manager.active_connections[str(id)] == slow
+    assert manager.stats()["dropped"] == 2
+
+    other = FakeWebSocket()
+    run(manager.connect(other, "user"))
+    run(manager.broadcast({"event": "story_created"}))
+    assert other.received == [{"event": "story_created"}]
+    assert len(slow[0].received) == 2
+
+
+def test_sends_to_many_ids_once_each():
+    manager = ConnectionManager()
+    first, second, other = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    run(manager.connect(first, "first"))
+    run(manager.connect(second, "second"))
+    run(manager.connect(other, "other"))
+
+    run(
+        manager.send_to_ids(
+            ["first", "second", "first", "missing"], {"event": "team_created"}
+        )
+    )
+    assert first.received == [{"event": "team_created"}]
+    assert second.received == [{"event": "team_created"}]
+    assert other.received == []
+
+
+def test_processes_without_the_subscription_publish_their_events(monkeypatch):
+    published = []
+
+    class Pipeline:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *args):
+            pass
+
+        def publish(self, channel, text):
+            published.append((channel, json.loads(text)))
+
+        async def execute(self):
+            pass
+
+    class Client:
+        def pipeline(self, transaction=True):
+            return Pipeline()
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr("app.sockets.aioredis.from_url", lambda url: Client())
+    # the Celery worker never starts the manager
+    manager = ConnectionManager("redis://redis:6379", "sockets")
+    run(manager.send_to_id("process", {"event": "coproductionprocess_created"}))
+    run(manager.send_to_ids(["first", "second"], {"event": "team_created"}))
+    assert published == [
+        ("sockets:process", {"event": "coproductionprocess_created"}),
+        ("sockets:first", {"event": "team_created"}),
+        ("sockets:second", {"event": "team_created"}),
+    ]
+
+
+def test_the_subscription_is_retried_until_redis_is_back(monkeypatch):
+    subscriptions = []
+
+    class PubSub:
+        def __init__(self):
+            self.messages = [
+                {
+                    "type": "message",
+                    "channel": b"sockets:process",
+                    "data": b'{"event": "task_created"}',
+                }
+            ]
+
+        async def subscribe(self, *channels):
+            subscriptions.append(channels)
+            if len(subscriptions) == 1:
+                raise ConnectionError("Redis is down")
+
+        async def get_message(self, ignore_subscribe_messages=False, timeout=0):
+            if self.messages:
+                return self.messages.pop()
+            await asyncio.sleep(0.01)
+
+        async def close(self):
+            pass
+
+    class Client:
+        def pubsub(self):
+            return PubSub()
+
+        async def close(self):
+            pass
+
+    monkeypatch.setattr("app.sockets.aioredis.from_url", lambda url: Client())
+    manager = ConnectionManager("redis://redis:6379", "sockets")
+    websocket = FakeWebSocket()
+
+    async def scenario():
+        await manager.start()
+        assert not manager.running
+        await manager.connect(websocket, "process")
+        for _ in range(100):
+            if websocket.received:
+                break
+            await asyncio.sleep(0.05)
+        assert manager.running
+        await manager.stop()
+
+    run(scenario())
+    assert subscriptions == [
+        ("sockets:broadcast",),
+        ("sockets:broadcast", "sockets:process"),
+    ]
+    assert websocket.received == [{"event": "task_created"}]
+
+
+def test_events_reach_the_connections_of_other_workers():
+    url = os.getenv("TEST_REDIS_URL", "redis://localhost:6379")
+    try:
+        redis.Redis.from_url(url, socket_connect_timeout=0.5).ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip("needs a Redis server")
+
+    prefix = f"test:{uuid.uuid4()}"
+    first, second = ConnectionManager(url, prefix), ConnectionManager(url, prefix)
+    websocket = FakeWebSocket()
+
+    async def scenario():
+        await first.start()
+        await second.start()
+        await second.connect(websocket, "process")
+        await first.send_to_id("process", {"event": "phase_updated"})
+        await first.broadcast({"event": "story_created"})
+        await first.send_to_ids(["user", "process"], {"event": "team_created"})
+        for _ in range(50):
+            if len(websocket.received) == 3:
+                break
+            await asyncio.sleep(0.05)
+        await first.stop()
+        await second.stop()
+
+    run(scenario())
+    assert websocket.received == [
+        {"event": "phase_updated"},
+        {"event": "story_created"},
+        {"event": "team_created"},
+    ]
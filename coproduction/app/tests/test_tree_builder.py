@@ -0,0 +1,50 @@
+import datetime
+import uuid
+
+import pytest
+
+from app.treeitems.bulk import TreeBuilder
+
+
+class RecordingSession:
+    def __init__(self):
+        self.inserts = []
+
+    def bulk_insert_mappings(self, model, rows):
+        self.inserts.append((model.__name__, len(rows)))
+
+    def execute(self, statement, rows):
+        self.inserts.append((statement.table.name, len(rows)))
+
+
+def test_builds_ancestry_and_inserts_one_batch_per_table():
+    process_id = uuid.uuid4()
+    tree = TreeBuilder(process_id, creator_id="user")
+    phase = tree.phase({"name": "Engage"})
+    objective = tree.objective(phase, {"name": "Map"})
+    first = tree.task(objective, {"name": "A", "start_date": datetime.date(2024, 1, 1)})
+    second = tree.task(objective, {"name": "B", "end_date": datetime.date(2024, 3, 1)})
+    tree.set_prerequisites(second, [first["id"]])
+
+    db = RecordingSession()
+    tree.insert(db)
+
+    assert db.inserts == [("Phase", 1), ("Objective", 1), ("Task", 2), ("treeitem_closure", 13), ("treeitem_prerequisites", 1)]
+    assert {(row["ancestor_id"], row["depth"]) for row in tree.closure if row["descendant_id"] == second["id"]} == {
+        (second["id"], 0), (objective["id"], 1), (phase["id"], 2), (process_id, 3)
+    }
+    assert (objective["start_date"], objective["end_date"]) == (datetime.date(2024, 1, 1), datetime.date(2024, 3, 1))
+    assert (phase["start_date"], phase["end_date"]) == (datetime.date(2024, 1, 1), datetime.date(2024, 3, 1))
+    assert phase["creator_id"] == "user" and second["objective_id"] == objective["id"]
+
+
+def test_rejects_circular_prerequisites():
+    tree = TreeBuilder(uuid.uuid4())
+    first, second, third = tree.phase({"name": "1"}), tree.phase({"name": "2"}), tree.phase({"name": "3"})
+    with pytest.raises(Exception, match="Same object"):
+        tree.set_prerequisites(first, [first["id"]])
+    tree.set_prerequisites(second, [first["id"]])
+    tree.set_prerequisites(third, [second["id"]])
+    tree.set_prerequisites(first, [third["id"]])
+    with pytest.raises(Exception, match="Circular prerequisite"):
+        tree.insert(RecordingSession())
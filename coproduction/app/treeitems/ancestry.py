@@ -0,0 +1,101 @@
+import uuid
+from typing import Dict, List
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from app.objectives.models import Objective
+from app.phases.models import Phase
+from app.tasks.models import Task
+from app.treeitems.models import closure, descendant_ids
+
+# Keeps treeitem_closure up to date when phases, objectives and tasks are created (also when copied
+# or created from a schema) or moved to another parent. Deleting a treeitem deletes its rows through
+# the foreign key; fixing_treeitem_ancestry.py finds and repairs any drift.
+
+PARENT_ATTRIBUTES = {
+    Phase: ("coproductionprocess_id", "coproductionprocess"),
+    Objective: ("phase_id", "phase"),
+    Task: ("objective_id", "objective"),
+}
+
+INSERT_ANCESTRY = text("""
+    INSERT INTO treeitem_closure (ancestor_id, descendant_id, depth)
+    SELECT CAST(:id AS uuid), CAST(:id AS uuid), 0
+    UNION ALL
+    SELECT CAST(:parent_id AS uuid), CAST(:id AS uuid), 1
+    UNION ALL
+    SELECT ancestor_id, CAST(:id AS uuid), depth + 1 FROM treeitem_closure
+    WHERE descendant_id = CAST(:parent_id AS uuid) AND depth > 0
+    ON CONFLICT DO NOTHING
+""")
+
+# detach the subtree of the treeitem from its old ancestors...
+DETACH_SUBTREE = text("""
+    DELETE FROM treeitem_closure
+    WHERE descendant_id IN (SELECT descendant_id FROM treeitem_closure WHERE ancestor_id = CAST(:id AS uuid))
+    AND ancestor_id NOT IN (SELECT descendant_id FROM treeitem_closure WHERE ancestor_id = CAST(:id AS uuid))
+""")
+
+# ...and attach it under the new parent
+ATTACH_SUBTREE = text("""
+    INSERT INTO treeitem_closure (ancestor_id, descendant_id, depth)
+    SELECT parent.ancestor_id, subtree.descendant_id, parent.depth + subtree.depth + 1
+    FROM (
+        SELECT CAST(:parent_id AS uuid) AS ancestor_id, 0 AS depth
+        UNION ALL
+        SELECT ancestor_id, depth FROM treeitem_closure WHERE descendant_id = CAST(:parent_id AS uuid) AND depth > 0
+    ) parent
+    CROSS JOIN (
+        SELECT descendant_id, depth FROM treeitem_closure WHERE ancestor_id = CAST(:id AS uuid)
+    ) subtree
+    ON CONFLICT DO NOTHING
+""")
+
+
+def parent_id_of(target):
+    column, _ = PARENT_ATTRIBUTES[type(target)]
+    return getattr(target, column)
+
+
+def after_treeitem_insert(mapper, connection, target):
+    parent_id = parent_id_of(target)
+    if parent_id:
+        connection.execute(INSERT_ANCESTRY, {"id": str(target.id), "parent_id": str(parent_id)})
+
+
+def after_treeitem_update(mapper, connection, target):
+    column, relationship = PARENT_ATTRIBUTES[type(target)]
+    state = inspect(target)
+    if not (state.attrs[column].history.has_changes() or state.attrs[relationship].history.has_changes()):
+        return
+    parent_id = parent_id_of(target)
+    connection.execute(DETACH_SUBTREE, {"id": str(target.id)})
+    if parent_id:
+        connection.execute(ATTACH_SUBTREE, {"id": str(target.id), "parent_id": str(parent_id)})
+
+
+for model in PARENT_ATTRIBUTES:
+    event.listen(model, "after_insert", after_treeitem_insert)
+    event.listen(model, "after_update", after_treeitem_update)
+
+
+def get_path_ids(db: Session, treeitem_id: uuid.UUID) -> List[uuid.UUID]:
+    """
+    Same as the path_ids of the treeitem ([coproductionprocess_id, ..., treeitem_id]) in one indexed query.
+    """
+    return [ancestor_id for ancestor_id, in db.query(closure.c.ancestor_id).filter(
+        closure.c.descendant_id == treeitem_id
+    ).order_by(closure.c.depth.desc())]
+
+
+def get_parents(db: Session, coproductionprocess_id: uuid.UUID) -> Dict[uuid.UUID, uuid.UUID]:
+    """
+    Parent of every phase, objective and task of a coproduction process.
+    """
+    return {descendant_id: ancestor_id for descendant_id, ancestor_id in db.query(
+        closure.c.descendant_id, closure.c.ancestor_id
+    ).filter(
+        closure.c.depth == 1,
+        closure.c.descendant_id.in_(descendant_ids(coproductionprocess_id))
+    )}
@@ -0,0 +1,117 @@
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.objectives.models import Objective
+from app.phases.models import Phase
+from app.tasks.models import Task
+from app.treeitems.models import closure, prerequisites
+from app.utils import Status, update_status_and_progress
+
+
+def summarize(row: dict, children: List[dict]):
+    # status and progress of a phase or objective from its children, as the crud does
+    node = SimpleNamespace(children=[SimpleNamespace(**child) for child in children], status=Status.awaiting, progress=0)
+    # an empty one stays awaiting
+    if children:
+        update_status_and_progress(node)
+    row["status"] = node.status
+    row["progress"] = node.progress
+
+
+class TreeBuilder:
+    """
+    Rows of the new phases, objectives and tasks of a coproduction process, with their ancestry and
+    prerequisites, inserted with one batched INSERT per table instead of flushing object by object.
+
+    The ids are generated here, so the rows can reference each other before anything is inserted.
+    Bulk inserts skip the mapper events, which is why the treeitem_closure rows are built here too.
+    """
+
+    def __init__(self, coproductionprocess_id: uuid.UUID, creator_id: str = None):
+        self.coproductionprocess_id = coproductionprocess_id
+        self.creator_id = creator_id
+        self.phases: List[dict] = []
+        self.objectives: List[dict] = []
+        self.tasks: List[dict] = []
+        self.closure: List[dict] = []
+        # prerequisite of every treeitem id
+        self.prerequisites: Dict[uuid.UUID, List[uuid.UUID]] = {}
+        self.paths: Dict[uuid.UUID, List[uuid.UUID]] = {}
+
+    def add(self, rows: List[dict], type: str, parent_path: List[uuid.UUID], data: dict) -> dict:
+        row = {**data, "id": uuid.uuid4(), "type": type, "creator_id": self.creator_id}
+        path = parent_path + [row["id"]]
+        self.paths[row["id"]] = path
+        for depth, ancestor_id in enumerate(reversed(path)):
+            self.closure.append({"ancestor_id": ancestor_id, "descendant_id": row["id"], "depth": depth})
+        rows.append(row)
+        return row
+
+    def phase(self, data: dict) -> dict:
+        return self.add(self.phases, "phase", [self.coproductionprocess_id], {**data, "coproductionprocess_id": self.coproductionprocess_id})
+
+    def objective(self, phase: dict, data: dict) -> dict:
+        return self.add(self.objectives, "objective", self.paths[phase["id"]], {**data, "phase_id": phase["id"]})
+
+    def task(self, objective: dict, data: dict) -> dict:
+        return self.add(self.tasks, "task", self.paths[objective["id"]], {**data, "objective_id": objective["id"]})
+
+    def set_prerequisites(self, row: dict, prerequisite_ids: List[uuid.UUID]):
+        if row["id"] in prerequisite_ids:
+            raise Exception("Same object")
+        self.prerequisites[row["id"]] = prerequisite_ids
+
+    def check_circular(self):
+        # same check as recursive_check, on the whole graph at once
+        for id in self.prerequisites:
+            seen = {id}
+            pending = list(self.prerequisites[id])
+            while pending:
+                pre_id = pending.pop()
+                if pre_id in seen:
+                    raise Exception("Circular prerequisite", id, pre_id)
+                seen.add(pre_id)
+                pending += self.prerequisites.get(pre_id, [])
+
+    def aggregate_dates(self):
+        # what the aggregated start_date / end_date columns would compute on flush
+        for parents, children, key in ((self.objectives, self.tasks, "objective_id"), (self.phases, self.objectives, "phase_id")):
+            dates = {}
+            for child in children:
+                starts, ends = dates.setdefault(child[key], ([], []))
+                if child.get("start_date"):
+                    starts.append(child["start_date"])
+                if child.get("end_date"):
+                    ends.append(child["end_date"])
+            for parent in parents:
+                starts, ends = dates.get(parent["id"], ([], []))
+                parent["start_date"] = min(starts) if starts else None
+                parent["end_date"] = max(ends) if ends else None
+
+    def summarize(self):
+        # status and progress of the objectives and phases from the status of the tasks
+        for parents, children, key in ((self.objectives, self.tasks, "objective_id"), (self.phases, self.objectives, "phase_id")):
+            grouped = {}
+            for child in children:
+                grouped.setdefault(child[key], []).append(child)
+            for parent in parents:
+                summarize(parent, grouped.get(parent["id"], []))
+
+    def insert(self, db: Session):
+        """
+        Inserts everything in the transaction of the session, without committing.
+        """
+        self.check_circular()
+        self.aggregate_dates()
+        # parents before children, the closure and prerequisite rows after the treeitems they point to
+        db.bulk_insert_mappings(Phase, self.phases)
+        db.bulk_insert_mappings(Objective, self.objectives)
+        db.bulk_insert_mappings(Task, self.tasks)
+        if self.closure:
+            db.execute(closure.insert(), self.closure)
+        edges = [{"treeitem_a_id": id, "treeitem_b_id": pre_id} for id, pre_ids in self.prerequisites.items() for pre_id in pre_ids]
+        if edges:
+            db.execute(prerequisites.insert(), edges)
@@ -1,7 +1,7 @@
 import copy
 import uuid
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, String, Table, or_, and_, ARRAY
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String, Table, or_, and_, select, ARRAY
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import Session, relationship
@@ -19,6 +19,31 @@ prerequisites = Table(
         'treeitem.id', ondelete="CASCADE"), primary_key=True)
 )
 
+# Ancestry of every phase, objective and task (closure table): one row for the item itself (depth 0),
+# one per ancestor treeitem and one for its coproduction process, which is why ancestor_id has no foreign key.
+# Maintained by the listeners of app/treeitems/ancestry.py
+closure = Table(
+    'treeitem_closure', BaseModel.metadata,
+    Column('ancestor_id', UUID(as_uuid=True), primary_key=True),
+    Column('descendant_id', ForeignKey(
+        'treeitem.id', ondelete="CASCADE"), primary_key=True),
+    Column('depth', Integer, nullable=False),
+    Index('ix_treeitem_closure_descendant_id', 'descendant_id', 'depth'),
+)
+
+
+def ancestor_ids(treeitem_id):
+    # the treeitem itself, its ancestors and its coproduction process
+    return select(closure.c.ancestor_id).where(closure.c.descendant_id == treeitem_id)
+
+
+def descendant_ids(ancestor_id, type: str = None):
+    # the treeitems under a treeitem or a coproduction process (and the treeitem itself), optionally of a type
+    query = select(closure.c.descendant_id).where(closure.c.ancestor_id == ancestor_id)
+    if type:
+        query = query.join(TreeItem, TreeItem.id == closure.c.descendant_id).where(TreeItem.type == type)
+    return query
+
 
 
 class TreeItem(BaseModel):
@@ -71,13 +96,10 @@ class TreeItem(BaseModel):
         ).filter(
             or_(
                 and_(
-                    Permission.coproductionprocess_id == self.coproductionprocess.id,
+                    Permission.coproductionprocess_id.in_(ancestor_ids(self.id)),
                     Permission.treeitem_id == None
                 ),
-                and_(
-                    Permission.treeitem_id.in_(self.path_ids),
-                    Permission.coproductionprocess_id == self.coproductionprocess.id
-                ),
+                Permission.treeitem_id.in_(ancestor_ids(self.id)),
             )
         ).all()
     
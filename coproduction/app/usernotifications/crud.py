@@ -3,13 +3,15 @@ from typing import Any, Dict, Optional, List
 
 from sqlalchemy.orm import Session
 from app.general.utils.CRUDBase import CRUDBase
+from app.general.utils.keyset import KeysetPage, paginate
 from app.models import Notification, UserNotification, User, Organization
 from app.schemas import NotificationCreate, NotificationPatch, UserNotificationCreate, UserNotificationPatch
 import uuid
 from app import models
 from app.users.crud import exportCrud as users_crud
+from app.notifications.parameters import parse_parameters
 
-from sqlalchemy import or_, and_
+from sqlalchemy import and_, func, or_
 from fastapi.encoders import jsonable_encoder
 from app.sockets import socket_manager
 from uuid_by_string import generate_uuid
@@ -17,47 +19,60 @@ from app import schemas
 
 
 class CRUDUserNotification(CRUDBase[UserNotification, UserNotificationCreate, UserNotificationPatch]):
-    async def get_multi(self, db: Session, user: User) -> Optional[List[UserNotification]]:
-        return db.query(UserNotification).all()
+    async def get_multi(self, db: Session, user: User, page: KeysetPage = None) -> Optional[List[UserNotification]]:
+        # only the notifications of the user
+        return paginate(db.query(UserNotification).filter(UserNotification.user_id == user.id), UserNotification, page)
 
     #Get all notifications by user:
-    async def get_user_notifications(self, db: Session, user_id: str) -> Optional[List[UserNotification]]:
-        listofUserNotifications = db.query(UserNotification).filter(models.UserNotification.user_id==user_id).all()
+    async def get_user_notifications(self, db: Session, user_id: str, copro_id: str = None, team_id: str = None, page: KeysetPage = None) -> Optional[List[UserNotification]]:
+        query = db.query(UserNotification).filter(models.UserNotification.user_id==user_id)
+        # the ones of a coproduction process or a team, using the indexes on the parameters
+        if copro_id:
+            query = query.filter(UserNotification.parameters["copro_id"].astext == str(copro_id))
+        if team_id:
+            query = query.filter(UserNotification.parameters["team_id"].astext == str(team_id))
+        listofUserNotifications = paginate(query, UserNotification, page)
         #print(listofUserNotifications)
         return listofUserNotifications
     
     #Get all notifications by coproduction process:
-    async def get_list_user_aplications_by_copro(self, db: Session, copro_id: str) -> Optional[List[UserNotification]]:
+    async def get_list_user_aplications_by_copro(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[UserNotification]]:
 
-        listofUserNotifications = db.query(UserNotification).join(Notification).filter(
+        listofUserNotifications = paginate(db.query(UserNotification).join(Notification).filter(
             UserNotification.coproductionprocess_id==copro_id,
             Notification.event=='apply_submited',
             UserNotification.is_archived.isnot(True)
-        ).order_by(UserNotification.created_at.desc()).all()
+        ), UserNotification, page)
 
         return listofUserNotifications
     
     #Get history (including archived) notifications by coproduction process:
-    async def get_list_user_aplicationshistory_by_copro(self, db: Session, copro_id: str) -> Optional[List[UserNotification]]:
+    async def get_list_user_aplicationshistory_by_copro(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[UserNotification]]:
 
-        listofUserNotifications = db.query(UserNotification).join(Notification).filter(
+        listofUserNotifications = paginate(db.query(UserNotification).join(Notification).filter(
             UserNotification.coproductionprocess_id==copro_id,
             Notification.event=='apply_submited'
-        ).order_by(UserNotification.created_at.desc()).all()
+        ), UserNotification, page)
 
         return listofUserNotifications
 
     #Get unseen notifications by user:
-    async def get_unseen_user_notifications(self, db: Session, user_id: str) -> Optional[List[UserNotification]]:
-        listofUserNotifications = db.query(UserNotification).filter(
+    async def get_unseen_user_notifications(self, db: Session, user_id: str, page: KeysetPage = None) -> Optional[List[UserNotification]]:
+        listofUserNotifications = paginate(db.query(UserNotification).filter(
             and_(models.UserNotification.user_id==user_id,models.UserNotification.state==False)
-            ).order_by(models.UserNotification.created_at.desc()).all()
+            ), UserNotification, page)
         #print(listofUserNotifications)
         return listofUserNotifications
 
+    #Count unseen notifications by user, with the partial index on the unseen ones:
+    async def count_unseen_user_notifications(self, db: Session, user_id: str) -> int:
+        return db.query(func.count(UserNotification.id)).filter(
+            UserNotification.user_id == user_id, UserNotification.state == False
+        ).scalar()
+
     #Get user notifications by coproduction process:
-    async def get_user_notifications_by_coproid(self, db: Session, copro_id: str) -> Optional[List[UserNotification]]:
-        listofUserNotifications = db.query(UserNotification).filter(models.UserNotification.coproductionprocess_id==copro_id).order_by(models.UserNotification.created_at.desc()).all()
+    async def get_user_notifications_by_coproid(self, db: Session, copro_id: str, page: KeysetPage = None) -> Optional[List[UserNotification]]:
+        listofUserNotifications = paginate(db.query(UserNotification).filter(models.UserNotification.coproductionprocess_id==copro_id), UserNotification, page)
         #print(listofUserNotifications)
         return listofUserNotifications
 
@@ -68,6 +83,7 @@ class CRUDUserNotification(CRUDBase[UserNotification, UserNotificationCreate, Us
         
         
         obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data["parameters"] = parse_parameters(obj_in_data.get("parameters"))
         
         db_obj = UserNotification(**obj_in_data)
 
@@ -92,6 +108,8 @@ class CRUDUserNotification(CRUDBase[UserNotification, UserNotificationCreate, Us
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
+        if "parameters" in update_data:
+            update_data["parameters"] = parse_parameters(update_data["parameters"])
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
@@ -1,7 +1,7 @@
 import uuid
 
-from sqlalchemy import Column, ForeignKey, String, Table, Integer, func, Boolean, Enum, Text, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, ForeignKey, Index, String, Table, Integer, func, Boolean, Enum, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import backref, relationship, declarative_base
 
 from app.general.db.base_class import Base as BaseModel
@@ -23,8 +23,17 @@ class UserNotification(BaseModel):
 
     coproductionprocess_id = Column(UUID(as_uuid=True), nullable=True)
 
+    # the timelines filter by these keys of the parameters, the feeds are read newest first
+    __table_args__ = (
+        Index('ix_usernotification_copro_id', text("(parameters ->> 'copro_id')")),
+        Index('ix_usernotification_team_id', text("(parameters ->> 'team_id')")),
+        Index('ix_usernotification_user_feed', 'user_id', 'created_at', 'id'),
+        Index('ix_usernotification_coproductionprocess_feed', 'coproductionprocess_id', 'created_at', 'id'),
+        Index('ix_usernotification_unseen', 'user_id', postgresql_where=text('state = false')),
+    )
+
     #Json object with information relevant to a notification:
-    parameters = Column(JSON, nullable=True)
+    parameters = Column(JSONB, nullable=True)
     
     notification = relationship('Notification', post_update=True, back_populates="users")
     user = relationship('User', back_populates="user_notification_associations")
@@ -1,9 +1,10 @@
 import uuid
 from typing import Optional, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from app.general.utils.AllOptional import AllOptional
 from datetime import datetime
+from app.notifications.parameters import dump_parameters
 from app.utils import ChannelTypes
 
 class UserNotificationBase(BaseModel):
@@ -15,6 +16,11 @@ class UserNotificationBase(BaseModel):
     coproductionprocess_id: Optional[uuid.UUID]
     parameters: Optional[str]
 
+    @validator('parameters', pre=True)
+    def parameters_as_string(cls, v):
+        # stored as JSONB, returned as the JSON string the clients parse
+        return dump_parameters(v)
+
 class UserNotificationState(BaseModel):
     state: bool
 
@@ -5,33 +5,40 @@ from app.general.utils.CRUDBase import CRUDBase
 from app import models
 from app.schemas import UserCreate, UserPatch
 import uuid
-from sqlalchemy import and_, func, or_
+from sqlalchemy import and_, func, or_, select
+from app.config import settings
+from app.general.utils.search import like_pattern
+from app.tables import user_team_association_table
 from app.treeitems.crud import exportCrud as treeitemsCrud
 
 
 class CRUDUser(CRUDBase[models.User, UserCreate, UserPatch]):
     async def search(self, db: Session, user: models.User, search: str, organization_id: uuid.UUID = None) -> List[models.User]:
         if organization_id:
-            print("Searching in org")
-            se = search.lower()
-
-            teams = db.query(models.Team).filter(
-                models.Team.organization_id == organization_id
-            ).all()
+            se = search.strip()
+            pattern = like_pattern(se)
+            # the members of the teams of the organization
+            members = select(user_team_association_table.c.user_id).join(
+                models.Team, models.Team.id == user_team_association_table.c.team_id
+            ).where(models.Team.organization_id == organization_id)
+            similarity = func.greatest(func.similarity(models.User.full_name, se), func.similarity(models.User.email, se))
+            # the exact email first, then the most similar
             return db.query(
                     models.User
                 ).filter(
                     or_(
                         and_(
-                            models.User.teams.any(models.Team.id.in_([team.id for team in teams])),
+                            models.User.id.in_(members),
                             or_(
-                                models.User.full_name.ilike(f"%{se}%"),                
-                                models.User.email.ilike(f"%{se}%"),                
-                            )  
+                                models.User.full_name.ilike(pattern, escape="\\"),
+                                models.User.email.ilike(pattern, escape="\\"),
+                            )
                         ),
-                        models.User.email == search      
+                        models.User.email == search
                     )
-                ).all()
+                ).order_by(
+                    (models.User.email == search).desc(), similarity.desc().nullslast(), models.User.id
+                ).limit(settings.USER_SEARCH_LIMIT).all()
         else:
             print("Searching by email")
             # only retrieve if the email is exact
@@ -60,13 +67,10 @@ class CRUDUser(CRUDBase[models.User, UserCreate, UserPatch]):
         return
         
     async def update_or_create(self, db: Session, data: dict) -> Optional[models.User]:
-        from app.worker import sync_asset_users
         if "sub" in data:
             data["id"] = data.get("sub")
             if user := await self.get(db=db, id=data.get("id")):
-                if data.get("additionalEmails", []) != user.additionalEmails:
-                    sync_asset_users.delay(user_ids=[user.id])
-
+                # a change of the emails is synced to the assets by app.signals
                 return await self.update(db=db, db_obj=user, obj_in=UserPatch(**data))
             else:
                 return await self.create(db=db, obj_in=UserCreate(**data))
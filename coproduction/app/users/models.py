@@ -1,7 +1,7 @@
 from email.policy import default
 
 from app.general.db.base_class import Base as BaseModel
-from sqlalchemy import ARRAY, Column, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import ARRAY, Column, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 
@@ -33,5 +33,12 @@ class User(BaseModel):
 
     applied_teams_ids = association_proxy("applied_teams", "id")
 
+    __table_args__ = (
+        Index('ix_user_email', 'email'),
+        # partial names and emails, needs pg_trgm
+        Index('ix_user_full_name_trgm', 'full_name', postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+        Index('ix_user_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+    )
+
     def __repr__(self) -> str:
         return f"<User {self.id}>"
\ No newline at end of file
@@ -65,6 +65,23 @@ class ModelTypes(str, enum.Enum):
     ASSET = "Asset"
     TREEITEM = "TreeItem"
 
+class JobStatus(str, enum.Enum):
+    pending = "pending"
+    running = "running"
+    finished = "finished"
+    failed = "failed"
+    cancelled = "cancelled"
+
+class EmailStatus(str, enum.Enum):
+    queued = "queued"
+    sent = "sent"
+    failed = "failed"
+
+class OutboxStatus(str, enum.Enum):
+    pending = "pending"
+    delivered = "delivered"
+    failed = "failed"
+
 class ClaimTypes(str, enum.Enum):
     management = "Management"
     development = "Development"
@@ -21,13 +21,15 @@ wait_seconds = 10
     after=after_log(logger, logging.WARN),
 )
 def wait_for_database() -> None:
+    db = SessionLocal()
     try:
-        db = SessionLocal()
         # Try to create session to check if DB is awake
         db.execute("SELECT 1")
     except Exception as e:
         logger.error(e)
         raise e
+    finally:
+        db.close()
 
 
 @retry(
@@ -1,21 +1,25 @@
-from typing import List
-from uuid import UUID
-import requests
-from sqlalchemy import and_, or_
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+from celery.signals import worker_ready
 from app.celery_app import celery_app
 from app.general.db.session import SessionLocal
 from app.models import (
-    Permission,
-    TreeItem,
-    Task,
-    User,
-    Team,
-    CoproductionProcess,
-    InternalAsset,
-    user_team_association_table,
-    coproductionprocess_administrators_association_table
+    ExportJob,
+    ImportJob,
 )
-from app import crud
+from app.aclsync import acl_sync
+from app.config import settings
+from app.exports import process_exporter
+from app.general.emails import deliver_queued, next_attempt_at as emails_next_attempt_at
+from app.outbox import outbox
+from app.imports import process_importer
+from app.jobs import JobCancelled, JobProgress, start
+from app.utils import JobStatus
+
+logger = logging.getLogger(__name__)
 
 
 @celery_app.task(acks_late=True)
@@ -23,134 +27,133 @@ def test_celery(word: str) -> str:
     return f"test task return {word}"
 
 
-def iterate(db, treeitems: List[TreeItem] = [], coproductionprocesses: List[CoproductionProcess] = []):
-    # get all the tasks behind the treeitems or the coproductionprocess
-    tasks = {}
-    for treeitem in treeitems:
-        if treeitem.type == "objective":
-            for task in treeitem.children:
-                tasks[task.id] = task
-        elif treeitem.type == "phase":
-            for task in treeitem.tasks:
-                tasks[task.id] = task
-        else:
-            tasks[treeitem.id] = treeitem
-
-    for coproductionprocess in coproductionprocesses:
-        for phase in coproductionprocess.children:
-            for objective in phase.children:
-                for task in objective.children:
-                    tasks[task.id] = task
-
-    # get users and their permissions for every task and call /sync_users of the software interlinkers used by the assets of the task
-    # task: Task
-    # for task_id, task in tasks.items():
-    #     try:
-    #         permissions = db.query(
-    #             Permission
-    #         ).filter(
-    #             and_(
-    #                 Permission.coproductionprocess_id == task.coproductionprocess.id,
-    #                 Permission.treeitem_id.in_(task.path_ids),
-    #             )
-    #         ).distinct().all()
-
-    #         res = db.query(
-    #             User
-    #         ).join(
-    #             user_team_association_table
-    #         ).filter(
-    #             Team.id.in_([permission.team_id for permission in permissions])
-    #         )
-
-    #         res2 = db.query(
-    #             User
-    #         ).join(
-    #             coproductionprocess_administrators_association_table
-    #         ).filter(
-    #             CoproductionProcess.id == task.coproductionprocess.id
-    #         )
-
-    #         users = res.union(res2).distinct().all()
-
-    #         data = []
-    #         for user in users:
-    #             if crud.permission.get_dict_for_user_and_treeitem(db=db, treeitem=task, user=user).get("access_assets_permission", False):
-    #                 toAdd = {
-    #                     "emails": [user.email] + user.additionalEmails,
-    #                     "user_id": user.id,
-    #                     "administrator": user in task.coproductionprocess.administrators
-    #                 }
-    #                 data.append(toAdd)
-
-    #         for asset in task.assets:
-    #             if type(asset) == InternalAsset:
-    #                 URL = asset.internal_link + "/sync_users"
-    #                 print(URL, data)
-    #                 try:
-    #                     requests.post(URL, json=data)
-    #                 except Exception as e:
-    #                     print(str(e))
-    #     except Exception as e:
-    #         print("==========================" )
-    #         print(task)
-    #         print(task_id)
-    #         print("The task tiene un problema: task con id")
-    #         print(str(e))
-
-
 @celery_app.task
-def sync_asset_users(user_ids: List[str]) -> str:
+def sync_acls(treeitem_ids: List[str] = (), user_ids: List[str] = (), coproductionprocess_ids: List[str] = ()):
+    # the ids given (when Redis was not available) and the ones collected in Redis during the window
+    pending = acl_sync.pop_pending()
     db = SessionLocal()
-
-    # get the teams of the users
-    teams = db.query(
-        Team.id
-    ).join(
-        user_team_association_table
-    ).filter(
-        User.id.in_(user_ids)
-    ).distinct().all()
-
-    # get the treeitems where the teams of the users are working on
-    treeitems: TreeItem = db.query(
-        TreeItem
-    ).join(
-        Permission
-    ).filter(
-        or_(
-            Permission.team_id.in_([team.id for team in teams])
+    try:
+        acl_sync.sync(
+            db,
+            treeitem_ids=pending["treeitem_ids"] | set(treeitem_ids),
+            user_ids=pending["user_ids"] | set(user_ids),
+            coproductionprocess_ids=pending["coproductionprocess_ids"] | set(coproductionprocess_ids),
         )
-    ).distinct().all()
+    finally:
+        # return the connection to the pool
+        db.close()
 
-    # get the coproductionprocesses where the users are admins
-    coproductionprocesses = db.query(
-        CoproductionProcess
-    ).join(
-        coproductionprocess_administrators_association_table
-    ).filter(
-        User.id.in_(user_ids)
-    ).distinct().all()
 
+@celery_app.task
+def export_coproductionprocess(job_id: str):
+    db = SessionLocal()
     try:
-        iterate(db, treeitems=treeitems, coproductionprocesses=coproductionprocesses)
-
-    except Exception as e:
+        job: ExportJob = db.query(ExportJob).get(job_id)
+        # cancelled before the worker got to it, or taken by another worker
+        if not job or not start(db, job):
+            return
+        token = job.access_token
+
+        loop = asyncio.new_event_loop()
+        try:
+            zip_path = loop.run_until_complete(process_exporter.export(
+                db=db, coproductionprocess=job.coproductionprocess, token=token, progress=JobProgress(db, job)
+            ))
+        except JobCancelled:
+            db.rollback()
+            job.status = JobStatus.cancelled
+        except Exception as e:
+            logger.error(f"Error exporting the coproduction process {job.coproductionprocess_id}: {repr(e)}")
+            db.rollback()
+            job.status = JobStatus.failed
+            job.error = str(e)
+        else:
+            # a cancel may have landed after the last check, the lock keeps a new one waiting until this is committed
+            status = db.query(ExportJob.status).filter(ExportJob.id == job.id).with_for_update().scalar()
+            if status == JobStatus.cancelled:
+                job.status = JobStatus.cancelled
+                try:
+                    os.remove(zip_path)
+                except OSError:
+                    pass
+            else:
+                job.status = JobStatus.finished
+                job.artifact_path = zip_path
+                job.artifact_size = os.path.getsize(zip_path)
+        finally:
+            loop.close()
+        job.access_token = None
+        job.finished_at = datetime.now()
+        db.commit()
+
+        if job.status == JobStatus.finished:
+            # only the last zip of every process is kept
+            older = db.query(ExportJob).filter(
+                ExportJob.coproductionprocess_id == job.coproductionprocess_id,
+                ExportJob.id != job.id,
+                ExportJob.artifact_path.isnot(None)
+            ).all()
+            for old in older:
+                try:
+                    os.remove(old.artifact_path)
+                except OSError:
+                    pass
+                old.artifact_path = None
+            db.commit()
+        process_exporter.prune_blobs(settings.EXPORT_BLOB_MAX_AGE)
+    finally:
         db.close()
-        raise e
 
 
 @celery_app.task
-def sync_asset_treeitems(treeitem_ids: List[UUID]) -> str:
+def import_coproductionprocess(job_id: str):
     db = SessionLocal()
+    try:
+        job: ImportJob = db.query(ImportJob).get(job_id)
+        if not job or job.status != JobStatus.pending:
+            return
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(process_importer.run(db, job, job.access_token))
+        finally:
+            loop.close()
+    finally:
+        db.close()
 
-    treeitems: TreeItem = db.query(TreeItem).filter(
-        TreeItem.id.in_(treeitem_ids)
-    ).all()
 
+@celery_app.task
+def send_emails(ids: Optional[List[str]] = None):
+    db = SessionLocal()
     try:
-        iterate(db, treeitems)
+        emails = deliver_queued(db, ids)
+        # more of them were due than fit in a batch
+        if len(emails) == settings.EMAIL_BATCH_SIZE:
+            send_emails.delay(ids)
+        # the retries of this batch and of the earlier ones, all of them are sent when the first is due
+        elif next_attempt_at := emails_next_attempt_at(db):
+            send_emails.apply_async(countdown=max(0, (next_attempt_at - datetime.now()).total_seconds()))
+    finally:
+        db.close()
+
 
-    except Exception as e:
+@celery_app.task
+def relay_outbox():
+    db = SessionLocal()
+    try:
+        messages = outbox.relay(db)
+        if messages is None:
+            # another relay is running, it may have read the messages before the last ones were added
+            relay_outbox.apply_async(countdown=1)
+        elif len(messages) == settings.OUTBOX_BATCH_SIZE:
+            relay_outbox.delay()
+        elif next_attempt_at := outbox.next_attempt_at(db):
+            relay_outbox.apply_async(countdown=max(0, (next_attempt_at - datetime.now()).total_seconds()))
+    finally:
         db.close()
-        raise e
+
+
+@worker_ready.connect
+def send_queued_emails(**kwargs):
+    # the ones queued while no worker was running
+    send_emails.delay()
+    relay_outbox.delay()
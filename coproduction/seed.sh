@@ -3,3 +3,4 @@
 python /app/app/initial_data.py
 python /app/app/initial_data_notifications.py
 python /app/app/fixing_old_copro_tree_stucture.py
+python /app/app/fixing_treeitem_ancestry.py
@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.utils import RoleTypes
+
+
+def create_process(db: Session, user: models.User, phases: int, objectives: int, tasks: int) -> models.CoproductionProcess:
+    coproductionprocess = models.CoproductionProcess(name="tree", description="tree", creator_id=user.id)
+    coproductionprocess.administrators.append(user)
+    db.add(coproductionprocess)
+    team = models.Team(name="team", description="team", type=RoleTypes.citizen, creator_id=user.id)
+    team.users.append(user)
+    db.add(team)
+    db.add(models.Permission(coproductionprocess=coproductionprocess, team=team, creator_id=user.id, access_assets_permission=True))
+    for i in range(phases):
+        phase = models.Phase(name=f"phase {i}", description="", coproductionprocess=coproductionprocess)
+        for j in range(objectives):
+            objective = models.Objective(name=f"objective {j}", description="", phase=phase)
+            previous = None
+            for k in range(tasks):
+                task = models.Task(name=f"task {k}", description="", objective=objective)
+                if previous:
+                    task.prerequisites.append(previous)
+                previous = task
+            db.add(models.Permission(coproductionprocess=coproductionprocess, team=team, treeitem=objective, creator_id=user.id, create_assets_permission=True))
+        db.add(phase)
+    db.commit()
+    return coproductionprocess
+
+
+async def count_tree_queries(db: Session, coproductionprocess: models.CoproductionProcess, user: models.User):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    db.expire_all()
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        phases = await crud.coproductionprocess.get_tree(db=db, coproductionprocess=coproductionprocess, user=user)
+        tree = [schemas.PhaseOutFull.from_orm(phase) for phase in phases]
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return tree, len(statements)
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+@pytest.mark.integration
+def test_tree_is_serialized_in_a_constant_number_of_queries(db: Session) -> None:
+    user = models.User(id=str(uuid.uuid4()), full_name="tree user")
+    db.add(user)
+    db.commit()
+    small = create_process(db, user, 1, 1, 1)
+    big = create_process(db, user, 5, 6, 8)
+    try:
+        small_tree, small_queries = run(count_tree_queries(db, small, user))
+        big_tree, big_queries = run(count_tree_queries(db, big, user))
+
+        assert len(big_tree) == 5
+        assert sum(len(objective.children) for phase in big_tree for objective in phase.children) == 5 * 6 * 8
+        tasks = [task for phase in big_tree for objective in phase.children for task in objective.children]
+        assert len([task for task in tasks if task.prerequisites_ids]) == 5 * 6 * 7
+        assert all(len(task.permissions) == 2 for task in tasks)
+        assert big_queries == small_queries
+        assert big_queries <= 20
+    finally:
+        for obj in [small, big] + list(user.teams) + [user]:
+            db.delete(obj)
+        db.commit()
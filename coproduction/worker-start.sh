@@ -1,4 +1,7 @@
 #! /usr/bin/env bash
 set -e
 
-celery -A app.worker worker -l info -c 1
+export DB_POOL_PROFILE=${DB_POOL_PROFILE:-worker}
+
+# the default queue, or the exports and imports with WORKER_QUEUES=jobs (see CELERY_JOBS_QUEUE)
+celery -A app.worker worker -l info -c ${WORKER_CONCURRENCY:-1} -Q ${WORKER_QUEUES:-celery}